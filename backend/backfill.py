@@ -0,0 +1,84 @@
+"""
+backfill.py
+
+Historical backfill of subreddits, run next to the live ingestion in main.py.
+
+Pages backwards through each subreddit's listings with after= cursors and stores
+every page with one bulk insert. Progress is checkpointed per subreddit and listing,
+so the command can be stopped (Ctrl+C, SIGTERM) or crash and continue where it left
+off when started again. Requests draw from a separate RedditRateBudget
+(backfill.requests_per_minute), which also keeps `backfill.reserve` requests of every
+Reddit rate limit window free for the live ingestion. Backfilled posts are classified
+after fresh posts.
+
+Usage (from the backend directory):
+    python backfill.py                          # all subreddits of config.yaml
+    python backfill.py python rust --listings new top:all --days 365
+"""
+
+import argparse
+import logging
+import signal
+import threading
+import time
+from dotenv import load_dotenv
+from logging_config.logging_config import get_config
+from rate_limiter.token_bucket import RedditRateBudget
+from reddit_api.backfill import Backfill
+from reddit_api.reddit_client import RedditClient
+from database.postgresql import close_pool
+import yaml
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill the history of subreddits")
+    parser.add_argument("subreddits", nargs="*", help="subreddits to backfill (default: all configured ones)")
+    parser.add_argument("--listings", nargs="+", help='listings to page, e.g. new top:all (default: backfill.listings or "new")')
+    parser.add_argument("--max-pages", type=int, help="pages per listing and run (default: no limit)")
+    parser.add_argument("--days", type=float, help="only posts from the last N days")
+    parser.add_argument("--requests-per-minute", type=float, help="Reddit request budget of the backfill")
+    args = parser.parse_args()
+
+    load_dotenv(dotenv_path="config/.env")
+    get_config()
+    with open("config/config.yaml") as f:
+        cfg = yaml.safe_load(f)
+    backfill_cfg = cfg.get("backfill") or {}
+    days = args.days or backfill_cfg.get("days")
+
+    reddit = RedditClient.from_env()
+    reddit.set_rate_budget(RedditRateBudget(
+        requests_per_minute=args.requests_per_minute or backfill_cfg.get("requests_per_minute", 30),
+        burst=backfill_cfg.get("burst", 1),
+        reserve=backfill_cfg.get("reserve", 30)
+    ))
+    backfill = Backfill(
+        reddit,
+        listings=args.listings or backfill_cfg.get("listings"),
+        max_pages=args.max_pages or backfill_cfg.get("max_pages"),
+        oldest_utc=time.time() - days * 86400 if days else None
+    )
+
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        logging.info("Stopping backfill after the current page...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    inserted = 0
+    try:
+        for subreddit in args.subreddits or cfg["subreddits"]:
+            if stop_event.is_set():
+                break
+            try:
+                inserted += backfill.run(subreddit, stop=stop_event.is_set)
+            except Exception as e:
+                logging.error(f"Backfill of r/{subreddit} failed, it resumes from its checkpoint next time: {e}")
+    finally:
+        close_pool()
+    logging.info(f"Backfill finished: {inserted} posts added")
+
+if __name__ == "__main__":
+    main()
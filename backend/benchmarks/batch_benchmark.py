@@ -0,0 +1,152 @@
+"""
+batch_benchmark.py
+
+Compares single-post classification with batched prompts without using the network
+or a database. The chat completion endpoint is replaced by a fake client that sleeps
+for a fixed round-trip plus a per-output-token delay, and posts live in memory.
+A share of free-text single-post answers is chatty ("Positive." instead of the bare
+label); --constrained adds a run of single-token classification with logprobs.
+
+Run from the backend directory:
+    python -m benchmarks.batch_benchmark --posts 200 --batch-sizes 1 5 10 20 --constrained
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+from openrouter.sentiment_model import SentimentModel
+
+LABELS = ("POSITIVE", "NEUTRAL", "NEGATIVE")
+
+class FakeStorage:
+    """
+    In-memory replacement for PostgreSQLClient exposing the methods used by the pipeline.
+    """
+
+    queue = "posts"
+
+    def __init__(self, posts: int):
+        self.posts = {
+            f"p{num:05d}": {"title": f"Title {num}", "content": f"Content {num}", "subreddit": "bench", "sentiment": None}
+            for num in range(posts)
+        }
+
+    def has_posts(self) -> bool:
+        return bool(self.posts)
+
+    def count_backlog(self, cap: int = 100000) -> int:
+        return min(cap, sum(post["sentiment"] is None for post in self.posts.values()))
+
+    def iter_unsentimented_posts(self, batch_size: int, lease_seconds: int, worker_id: str, exclude=()):
+        queue = [post_id for post_id, post in self.posts.items() if post["sentiment"] is None and post_id not in exclude]
+        for i in range(0, len(queue), batch_size):
+            yield [{"post_id": post_id, **self.posts[post_id]} for post_id in queue[i:i + batch_size]]
+
+    def mark_posts_sentiment(self, results: list[tuple[str, str, str, float | None]]) -> None:
+        for post_id, sentiment, model, confidence in results:
+            self.posts[post_id]["sentiment"] = sentiment
+
+    def release_posts(self, post_ids: list[str]) -> None:
+        pass
+
+class FakeCompletions:
+    """
+    Fake chat.completions endpoint answering single and batched prompts.
+    """
+
+    def __init__(self, round_trip: float, per_token: float, drop_rate: float, chatty_rate: float):
+        self._round_trip = round_trip
+        self._per_token = per_token
+        self._drop_rate = drop_rate
+        self._chatty_rate = chatty_rate
+        self.requests = 0
+
+    @staticmethod
+    def _logprobs(label: str) -> SimpleNamespace:
+        # Top alternatives of a one-token answer: the label word first, the other words less likely
+        words = [label.lower()] + [other.lower() for other in LABELS if other != label]
+        alternatives = [
+            SimpleNamespace(token=word, logprob=math.log(probability))
+            for word, probability in zip(words, (random.uniform(0.5, 0.99), 0.05, 0.01))
+        ]
+
+        return SimpleNamespace(content=[SimpleNamespace(token=words[0], logprob=alternatives[0].logprob, top_logprobs=alternatives)])
+
+    def create(self, messages: list[dict], max_tokens: int, **kwargs) -> SimpleNamespace:
+        self.requests += 1
+        post_ids = re.findall(r"post_id: (\w+)", messages[0]["content"])
+        logprobs = None
+        if post_ids:
+            labels = {post_id: random.choice(LABELS) for post_id in post_ids if random.random() >= self._drop_rate}
+            answer = json.dumps(labels)
+        elif kwargs.get("logprobs"):
+            label = random.choice(LABELS)
+            answer, logprobs = label.lower(), self._logprobs(label)
+        else:
+            answer = random.choice(LABELS)
+            if random.random() < self._chatty_rate:
+                answer = f"{answer.capitalize()}."
+        # Roughly one token per four characters of output, a constrained answer is a single token
+        tokens = 1 if logprobs else min(max_tokens, len(answer) / 4)
+        time.sleep(self._round_trip + self._per_token * tokens)
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=answer), logprobs=logprobs)],
+            usage=None
+        )
+
+def run(
+    posts: int,
+    batch_size: int,
+    round_trip: float,
+    per_token: float,
+    drop_rate: float,
+    chatty_rate: float,
+    constrained: bool = False
+) -> dict:
+    # Classify `posts` fake posts with the given batch size (or constrained) and return throughput figures
+    storage = FakeStorage(posts)
+    # The OpenAI client refuses to start without a key even though it never sends a request here
+    os.environ.setdefault("API_KEY", "benchmark")
+    model = SentimentModel(model="bench/fake", temperature=0, max_tokens=3, batch_size=batch_size, storage=storage)
+    completions = FakeCompletions(round_trip, per_token, drop_rate, chatty_rate)
+    model._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    model.set_constrained(constrained)
+    model.set_rate_limit(requests_per_minute=10 ** 9, burst=10 ** 9)
+
+    start = time.perf_counter()
+    model.pipeline()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "batch_size": "constrained" if constrained else batch_size,
+        "requests": completions.requests,
+        "invalid": sum(post["sentiment"] == "INVALID" for post in storage.posts.values()),
+        "posts_per_request": round(posts / completions.requests, 2),
+        "posts_per_second": round(posts / elapsed, 2),
+        "seconds": round(elapsed, 2),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark batched sentiment prompts against single-post requests")
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--round-trip", type=float, default=0.05, help="fake request latency in seconds")
+    parser.add_argument("--per-token", type=float, default=0.002, help="fake latency per output token in seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.02, help="share of posts missing from batch answers")
+    parser.add_argument("--chatty-rate", type=float, default=0.05, help="share of single answers that are not a bare label")
+    parser.add_argument("--constrained", action="store_true", help="also run single-token classification with logprobs")
+    args = parser.parse_args()
+
+    for batch_size in args.batch_sizes:
+        print(json.dumps(run(args.posts, batch_size, args.round_trip, args.per_token, args.drop_rate, args.chatty_rate)))
+    if args.constrained:
+        print(json.dumps(run(args.posts, 1, args.round_trip, args.per_token, args.drop_rate, args.chatty_rate, constrained=True)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+end_to_end.py
+
+End-to-end benchmark of the ingest and sentiment paths without live credentials.
+RedditClient.get_new_posts reads from a FakeReddit listing generator and
+OpenRouter.pipeline talks to the local OpenAIStub over HTTP; both write to a
+throwaway Postgres database created on the configured server (DB_* variables of
+config/.env) and dropped afterwards.
+
+For each phase it reports posts/sec, p50/p99 per-post latency, database round-trips
+per post (statements, commits and rollbacks) and peak Python memory (tracemalloc).
+Results are written to benchmarks/results/<timestamp>_<git revision>.json; pass an
+earlier file with --compare to print the relative change of every metric.
+
+Run from the backend directory:
+    python -m benchmarks.end_to_end --subreddits 4 --rounds 5 --latency 0.2 --mode async
+    python -m benchmarks.end_to_end --compare benchmarks/results/<earlier>.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+import tracemalloc
+import uuid
+from collections.abc import Collection, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import connection, cursor
+from dotenv import load_dotenv
+from database.postgresql import ConnectionPool, PostgreSQLClient
+from openrouter.sentiment_model import SentimentModel
+from reddit_api.reddit_client import RedditClient
+from .fake_reddit import FakeReddit
+from .openai_stub import OpenAIStub
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+class RoundTripCounter:
+    """
+    Thread-safe count of database round-trips.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def add(self) -> None:
+        with self._lock:
+            self.value += 1
+
+_round_trips = RoundTripCounter()
+
+class CountingCursor(cursor):
+    """
+    Cursor counting every statement sent to the server.
+    """
+
+    def execute(self, query, vars=None):
+        _round_trips.add()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        _round_trips.add()
+        return super().executemany(query, vars_list)
+
+class CountingConnection(connection):
+    """
+    Connection creating CountingCursors and counting commits and rollbacks.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = CountingCursor
+
+    def commit(self):
+        _round_trips.add()
+        return super().commit()
+
+    def rollback(self):
+        _round_trips.add()
+        return super().rollback()
+
+class TimedStorage(PostgreSQLClient):
+    """
+    PostgreSQLClient recording the time between claiming a post and storing its sentiment.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        super().__init__(pool)
+        self._claimed_at: dict[str, float] = {}
+        self.latencies: list[float] = []
+
+    def iter_unsentimented_posts(
+        self,
+        batch_size: int,
+        lease_seconds: int,
+        worker_id: str,
+        exclude: Collection[str] = ()
+    ) -> Iterator[list[dict]]:
+        for batch in super().iter_unsentimented_posts(batch_size, lease_seconds, worker_id, exclude):
+            now = time.perf_counter()
+            for post in batch:
+                self._claimed_at[post["post_id"]] = now
+            yield batch
+
+    def mark_posts_sentiment(self, results: list[tuple[str, str, str, float | None]]) -> None:
+        super().mark_posts_sentiment(results)
+        now = time.perf_counter()
+        self.latencies.extend(
+            now - self._claimed_at.pop(post_id)
+            for post_id, _, _, _ in results
+            if post_id in self._claimed_at
+        )
+
+@contextmanager
+def throwaway_database(admin_dsn: dict) -> Iterator[dict]:
+    # Create an empty database on the configured server and drop it when the block exits
+    name = f"reddit_bench_{uuid.uuid4().hex[:8]}"
+    admin = psycopg2.connect(**admin_dsn)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+        try:
+            yield {**admin_dsn, "dbname": name}
+        finally:
+            with admin.cursor() as cur:
+                cur.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+    finally:
+        admin.close()
+
+def percentile(values: list[float], q: float) -> float | None:
+    # Nearest-rank percentile, None for an empty sample
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def phase_result(posts: int, elapsed: float, latencies: list[float], round_trips: int, peak_bytes: int) -> dict:
+    # Metrics shared by both phases
+    p50, p99 = percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+    return {
+        "posts": posts,
+        "seconds": round(elapsed, 3),
+        "posts_per_second": round(posts / elapsed, 2) if elapsed else None,
+        "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+        "latency_p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+        "db_round_trips": round_trips,
+        "db_round_trips_per_post": round(round_trips / posts, 3) if posts else None,
+        "peak_memory_mb": round(peak_bytes / 2 ** 20, 2),
+    }
+
+def bench_ingest(storage: PostgreSQLClient, reddit: FakeReddit, subreddits: list[str], rounds: int, limit: int) -> dict:
+    # Poll every subreddit `rounds` times; a post's latency is the duration of the call that stored it
+    client = RedditClient(reddit, database=storage)
+    latencies: list[float] = []
+    round_trips = _round_trips.value
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for subreddit in subreddits:
+            call_start = time.perf_counter()
+            inserted, _ = client.get_new_posts(subreddit, limit)
+            latencies.extend([time.perf_counter() - call_start] * inserted)
+    elapsed = time.perf_counter() - start
+
+    return phase_result(len(latencies), elapsed, latencies, _round_trips.value - round_trips, tracemalloc.get_traced_memory()[1])
+
+def bench_sentiment(storage: TimedStorage, args: argparse.Namespace) -> dict:
+    # Drain the sentiment queue through the stub
+    model = SentimentModel(model="bench/stub", temperature=0, max_tokens=3, batch_size=args.batch_size, storage=storage)
+    model.set_rate_limit(requests_per_minute=args.requests_per_minute, burst=args.concurrency)
+    round_trips = _round_trips.value
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    if args.mode == "async":
+        asyncio.run(model.pipeline_async(concurrency=args.concurrency, claim_size=args.claim_size))
+    else:
+        model.pipeline(claim_size=args.claim_size)
+    elapsed = time.perf_counter() - start
+
+    return phase_result(
+        len(storage.latencies),
+        elapsed,
+        storage.latencies,
+        _round_trips.value - round_trips,
+        tracemalloc.get_traced_memory()[1]
+    )
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(current: dict, baseline: dict) -> None:
+    # Print the relative change of every numeric metric against an earlier run
+    print(f"Compared with {baseline.get('revision')} ({baseline.get('timestamp')}):")
+    for phase in ("ingest", "sentiment"):
+        for metric, value in current.get(phase, {}).items():
+            before = baseline.get(phase, {}).get(metric)
+            if isinstance(value, (int, float)) and isinstance(before, (int, float)) and before:
+                print(f"  {phase}.{metric}: {before} -> {value} ({(value - before) / before:+.1%})")
+
+def run(args: argparse.Namespace) -> dict:
+    # Run both phases against a fresh database and the stub
+    admin_dsn = {
+        "host": os.getenv("DB_HOST"),
+        "dbname": os.getenv("DB_NAME") or "postgres",
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "port": os.getenv("DB_PORT"),
+    }
+    reddit = FakeReddit(fresh_per_listing=args.fresh_per_listing, listing_latency=args.listing_latency)
+    subreddits = [f"bench{num}" for num in range(args.subreddits)]
+
+    with OpenAIStub(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after
+    ) as stub, throwaway_database(admin_dsn) as dsn:
+        os.environ["OPENROUTER_BASE_URL"] = stub.base_url
+        os.environ.setdefault("API_KEY", "benchmark")
+        pool = ConnectionPool(1, args.pool_size, connection_factory=CountingConnection, **dsn)
+        try:
+            storage = TimedStorage(pool)
+            tracemalloc.start()
+            ingest = bench_ingest(storage, reddit, subreddits, args.rounds, args.limit)
+            sentiment = bench_sentiment(storage, args)
+            tracemalloc.stop()
+        finally:
+            pool.close()
+        sentiment["stub"] = dict(stub.counters)
+
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "config": vars(args),
+        "ingest": ingest,
+        "sentiment": sentiment,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of ingest and sentiment analysis")
+    parser.add_argument("--subreddits", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5, help="listing polls per subreddit")
+    parser.add_argument("--limit", type=int, default=100, help="listing size per poll")
+    parser.add_argument("--fresh-per-listing", type=int, default=50, help="new posts between two polls")
+    parser.add_argument("--listing-latency", type=float, default=0.0, help="fake Reddit round-trip in seconds")
+    parser.add_argument("--mode", choices=("sync", "async"), default="async")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--claim-size", type=int, default=100)
+    parser.add_argument("--requests-per-minute", type=float, default=6000)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="uniform extra stub latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of HTTP 500 answers")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of HTTP 429 answers")
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    parser.add_argument("--no-save", action="store_true", help="do not write the result file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if os.path.exists("config/.env"):
+        load_dotenv(dotenv_path="config/.env")
+
+    compare_path, no_save = args.compare, args.no_save
+    del args.compare, args.no_save
+    result = run(args)
+    print(json.dumps(result, indent=2))
+
+    if not no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{result['timestamp']}_{result['revision']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved {path}")
+    if compare_path:
+        with open(compare_path, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+fake_reddit.py
+
+Stand-in for the parts of a PRAW Reddit instance used by RedditClient. Listings are
+generated lazily: before every call to `new()`, `fresh_per_listing` new posts appear
+at the top of the listing, so consecutive polls overlap the way a real /new listing
+does. `params={"before": fullname}` is honoured with Reddit's semantics.
+"""
+
+import itertools
+import random
+import threading
+import time
+
+WORDS = (
+    "market", "launch", "update", "great", "terrible", "question", "help", "news", "release",
+    "love", "hate", "price", "community", "bug", "feature", "thanks", "problem", "amazing",
+)
+# Posts a fake subreddit remembers, older ones disappear from its listing
+KEPT_POSTS = 1000
+
+class FakeSubmission:
+    """
+    Submission with the attributes RedditClient reads.
+    """
+
+    __slots__ = ("id", "name", "subreddit", "created_utc", "title", "selftext")
+
+    def __init__(self, post_id: str, subreddit: str, created_utc: float, title: str, selftext: str):
+        self.id = post_id
+        self.subreddit = subreddit
+        self.name = f"t3_{post_id}"
+        self.created_utc = created_utc
+        self.title = title
+        self.selftext = selftext
+
+class FakeSubreddit:
+    """
+    Subreddit whose /new listing keeps producing fresh posts.
+    """
+
+    def __init__(self, reddit: "FakeReddit", name: str):
+        self._reddit = reddit
+        self.display_name = name
+        self._posts: list[FakeSubmission] = []
+
+    def new(self, limit: int | None = 100, params: dict | None = None):
+        # Newest first; with `before`, the `limit` posts directly newer than it, like Reddit
+        limit = limit or 100
+        before = (params or {}).get("before")
+        # A multireddit ("a+b") gets fresh posts of each of its subreddits
+        parts = self.display_name.split("+")
+        fresh = [self._reddit.make_submission(parts[num % len(parts)]) for num in range(self._reddit.fresh_per_listing * len(parts))]
+        self._posts[:0] = fresh[::-1]
+        del self._posts[KEPT_POSTS:]
+        if self._reddit.listing_latency:
+            time.sleep(self._reddit.listing_latency)
+        listing = self._posts
+        if before is not None:
+            names = [submission.name for submission in listing]
+            listing = listing[:names.index(before)] if before in names else []
+            listing = listing[-limit:]
+        yield from listing[:limit]
+
+class FakeReddit:
+    """
+    Fake PRAW Reddit instance.
+
+    Attributes:
+    - fresh_per_listing: new posts appearing between two listing calls
+    - listing_latency: sleep per listing call, standing in for the API round-trip
+    - body_words: number of words in generated selftexts
+    """
+
+    def __init__(self, fresh_per_listing: int = 50, listing_latency: float = 0.0, body_words: int = 60, seed: int = 0):
+        self.fresh_per_listing = fresh_per_listing
+        self.listing_latency = listing_latency
+        self._body_words = body_words
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._subreddits: dict[str, FakeSubreddit] = {}
+
+    def make_submission(self, subreddit: str) -> FakeSubmission:
+        # Next post in global id order, like Reddit's base36 ids
+        with self._lock:
+            number = next(self._ids)
+            words = [self._random.choice(WORDS) for _ in range(self._body_words)]
+        return FakeSubmission(
+            post_id=f"b{number:07d}",
+            subreddit=subreddit,
+            created_utc=time.time(),
+            title=" ".join(words[:8]).capitalize(),
+            selftext=" ".join(words)
+        )
+
+    def subreddit(self, name: str) -> FakeSubreddit:
+        # Subreddits keep their listing between calls
+        with self._lock:
+            if name not in self._subreddits:
+                self._subreddits[name] = FakeSubreddit(self, name)
+
+            return self._subreddits[name]
@@ -0,0 +1,114 @@
+"""
+logging_benchmark.py
+
+Measures how long pipeline threads spend in logging calls for every logging mode of
+get_config: sync or queue, colour or JSON format, with and without the per call site
+rate limit. Several threads log INFO records with extra fields, the way the sentiment
+workers do. The stream handler writes to os.devnull after sleeping --write-latency
+seconds per record, standing in for a terminal or a container log pipe that applies
+backpressure. Total time includes draining the queue.
+
+Run from the backend directory:
+    python -m benchmarks.logging_benchmark --threads 8 --records 20000 --write-latency 0.0001
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueListener
+from logging_config.colour_logging import CustomFormatted
+from logging_config.json_logging import JsonFormatter
+from logging_config.logging_config import RecordQueueHandler
+from logging_config.rate_limit import RateLimitFilter
+
+class SlowStream:
+    """
+    Writable stream sleeping before every write, like a log pipe that is read slowly.
+    """
+
+    def __init__(self, write_latency: float):
+        self._devnull = open(os.devnull, "w")
+        self._write_latency = write_latency
+
+    def write(self, text: str) -> int:
+        if self._write_latency:
+            time.sleep(self._write_latency)
+        return self._devnull.write(text)
+
+    def flush(self) -> None:
+        self._devnull.flush()
+
+    def close(self) -> None:
+        self._devnull.close()
+
+def run(mode: str, log_format: str, rate_limit: bool, threads: int, records: int, write_latency: float) -> dict:
+    # Log `records` records from each of `threads` threads and return the time spent
+    stream = SlowStream(write_latency)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else CustomFormatted())
+    listener = None
+    if mode == "queue":
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, handler)
+        listener.start()
+        handler = RecordQueueHandler(log_queue)
+    rate_filter = RateLimitFilter(per_second=5, burst=20) if rate_limit else None
+    if rate_filter is not None:
+        handler.addFilter(rate_filter)
+    logger = logging.getLogger(f"bench.{mode}.{log_format}.{rate_limit}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    # Time each thread spends in logging calls, the pipeline waits for this
+    in_calls = [0.0] * threads
+
+    def work(number: int) -> None:
+        start = time.perf_counter()
+        for post in range(records):
+            logger.info(
+                f"Added post p{post:06d} from r/bench",
+                extra={"post_id": f"p{post:06d}", "subreddit": "bench", "model": "bench/fake", "latency": 0.123}
+            )
+        in_calls[number] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=work, args=(number,)) for number in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if listener is not None:
+        listener.stop()
+    total = time.perf_counter() - start
+    logger.removeHandler(handler)
+    stream.close()
+
+    return {
+        "mode": mode,
+        "format": log_format,
+        "rate_limit": rate_limit,
+        "records": threads * records,
+        "written": threads * records - (rate_filter.suppressed if rate_filter is not None else 0),
+        "thread_seconds": round(max(in_calls), 2),
+        "seconds": round(total, 2),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the logging modes")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--records", type=int, default=20000, help="records logged per thread")
+    parser.add_argument("--write-latency", type=float, default=0.0001, help="seconds slept per written record")
+    args = parser.parse_args()
+
+    for mode in ("sync", "queue"):
+        for log_format in ("colour", "json"):
+            for rate_limit in (False, True):
+                print(json.dumps(run(mode, log_format, rate_limit, args.threads, args.records, args.write_latency)))
+
+if __name__ == "__main__":
+    main()
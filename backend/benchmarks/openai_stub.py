@@ -0,0 +1,177 @@
+"""
+openai_stub.py
+
+Local OpenAI-compatible HTTP server answering /v1/chat/completions, for benchmarks
+that exercise the real OpenAI client and network stack without OpenRouter.
+
+Latency, the share of failing requests (HTTP 500) and the share of rate-limited
+requests (HTTP 429 with a Retry-After header) are configurable. Batched prompts are
+answered with a JSON object covering every "post_id: X" line of the prompt.
+
+Run standalone from the backend directory:
+    python -m benchmarks.openai_stub --port 8089 --latency 0.2 --rate-limit-rate 0.05
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LABELS = ("POSITIVE", "NEUTRAL", "NEGATIVE")
+POST_ID_PATTERN = re.compile(r"post_id: (\w+)")
+
+class OpenAIStub:
+    """
+    Threaded HTTP stub of the chat completions endpoint, usable as a context manager.
+
+    Attributes:
+    - latency / jitter: seconds slept before answering, plus a uniform random extra
+    - error_rate: share of requests answered with HTTP 500
+    - rate_limit_rate: share of requests answered with HTTP 429
+    - retry_after: Retry-After value sent with 429 responses
+    - counters: requests, errors and rate_limited counts since start
+
+    Methods:
+    - start / stop: run the server in a background thread
+    - base_url: URL to pass as the OpenAI client base_url
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.1,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 0.5
+    ):
+        # Bind the server, port 0 picks a free port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.counters = {"requests": 0, "errors": 0, "rate_limited": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+    def _answer(self, body: dict) -> dict:
+        # Completion object for a single-post or batched prompt
+        prompt = body["messages"][0]["content"]
+        post_ids = POST_ID_PATTERN.findall(prompt)
+        content = json.dumps({post_id: random.choice(LABELS) for post_id in post_ids}) if post_ids else random.choice(LABELS)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = max(1, len(content) // 4)
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+            def _send(self, status: int, payload: dict, headers: dict | None = None) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                stub._count("requests")
+                time.sleep(stub.latency + random.uniform(0, stub.jitter))
+                roll = random.random()
+                if roll < stub.rate_limit_rate:
+                    stub._count("rate_limited")
+                    self._send(
+                        429,
+                        {"error": {"message": "Rate limit exceeded", "code": 429}},
+                        {"Retry-After": str(stub.retry_after)}
+                    )
+                elif roll < stub.rate_limit_rate + stub.error_rate:
+                    stub._count("errors")
+                    self._send(500, {"error": {"message": "Injected failure", "code": 500}})
+                else:
+                    self._send(200, stub._answer(body))
+
+        return Handler
+
+    def start(self) -> "OpenAIStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "OpenAIStub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible chat completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    args = parser.parse_args()
+
+    stub = OpenAIStub(args.host, args.port, args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.retry_after)
+    print(f"Serving on {stub.base_url}")
+    stub.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+if __name__ == "__main__":
+    main()
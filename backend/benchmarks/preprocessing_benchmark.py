@@ -0,0 +1,110 @@
+"""
+preprocessing_benchmark.py
+
+Measures prompt size per post with and without the TextPreprocessor. Prompts are
+built with SentimentModel._build_prompt and sized with the same characters / 4
+estimate the preprocessor uses for its budget.
+
+Posts come from a synthetic corpus mixing short text posts, link posts, quoted
+replies, markdown megaposts with tables and code, and removed posts, or from a JSON
+lines file with "title" and "content" fields (e.g. exported from the posts table).
+
+Run from the backend directory:
+    python -m benchmarks.preprocessing_benchmark --posts 2000 --max-content-tokens 256
+    python -m benchmarks.preprocessing_benchmark --from-file posts.jsonl
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from openrouter.preprocessing import TextPreprocessor
+from openrouter.sentiment_model import SentimentModel
+
+WORDS = (
+    "the", "market", "is", "looking", "great", "today", "but", "I", "am", "worried", "about", "fees",
+    "new", "release", "broke", "my", "setup", "thanks", "for", "help", "anyone", "else", "seeing", "this",
+)
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def synthetic_posts(count: int, seed: int = 0) -> list[dict]:
+    # Mix of post shapes roughly following a busy subreddit's /new listing
+    rng = random.Random(seed)
+    posts = []
+    for num in range(count):
+        kind = rng.choices(("short", "link", "quote", "megapost", "removed", "empty"), (45, 20, 15, 10, 7, 3))[0]
+        if kind == "short":
+            content = " ".join(_sentence(rng, rng.randint(6, 20)) for _ in range(rng.randint(1, 5)))
+        elif kind == "link":
+            content = f"Found this: https://example.com/{num}/article?utm_source=reddit&ref={num} " + _sentence(rng, 10)
+        elif kind == "quote":
+            content = f"> {_sentence(rng, 30)}\n> {_sentence(rng, 30)}\n\n{_sentence(rng, 12)}"
+        elif kind == "megapost":
+            table = "| coin | price | change |\n|---|---|---|\n" + "".join(
+                f"| c{i} | {rng.randint(1, 999)} | {rng.randint(-20, 20)}% |\n" for i in range(30)
+            )
+            code = "```python\n" + "".join(f"value_{i} = compute({i})\n" for i in range(40)) + "```\n"
+            prose = "\n\n".join(f"## Section {i}\n**{_sentence(rng, 8)}** " + _sentence(rng, 60) for i in range(8))
+            content = f"{prose}\n\n{table}\n{code}\n[source](https://example.com/data/{num})"
+        elif kind == "removed":
+            content = rng.choice(("[removed]", "[deleted]"))
+        else:
+            content = ""
+        posts.append({
+            "post_id": f"s{num:06d}",
+            "title": _sentence(rng, rng.randint(4, 14)) if kind != "empty" else "",
+            "content": content,
+            "subreddit": "bench",
+        })
+
+    return posts
+
+def load_posts(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [
+            {"post_id": str(num), "subreddit": "bench", **json.loads(line)}
+            for num, line in enumerate(f)
+            if line.strip()
+        ]
+
+def run(posts: list[dict], preprocessor: TextPreprocessor) -> dict:
+    # Prompt token estimates per post before and after preprocessing
+    os.environ.setdefault("API_KEY", "benchmark")
+    model = SentimentModel(model="bench/fake", temperature=0, max_tokens=3, storage=object())
+    before = [TextPreprocessor.estimate_tokens(model._build_prompt(**post)) for post in posts]
+
+    start = time.perf_counter()
+    prepared = [preprocessor.prepare(post) for post in posts]
+    elapsed = time.perf_counter() - start
+    after = [TextPreprocessor.estimate_tokens(model._build_prompt(**post)) for post in prepared if post is not None]
+    sent_before = sum(before)
+
+    return {
+        "posts": len(posts),
+        "skipped": len(posts) - len(after),
+        "tokens_per_post_before": round(statistics.mean(before), 1),
+        "tokens_per_post_after": round(sum(after) / len(posts), 1),
+        "p99_tokens_before": sorted(before)[int(0.99 * (len(before) - 1))],
+        "p99_tokens_after": sorted(after)[int(0.99 * (len(after) - 1))] if after else 0,
+        "prompt_tokens_saved": f"{1 - sum(after) / sent_before:.1%}" if sent_before else "0%",
+        "preprocessing_us_per_post": round(elapsed / len(posts) * 1e6, 1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prompt tokens per post before and after preprocessing")
+    parser.add_argument("--posts", type=int, default=2000, help="size of the synthetic corpus")
+    parser.add_argument("--from-file", help="JSON lines file with title and content fields")
+    parser.add_argument("--max-content-tokens", type=int, default=256)
+    parser.add_argument("--max-title-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    posts = load_posts(args.from_file) if args.from_file else synthetic_posts(args.posts)
+    preprocessor = TextPreprocessor(max_content_tokens=args.max_content_tokens, max_title_tokens=args.max_title_tokens)
+    print(json.dumps(run(posts, preprocessor), indent=2))
+
+if __name__ == "__main__":
+    main()
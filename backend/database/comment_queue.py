@@ -0,0 +1,74 @@
+"""
+comment_queue.py
+
+This module defines the CommentQueue class, which lets the sentiment pipeline work on
+the comments table without knowing about it. It exposes the work queue methods the
+pipeline calls on PostgreSQLClient (claiming, storing results, releasing leases,
+backlog size) and maps them to their comment counterparts. Claimed comments use the
+pipeline's post format: the comment_id as post_id, the body as content and an empty
+title, so a comment is classified on its own text.
+
+Everything else (the sentiment cache, the test post used to probe models) is
+delegated to the wrapped client unchanged.
+"""
+
+from collections.abc import Collection, Iterator
+from .postgresql import PostgreSQLClient
+
+class CommentQueue:
+    """
+    Comment work queue with the interface of PostgreSQLClient's post work queue.
+
+    Attributes:
+    - _client: PostgreSQLClient doing the actual queries
+
+    Methods:
+    - claim_unsentimented_posts / iter_unsentimented_posts: claim comments without sentiment
+    - mark_posts_sentiment: store comment sentiments
+    - release_posts: release comment leases
+    - has_posts / count_backlog: comment counterparts of the post queue checks
+    """
+
+    queue = "comments"
+
+    def __init__(self, client: PostgreSQLClient | None = None):
+        self._client = client or PostgreSQLClient()
+
+    def __getattr__(self, name: str):
+        # Methods without a comment counterpart are served by the wrapped client
+        return getattr(self._client, name)
+
+    def claim_unsentimented_posts(
+        self,
+        limit: int,
+        lease_seconds: int,
+        worker_id: str,
+        exclude: Collection[str] = ()
+    ) -> list[dict]:
+        return self._client.claim_unsentimented_comments(limit, lease_seconds, worker_id, exclude)
+
+    def iter_unsentimented_posts(
+        self,
+        batch_size: int,
+        lease_seconds: int,
+        worker_id: str,
+        exclude: Collection[str] = ()
+    ) -> Iterator[list[dict]]:
+        # Yield claimed batches until no unclaimed comment without sentiment is left
+        while True:
+            comments = self.claim_unsentimented_posts(batch_size, lease_seconds, worker_id, exclude)
+            if not comments:
+                return
+            yield comments
+
+    def mark_posts_sentiment(self, results: list[tuple[str, str, str, float | None]]) -> None:
+        self._client.mark_comments_sentiment(results)
+
+    def release_posts(self, post_ids: list[str]) -> None:
+        self._client.release_comments(post_ids)
+
+    def has_posts(self) -> bool:
+        return self._client.has_comments()
+
+    def count_backlog(self, cap: int = 100000) -> int:
+        return self._client.count_comment_backlog(cap)
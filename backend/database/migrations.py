@@ -0,0 +1,644 @@
+"""
+migrations.py
+
+This module contains the versioned schema migrations of the backend database and
+the tooling around them.
+
+Every migration has a version number and runs exactly once per database; applied
+versions are recorded in the schema_migrations table. Migrations are applied under
+a session advisory lock, so processes starting at the same time do not race. The
+lock is polled in autocommit mode: a process waiting for it inside a statement or
+transaction would hold a snapshot, and CREATE INDEX CONCURRENTLY in the process
+holding the lock waits for every older snapshot, so the two would deadlock.
+Transactional migrations run in one transaction together with their bookkeeping row;
+non-transactional ones (CREATE INDEX CONCURRENTLY) run statement by statement in
+autocommit mode and are written to be safely re-runnable: an INVALID index left by
+a failed build is dropped before the statement runs again.
+
+check_query_plans runs EXPLAIN on the hot pipeline and dashboard queries and
+reports which index each of them uses.
+
+Usage (from the backend directory):
+    python -m database.migrations          # apply pending migrations
+    python -m database.migrations --check  # apply, then verify query plans
+"""
+
+import argparse
+import json
+import logging
+import re
+import time
+from dotenv import load_dotenv
+
+MIGRATIONS_LOCK_ID = 7245001
+LOCK_POLL_INTERVAL = 1.0
+CONCURRENT_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+class Migration:
+    """
+    A single schema change.
+
+    Attributes:
+    - version: unique, increasing version number
+    - name: short description stored in schema_migrations
+    - statements: SQL statements executed in order
+    - transactional: False for statements that cannot run inside a transaction
+    """
+
+    def __init__(self, version: int, name: str, statements: list[str], transactional: bool = True):
+        self.version = version
+        self.name = name
+        self.statements = statements
+        self.transactional = transactional
+
+MIGRATIONS = [
+    Migration(1, "posts, work queue lease columns and sentiment cache", [
+        '''
+        CREATE TABLE IF NOT EXISTS posts (
+            id SERIAL PRIMARY KEY,
+            post_id TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL,
+            subreddit TEXT,
+            title TEXT,
+            content TEXT,
+            sentiment TEXT,
+            model_version TEXT
+        );
+        ''',
+        '''
+        ALTER TABLE posts
+            ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+            ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ;
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sentiment_cache (
+            content_hash TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            prompt_version TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (content_hash, model_version, prompt_version)
+        );
+        ''',
+    ]),
+    # Statement-level triggers aggregate the delta of a whole bulk UPDATE before touching
+    # the rollup, so a batch of N labels costs one upsert per (subreddit, label, hour).
+    # Updates that do not touch sentiment (e.g. lease changes) cancel out to no rows
+    Migration(2, "hourly sentiment_rollup maintained by triggers", [
+        '''
+        CREATE TABLE IF NOT EXISTS sentiment_rollup (
+            subreddit TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            bucket TIMESTAMPTZ NOT NULL,
+            count BIGINT NOT NULL,
+            PRIMARY KEY (subreddit, sentiment, model_version, bucket)
+        );
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION posts_rollup_delta() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO sentiment_rollup AS r (subreddit, sentiment, model_version, bucket, count)
+                SELECT COALESCE(subreddit, ''), sentiment, COALESCE(model_version, ''),
+                       date_trunc('hour', created_at), count(*)
+                FROM new_rows WHERE sentiment IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (subreddit, sentiment, model_version, bucket)
+                DO UPDATE SET count = r.count + EXCLUDED.count;
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO sentiment_rollup AS r (subreddit, sentiment, model_version, bucket, count)
+                SELECT subreddit, sentiment, model_version, bucket, sum(delta)
+                FROM (
+                    SELECT COALESCE(subreddit, '') AS subreddit, sentiment,
+                           COALESCE(model_version, '') AS model_version,
+                           date_trunc('hour', created_at) AS bucket, -1 AS delta
+                    FROM old_rows WHERE sentiment IS NOT NULL
+                    UNION ALL
+                    SELECT COALESCE(subreddit, ''), sentiment, COALESCE(model_version, ''),
+                           date_trunc('hour', created_at), 1
+                    FROM new_rows WHERE sentiment IS NOT NULL
+                ) AS deltas
+                GROUP BY 1, 2, 3, 4
+                HAVING sum(delta) <> 0
+                ON CONFLICT (subreddit, sentiment, model_version, bucket)
+                DO UPDATE SET count = r.count + EXCLUDED.count;
+            ELSE
+                UPDATE sentiment_rollup AS r SET count = r.count - deleted.count
+                FROM (
+                    SELECT COALESCE(subreddit, '') AS subreddit, sentiment,
+                           COALESCE(model_version, '') AS model_version,
+                           date_trunc('hour', created_at) AS bucket, count(*) AS count
+                    FROM old_rows WHERE sentiment IS NOT NULL
+                    GROUP BY 1, 2, 3, 4
+                ) AS deleted
+                WHERE r.subreddit = deleted.subreddit AND r.sentiment = deleted.sentiment
+                    AND r.model_version = deleted.model_version AND r.bucket = deleted.bucket;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        ''',
+        '''
+        DROP TRIGGER IF EXISTS posts_rollup_insert ON posts;
+        CREATE TRIGGER posts_rollup_insert AFTER INSERT ON posts
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION posts_rollup_delta();
+        DROP TRIGGER IF EXISTS posts_rollup_update ON posts;
+        CREATE TRIGGER posts_rollup_update AFTER UPDATE ON posts
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION posts_rollup_delta();
+        DROP TRIGGER IF EXISTS posts_rollup_delete ON posts;
+        CREATE TRIGGER posts_rollup_delete AFTER DELETE ON posts
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION posts_rollup_delta();
+        ''',
+        # The triggers hold a lock on 'posts' until commit, so no write slips between this
+        # snapshot and the triggers taking over. Databases filled before migrations existed
+        # already have a populated rollup and are skipped
+        '''
+        INSERT INTO sentiment_rollup (subreddit, sentiment, model_version, bucket, count)
+        SELECT COALESCE(subreddit, ''), sentiment, COALESCE(model_version, ''),
+               date_trunc('hour', created_at), count(*)
+        FROM posts
+        WHERE sentiment IS NOT NULL AND NOT EXISTS (SELECT 1 FROM sentiment_rollup)
+        GROUP BY 1, 2, 3, 4;
+        ''',
+    ]),
+    # Indexes for the hot queries, built without blocking ingestion:
+    # - the work queue claim scans unsentimented rows in id order,
+    # - per-subreddit sentiment queries filter on subreddit and sentiment, optionally by time,
+    # - time range scans over append-only created_at are served by a tiny BRIN index
+    Migration(3, "work queue, subreddit/sentiment and created_at indexes", [
+        '''
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS posts_unsentimented_idx
+            ON posts (id) WHERE sentiment IS NULL;
+        ''',
+        '''
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS posts_subreddit_sentiment_created_idx
+            ON posts (subreddit, sentiment, created_at);
+        ''',
+        '''
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS posts_created_at_brin
+            ON posts USING brin (created_at);
+        ''',
+    ], transactional=False),
+    # Per-subreddit high-water marks and adaptive poll schedule for incremental fetching
+    Migration(4, "subreddit cursors", [
+        '''
+        CREATE TABLE IF NOT EXISTS subreddit_cursors (
+            subreddit TEXT PRIMARY KEY,
+            last_fullname TEXT,
+            last_created_utc DOUBLE PRECISION,
+            posts_per_hour DOUBLE PRECISION NOT NULL DEFAULT 0,
+            last_polled_utc DOUBLE PRECISION,
+            next_poll_utc DOUBLE PRECISION
+        );
+        ''',
+    ]),
+    # Wake up sentiment workers (LISTEN posts_inserted) when new posts are committed
+    Migration(5, "posts_inserted notification", [
+        '''
+        CREATE OR REPLACE FUNCTION posts_notify_inserted() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            inserted BIGINT;
+        BEGIN
+            SELECT count(*) INTO inserted FROM new_rows;
+            IF inserted > 0 THEN
+                PERFORM pg_notify('posts_inserted', inserted::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+        ''',
+        '''
+        DROP TRIGGER IF EXISTS posts_notify_insert ON posts;
+        CREATE TRIGGER posts_notify_insert AFTER INSERT ON posts
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION posts_notify_inserted();
+        ''',
+    ]),
+    # Change marker for dashboard caches: the rollup triggers stamp every row they touch,
+    # so max(updated_at) is a single index lookup that moves whenever the numbers do.
+    # Migration 15 replaces the transaction start time used here with the statement time
+    Migration(6, "sentiment_rollup change marker", [
+        '''
+        ALTER TABLE sentiment_rollup
+            ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS sentiment_rollup_updated_at_idx
+            ON sentiment_rollup (updated_at);
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION posts_rollup_delta() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO sentiment_rollup AS r (subreddit, sentiment, model_version, bucket, count)
+                SELECT COALESCE(subreddit, ''), sentiment, COALESCE(model_version, ''),
+                       date_trunc('hour', created_at), count(*)
+                FROM new_rows WHERE sentiment IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (subreddit, sentiment, model_version, bucket)
+                DO UPDATE SET count = r.count + EXCLUDED.count, updated_at = now();
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO sentiment_rollup AS r (subreddit, sentiment, model_version, bucket, count)
+                SELECT subreddit, sentiment, model_version, bucket, sum(delta)
+                FROM (
+                    SELECT COALESCE(subreddit, '') AS subreddit, sentiment,
+                           COALESCE(model_version, '') AS model_version,
+                           date_trunc('hour', created_at) AS bucket, -1 AS delta
+                    FROM old_rows WHERE sentiment IS NOT NULL
+                    UNION ALL
+                    SELECT COALESCE(subreddit, ''), sentiment, COALESCE(model_version, ''),
+                           date_trunc('hour', created_at), 1
+                    FROM new_rows WHERE sentiment IS NOT NULL
+                ) AS deltas
+                GROUP BY 1, 2, 3, 4
+                HAVING sum(delta) <> 0
+                ON CONFLICT (subreddit, sentiment, model_version, bucket)
+                DO UPDATE SET count = r.count + EXCLUDED.count, updated_at = now();
+            ELSE
+                UPDATE sentiment_rollup AS r SET count = r.count - deleted.count, updated_at = now()
+                FROM (
+                    SELECT COALESCE(subreddit, '') AS subreddit, sentiment,
+                           COALESCE(model_version, '') AS model_version,
+                           date_trunc('hour', created_at) AS bucket, count(*) AS count
+                    FROM old_rows WHERE sentiment IS NOT NULL
+                    GROUP BY 1, 2, 3, 4
+                ) AS deleted
+                WHERE r.subreddit = deleted.subreddit AND r.sentiment = deleted.sentiment
+                    AND r.model_version = deleted.model_version AND r.bucket = deleted.bucket;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        ''',
+    ]),
+    # Comments of stored posts with their own work queue. depth is NULL when unknown
+    # (replies taken from the subreddit comment listing). posts.comments_fetched_at marks
+    # posts whose comment tree was fetched in threads mode
+    Migration(7, "comments", [
+        '''
+        CREATE TABLE IF NOT EXISTS comments (
+            id BIGSERIAL PRIMARY KEY,
+            comment_id TEXT UNIQUE NOT NULL,
+            post_id TEXT NOT NULL REFERENCES posts (post_id) ON DELETE CASCADE,
+            parent_id TEXT,
+            depth SMALLINT,
+            created_at TIMESTAMPTZ NOT NULL,
+            subreddit TEXT,
+            body TEXT,
+            sentiment TEXT,
+            model_version TEXT,
+            claimed_by TEXT,
+            claimed_until TIMESTAMPTZ
+        );
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS comments_unsentimented_idx ON comments (id) WHERE sentiment IS NULL;
+        CREATE INDEX IF NOT EXISTS comments_post_id_idx ON comments (post_id);
+        ''',
+        '''
+        ALTER TABLE posts ADD COLUMN IF NOT EXISTS comments_fetched_at TIMESTAMPTZ;
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION comments_notify_inserted() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            inserted BIGINT;
+        BEGIN
+            SELECT count(*) INTO inserted FROM new_rows;
+            IF inserted > 0 THEN
+                PERFORM pg_notify('comments_inserted', inserted::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+        ''',
+        '''
+        DROP TRIGGER IF EXISTS comments_notify_insert ON comments;
+        CREATE TRIGGER comments_notify_insert AFTER INSERT ON comments
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION comments_notify_inserted();
+        ''',
+    ]),
+    # High-water marks of incremental exports (export/parquet_export.py)
+    Migration(8, "export checkpoints", [
+        '''
+        CREATE TABLE IF NOT EXISTS export_checkpoints (
+            name TEXT PRIMARY KEY,
+            last_id BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        ''',
+    ]),
+    # Historical backfill: per subreddit and listing paging checkpoints, and a queue priority
+    # so backfilled posts are classified after fresh ones (higher priority is claimed first)
+    Migration(9, "backfill checkpoints and work queue priority", [
+        '''
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            subreddit TEXT NOT NULL,
+            listing TEXT NOT NULL,
+            after_fullname TEXT,
+            oldest_created_utc DOUBLE PRECISION,
+            pages INTEGER NOT NULL DEFAULT 0,
+            posts INTEGER NOT NULL DEFAULT 0,
+            done BOOLEAN NOT NULL DEFAULT false,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (subreddit, listing)
+        );
+        ''',
+        '''
+        ALTER TABLE posts ADD COLUMN IF NOT EXISTS priority SMALLINT NOT NULL DEFAULT 0;
+        ''',
+    ]),
+    # The claim orders the queue by priority, then id. posts_unsentimented_idx stays for
+    # min(id) and backlog counts
+    Migration(10, "work queue priority index", [
+        '''
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS posts_queue_priority_idx
+            ON posts (priority DESC, id) WHERE sentiment IS NULL;
+        ''',
+    ], transactional=False),
+    # Shadow re-classification (evaluation/shadow.py): one row per run with its selection,
+    # paging position and counters, and the candidate's labels next to a snapshot of the
+    # production labels they are compared with. posts keeps its labels until a promote
+    Migration(11, "shadow re-classification runs", [
+        '''
+        CREATE TABLE IF NOT EXISTS shadow_runs (
+            run_id TEXT PRIMARY KEY,
+            model_version TEXT NOT NULL,
+            selection JSONB NOT NULL,
+            until_id BIGINT NOT NULL,
+            last_id BIGINT NOT NULL DEFAULT 0,
+            requests INTEGER NOT NULL DEFAULT 0,
+            posts INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            promoted_at TIMESTAMPTZ
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS shadow_sentiments (
+            run_id TEXT NOT NULL REFERENCES shadow_runs (run_id) ON DELETE CASCADE,
+            id BIGINT NOT NULL,
+            post_id TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            production_sentiment TEXT,
+            production_model_version TEXT,
+            PRIMARY KEY (run_id, id)
+        );
+        ''',
+    ]),
+    # Probability of the stored label: the normalized logprob of constrained classification or
+    # the lexicon model's confidence, NULL for labels without one (text answers, cache hits)
+    Migration(12, "label confidence", [
+        '''
+        ALTER TABLE posts ADD COLUMN IF NOT EXISTS confidence REAL;
+        ALTER TABLE comments ADD COLUMN IF NOT EXISTS confidence REAL;
+        ALTER TABLE shadow_sentiments ADD COLUMN IF NOT EXISTS confidence REAL;
+        ''',
+    ]),
+    # Prompt settings a shadow run was started with (batch size, constrained mode), reused on resume
+    Migration(13, "shadow run settings", [
+        '''
+        ALTER TABLE shadow_runs ADD COLUMN IF NOT EXISTS settings JSONB NOT NULL DEFAULT '{}'::jsonb;
+        ''',
+    ]),
+    # Wall-clock insert time of a post, which bounds the incremental export: a post inserted by a
+    # transaction that is still open has a lower id than posts committed after it. Existing rows
+    # keep NULL (they are long committed), so adding the column does not rewrite the table
+    Migration(14, "post insert time", [
+        '''
+        ALTER TABLE posts ADD COLUMN IF NOT EXISTS inserted_at TIMESTAMPTZ;
+        ALTER TABLE posts ALTER COLUMN inserted_at SET DEFAULT clock_timestamp();
+        ''',
+    ]),
+    # now() is the start of the transaction: a long transaction committing after the dashboard
+    # read max(updated_at) would stamp its rollup rows with an older time and never move the
+    # marker. The triggers run when the labels are written, right before the commit of the
+    # short pipeline transactions, so the statement time orders their changes by commit
+    Migration(15, "sentiment_rollup change marker at statement time", [
+        '''
+        ALTER TABLE sentiment_rollup ALTER COLUMN updated_at SET DEFAULT clock_timestamp();
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION posts_rollup_delta() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO sentiment_rollup AS r (subreddit, sentiment, model_version, bucket, count)
+                SELECT COALESCE(subreddit, ''), sentiment, COALESCE(model_version, ''),
+                       date_trunc('hour', created_at), count(*)
+                FROM new_rows WHERE sentiment IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (subreddit, sentiment, model_version, bucket)
+                DO UPDATE SET count = r.count + EXCLUDED.count, updated_at = clock_timestamp();
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO sentiment_rollup AS r (subreddit, sentiment, model_version, bucket, count)
+                SELECT subreddit, sentiment, model_version, bucket, sum(delta)
+                FROM (
+                    SELECT COALESCE(subreddit, '') AS subreddit, sentiment,
+                           COALESCE(model_version, '') AS model_version,
+                           date_trunc('hour', created_at) AS bucket, -1 AS delta
+                    FROM old_rows WHERE sentiment IS NOT NULL
+                    UNION ALL
+                    SELECT COALESCE(subreddit, ''), sentiment, COALESCE(model_version, ''),
+                           date_trunc('hour', created_at), 1
+                    FROM new_rows WHERE sentiment IS NOT NULL
+                ) AS deltas
+                GROUP BY 1, 2, 3, 4
+                HAVING sum(delta) <> 0
+                ON CONFLICT (subreddit, sentiment, model_version, bucket)
+                DO UPDATE SET count = r.count + EXCLUDED.count, updated_at = clock_timestamp();
+            ELSE
+                UPDATE sentiment_rollup AS r SET count = r.count - deleted.count, updated_at = clock_timestamp()
+                FROM (
+                    SELECT COALESCE(subreddit, '') AS subreddit, sentiment,
+                           COALESCE(model_version, '') AS model_version,
+                           date_trunc('hour', created_at) AS bucket, count(*) AS count
+                    FROM old_rows WHERE sentiment IS NOT NULL
+                    GROUP BY 1, 2, 3, 4
+                ) AS deleted
+                WHERE r.subreddit = deleted.subreddit AND r.sentiment = deleted.sentiment
+                    AND r.model_version = deleted.model_version AND r.bucket = deleted.bucket;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        ''',
+    ]),
+]
+
+# Hot queries and the index each of them is expected to use
+QUERY_PLAN_CHECKS = {
+    "work queue claim": (
+        "SELECT id FROM posts WHERE sentiment IS NULL "
+        "AND (claimed_until IS NULL OR claimed_until < now()) AND post_id <> ALL(ARRAY['abc']) "
+        "ORDER BY priority DESC, id LIMIT 100",
+        "posts_queue_priority_idx"
+    ),
+    "existing post ids": (
+        "SELECT post_id FROM posts WHERE post_id = ANY(ARRAY['abc', 'def'])",
+        "posts_post_id_key"
+    ),
+    "subreddit sentiment counts": (
+        "SELECT sentiment, count(*) FROM posts WHERE subreddit = 'python' "
+        "AND sentiment IN ('POSITIVE', 'NEUTRAL', 'NEGATIVE') GROUP BY sentiment",
+        "posts_subreddit_sentiment_created_idx"
+    ),
+    "dashboard stats": (
+        "SELECT sentiment, sum(count) FROM sentiment_rollup WHERE subreddit = 'python' "
+        "AND sentiment IN ('POSITIVE', 'NEUTRAL', 'NEGATIVE') GROUP BY sentiment",
+        "sentiment_rollup_pkey"
+    ),
+    "comment work queue claim": (
+        "SELECT id FROM comments WHERE sentiment IS NULL "
+        "AND (claimed_until IS NULL OR claimed_until < now()) AND comment_id <> ALL(ARRAY['abc']) "
+        "ORDER BY id LIMIT 100",
+        "comments_unsentimented_idx"
+    ),
+    "dashboard change marker": (
+        "SELECT max(updated_at) FROM sentiment_rollup",
+        "sentiment_rollup_updated_at_idx"
+    ),
+    "export upper bound": (
+        "SELECT id FROM posts WHERE inserted_at IS NULL OR inserted_at < now() - interval '300 seconds' "
+        "ORDER BY id DESC LIMIT 1",
+        "posts_pkey"
+    ),
+    "shadow run page": (
+        "SELECT id FROM posts WHERE id > 1000 AND id <= 51000 "
+        "AND sentiment IS NOT NULL AND sentiment <> 'SKIPPED' ORDER BY id LIMIT 500",
+        "posts_pkey"
+    ),
+}
+
+def _acquire_lock(cur) -> None:
+    # Poll the advisory lock with short autocommit statements, never waiting inside one
+    while True:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+        if cur.fetchone()[0]:
+            return
+        time.sleep(LOCK_POLL_INTERVAL)
+
+def _drop_invalid_index(cur, statement: str) -> None:
+    # IF NOT EXISTS would keep an INVALID index left by a failed concurrent build, drop it first
+    match = CONCURRENT_INDEX.search(statement)
+    if match is None:
+        return
+    cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (match.group(1),))
+    row = cur.fetchone()
+    if row is not None and not row[0]:
+        logging.warning(f"Dropping invalid index {match.group(1)} left by a failed migration")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+
+def apply_migrations(pool: "ConnectionPool") -> list[int]:
+    """
+    Apply all pending migrations in version order, returns the applied versions.
+    """
+    applied = []
+    with pool.connection() as conn:
+        conn.rollback()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                _acquire_lock(cur)
+                try:
+                    cur.execute('''
+                        CREATE TABLE IF NOT EXISTS schema_migrations (
+                            version INTEGER PRIMARY KEY,
+                            name TEXT NOT NULL,
+                            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                        );
+                    ''')
+                    cur.execute("SELECT version FROM schema_migrations")
+                    done = {row[0] for row in cur.fetchall()}
+
+                    for migration in MIGRATIONS:
+                        if migration.version in done:
+                            continue
+                        logging.info(f"Applying migration {migration.version}: {migration.name}")
+                        conn.autocommit = not migration.transactional
+                        try:
+                            for statement in migration.statements:
+                                if not migration.transactional:
+                                    _drop_invalid_index(cur, statement)
+                                cur.execute(statement)
+                            cur.execute(
+                                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                                (migration.version, migration.name)
+                            )
+                            if migration.transactional:
+                                conn.commit()
+                        finally:
+                            conn.rollback()
+                            conn.autocommit = True
+                        applied.append(migration.version)
+                finally:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+        finally:
+            # The pool hands out connections in transaction mode
+            if not conn.closed:
+                conn.autocommit = False
+
+    return applied
+
+def _index_names(plan: dict) -> set[str]:
+    # Collect every index referenced anywhere in an EXPLAIN (FORMAT JSON) plan tree
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+
+    return names
+
+def check_query_plans(pool: "ConnectionPool") -> dict[str, tuple[bool, list[str]]]:
+    """
+    EXPLAIN every hot query and report whether it uses its expected index.
+    Sequential scans are disabled for the check, because on a small table the planner
+    rightly prefers them; the check verifies that the index is usable, not preferred.
+    Returns name -> (uses expected index, indexes used).
+    """
+    results = {}
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off")
+            for name, (query, index) in QUERY_PLAN_CHECKS.items():
+                cur.execute(f"EXPLAIN (FORMAT JSON) {query}")
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                used = sorted(_index_names(plan[0]["Plan"]))
+                results[name] = (index in used, used)
+        conn.rollback()
+
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--check", action="store_true", help="verify that hot queries use their indexes")
+    args = parser.parse_args()
+
+    # Imported here, postgresql.py itself imports this module
+    from .postgresql import get_pool
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv(dotenv_path="config/.env")
+    pool = get_pool()
+    applied = apply_migrations(pool)
+    print(f"Applied migrations: {applied or 'none'}")
+
+    if args.check:
+        failed = False
+        for name, (ok, used) in check_query_plans(pool).items():
+            print(f"{'OK  ' if ok else 'FAIL'} {name}: {used or 'no index'}")
+            failed |= not ok
+        if failed:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+pool.py
+
+This module contains the ConnectionPool class, the thread-safe PostgreSQL connection
+pool of the backend processes and the dashboard. It depends on psycopg2 only, so the
+dashboard imports it without the rest of the backend.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+import psycopg2
+from psycopg2.extensions import connection
+from psycopg2.pool import ThreadedConnectionPool
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool shared by all components of the process.
+
+    Wraps psycopg2's ThreadedConnectionPool and adds:
+    - blocking checkout: callers wait for a free connection instead of getting PoolError,
+    - health checks: a connection idle for longer than `health_check_interval` seconds
+      is pinged before being handed out, and replaced if the ping fails,
+    - reconnect on failure: connections that raised OperationalError/InterfaceError
+      are closed and dropped from the pool, so the next checkout opens a fresh one.
+
+    Methods:
+    - connection: context manager yielding a connection, committing on success
+    - close: closes all connections of the pool
+    """
+
+    def __init__(self, minconn: int, maxconn: int, health_check_interval: float = 30, **dsn):
+        # Initialize the underlying pool and checkout bookkeeping
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._health_check_interval = health_check_interval
+        self._last_used: dict[int, float] = {}
+        self.schema_ready = False
+
+    def _is_healthy(self, conn: connection) -> bool:
+        # Cheap liveness check, recently used connections are trusted without a round-trip
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0) < self._health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn: connection) -> None:
+        # Close a broken connection and remove it from the pool
+        self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def _checkout(self) -> connection:
+        # Get a healthy connection, replacing broken ones
+        for _ in range(3):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            logging.warning("Dropping broken database connection")
+            self._discard(conn)
+
+        return self._pool.getconn()
+
+    @contextmanager
+    def connection(self) -> Iterator[connection]:
+        # Check out a connection for the duration of one transaction
+        self._slots.acquire()
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+                conn.commit()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self._discard(conn)
+                raise
+            except BaseException:
+                if not conn.closed:
+                    conn.rollback()
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+                raise
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        # Close every connection of the pool
+        self._pool.closeall()
@@ -2,138 +2,845 @@
 postgresql.py
 
 This module contains the PostgreSQLClient class responsible for managing
-connections and operations with a PostgreSQL database for storing Reddit posts
-and their sentiment analysis results.
+operations with a PostgreSQL database for storing Reddit posts and their
+sentiment analysis results, and the process-wide ConnectionPool (pool.py) it
+draws connections from.
 
-The class provides methods to create the necessary table, insert new posts,
-check existence, update sentiment information, and query posts for analysis.
+The schema itself is managed by the versioned migrations in migrations.py.
+The class provides methods to insert new posts
+(one at a time or in bulk), check existence, update sentiment information,
+and query posts for analysis. Per-hour sentiment counts are kept in the
+sentiment_rollup table by triggers on 'posts', for the dashboard to read.
+Every public method is timed in the db_query_seconds metric.
 """
 
 import datetime
-import psycopg2
+import threading
+from collections.abc import Collection, Iterator
+from contextlib import contextmanager
+from psycopg2.extensions import cursor
+from psycopg2.extras import Json, execute_values
 import os
+import logging
+from monitoring.metrics import DB_QUERY_SECONDS, timed_methods
+from .migrations import apply_migrations
+from .pool import ConnectionPool
 
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the process-wide connection pool, creating it on first use.
+    Pool size is configured with the DB_POOL_MIN and DB_POOL_MAX environment variables.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                minconn=int(os.getenv("DB_POOL_MIN", 1)),
+                maxconn=int(os.getenv("DB_POOL_MAX", 10)),
+                host=os.getenv("DB_HOST"),
+                dbname=os.getenv("DB_NAME"),
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASSWORD"),
+                port=os.getenv("DB_PORT")
+            )
+
+        return _pool
+
+def close_pool() -> None:
+    """
+    Close the process-wide connection pool, e.g. on shutdown.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+@timed_methods(DB_QUERY_SECONDS)
 class PostgreSQLClient:
     """
-    PostgreSQLClient handles the connection to the PostgreSQL database
-    and provides methods to manage Reddit posts and their sentiment data.
+    PostgreSQLClient provides methods to manage Reddit posts and their sentiment data.
+    Every method checks out its own connection from the shared pool, so one instance
+    can be used from several threads.
 
     Key methods:
-    - __init__: Initializes the connection and creates the posts table if it does not exist.
-    - close: Closes the cursor and connection.
+    - __init__: Attaches to the connection pool and applies pending schema migrations.
+    - close: Kept for compatibility, connections belong to the shared pool.
     - post_exists: Checks if a post with a given post_id exists in the database.
     - add_post: Inserts a new post record into the database.
+    - get_existing_post_ids: Returns which of the given post_ids are already stored, in one query.
+    - add_posts: Bulk inserts posts in one statement and transaction, skipping existing post_ids.
     - update_post_sentiment: Updates the sentiment and model version of a post.
-    - get_unsentimented_posts: Retrieves all post_ids that have no sentiment assigned yet.
+    - claim_unsentimented_posts: Leases a batch of posts without sentiment to one worker.
+    - claim_posts: Leases specific posts (e.g. just ingested ones) to one worker.
+    - iter_unsentimented_posts: Generator claiming batches until the queue is drained.
+    - mark_posts_sentiment: Stores sentiments of claimed posts in bulk and releases their lease.
+    - release_posts: Releases the lease of posts that could not be analyzed.
+    - get_existing_comment_ids, count_comments_per_post, add_comments: Comment ingestion counterparts.
+    - claim_posts_for_comments: Picks posts whose comment trees are due for fetching.
+    - claim_unsentimented_comments, mark_comments_sentiment, release_comments, has_comments,
+      count_comment_backlog: Comment work queue, used by the pipeline through CommentQueue.
+    - get_subreddit_cursors: Returns the stored high-water marks and poll schedules of all subreddits.
+    - save_subreddit_cursor: Upserts the high-water mark and poll schedule of one subreddit.
+    - get_backfill_checkpoint / save_backfill_checkpoint: Paging position of a subreddit backfill.
+    - get_export_checkpoint / save_export_checkpoint: High-water mark of an incremental export.
+    - get_export_upper_bound: Highest id below which every post has a sentiment and is committed.
+    - get_posts_for_export: Keyset page of classified posts for the Parquet export.
+    - get_max_post_id: Newest posts.id, the upper bound of a shadow run.
+    - get_shadow_run / create_shadow_run: Settings and progress of a shadow re-classification run.
+    - get_posts_for_shadow: Keyset page of classified posts matching a shadow run's selection.
+    - save_shadow_results: Stores a page of shadow labels together with the run's checkpoint.
+    - get_shadow_confusion: Production vs. shadow label counts of a run.
+    - promote_shadow_results / mark_shadow_run_promoted: Replace production labels with a run's labels.
+    - get_cached_sentiments: Looks up cached classifications by content hash.
+    - cache_sentiments: Stores classifications in the content hash cache.
+    - purge_sentiment_cache: Deletes expired cache entries.
     - get_post_to_analyze: Retrieves the title, content, and subreddit of a post by post_id.
-    - get_database_size: Returns the total number of posts stored.
+    - get_database_size: Returns the total number of posts stored (exact COUNT(*), slow on large tables).
+    - has_posts: Checks whether any post is stored.
+    - estimate_database_size: Returns the planner's estimate of the number of posts.
+    - count_backlog: Returns the number of posts without sentiment, up to a cap.
     - update_post_sentiment_invalid: Marks a post's sentiment as INVALID.
     - get_first_non_null_sentiment_record: Gets the post_id of the first post with a non-null sentiment.
     """
 
-    def __init__(self):
-        # Initialize connection and cursor, create posts table if needed
-        self._conn = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            port=os.getenv("DB_PORT")
-        )
-        self._cursor = self._conn.cursor()
-        self._create_table()
+    # Name of the work queue served by the post methods, used as a metrics label
+    queue = "posts"
+
+    def __init__(self, pool: ConnectionPool | None = None):
+        # Attach to the shared pool and apply pending schema migrations once per pool
+        self._pool = pool or get_pool()
+        if not self._pool.schema_ready:
+            apply_migrations(self._pool)
+            self._pool.schema_ready = True
 
     def close(self) -> None:
-        # Safely close the database cursor and connection
-        if self._cursor and not self._cursor.closed:
-            self._cursor.close()
-        if self._conn and not self._conn.closed:
-            self._conn.close()
-
-    def _create_table(self) -> None:
-        # Create the 'posts' table if it does not already exist
-        self._cursor.execute('''
-            CREATE TABLE IF NOT EXISTS posts (
-                id SERIAL PRIMARY KEY,
-                post_id TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMPTZ NOT NULL,
-                subreddit TEXT,
-                title TEXT,
-                content TEXT,
-                sentiment TEXT,
-                model_version TEXT
-            );
-        ''')
-        self._conn.commit()
+        # Connections are returned to the pool after every call, nothing to release here
+        pass
+
+    @contextmanager
+    def _cursor(self) -> Iterator[cursor]:
+        # Cursor on a pooled connection, committed when the block exits without error
+        with self._pool.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
 
     def post_exists(self, post_id: str) -> bool:
         # Check if a post with the given post_id exists in the database
-        self._cursor.execute(
-            "SELECT 1 FROM posts WHERE post_id = %s",
-            (post_id,)
-        )
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT 1 FROM posts WHERE post_id = %s",
+                (post_id,)
+            )
 
-        return self._cursor.fetchone() is not None
+            return cur.fetchone() is not None
 
     def add_post(self, post_id: str, created_at: datetime, subreddit: str, title: str, content: str) -> None:
         # Insert a new post into the database
-        self._cursor.execute(
-            "INSERT INTO posts (post_id, created_at, subreddit, title, content) VALUES (%s, %s, %s, %s, %s)",
-            (post_id, created_at, subreddit, title, content)
-        )
-        self._conn.commit()
+        with self._cursor() as cur:
+            cur.execute(
+                "INSERT INTO posts (post_id, created_at, subreddit, title, content) VALUES (%s, %s, %s, %s, %s)",
+                (post_id, created_at, subreddit, title, content)
+            )
+
+    def get_existing_post_ids(self, post_ids: list[str]) -> set[str]:
+        # Return the subset of post_ids already stored in the database
+        if not post_ids:
+            return set()
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT post_id FROM posts WHERE post_id = ANY(%s)",
+                (list(post_ids),)
+            )
+
+            return {row[0] for row in cur.fetchall()}
+
+    def add_posts(self, posts: list[tuple[str, datetime, str, str, str]], priority: int = 0) -> list[str]:
+        # Insert (post_id, created_at, subreddit, title, content) rows in a single statement,
+        # rows whose post_id already exists are skipped. Returns the post_ids actually inserted.
+        # priority orders the work queue, backfilled posts use a negative one
+        if not posts:
+            return []
+        with self._cursor() as cur:
+            inserted = execute_values(
+                cur,
+                "INSERT INTO posts (post_id, created_at, subreddit, title, content, priority) VALUES %s "
+                "ON CONFLICT (post_id) DO NOTHING RETURNING post_id",
+                posts,
+                template=f"(%s, %s, %s, %s, %s, {int(priority)})",
+                page_size=len(posts),
+                fetch=True
+            )
+
+        return [row[0] for row in inserted]
 
     def update_post_sentiment(self, post_id: str, sentiment: str, model: str) -> None:
         # Update sentiment and model version for a given post
-        self._cursor.execute(
-            "UPDATE posts SET model_version = %s, sentiment = %s WHERE post_id = %s",
-            (model, sentiment, post_id)
-        )
-        self._conn.commit()
+        with self._cursor() as cur:
+            cur.execute(
+                "UPDATE posts SET model_version = %s, sentiment = %s WHERE post_id = %s",
+                (model, sentiment, post_id)
+            )
+
+    def claim_unsentimented_posts(
+        self,
+        limit: int,
+        lease_seconds: int,
+        worker_id: str,
+        exclude: Collection[str] = ()
+    ) -> list[dict]:
+        # Lease up to `limit` posts without sentiment to worker_id, highest priority first, then
+        # oldest. Rows locked by another worker's claim are skipped, and an expired lease makes
+        # a post claimable again. Posts in `exclude` (e.g. ones this run already failed on) are skipped
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE posts
+                SET claimed_by = %s, claimed_until = now() + %s * interval '1 second'
+                WHERE id IN (
+                    SELECT id FROM posts
+                    WHERE sentiment IS NULL AND (claimed_until IS NULL OR claimed_until < now())
+                        AND post_id <> ALL(%s::text[])
+                    ORDER BY priority DESC, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING post_id, title, content, subreddit
+                """,
+                (worker_id, lease_seconds, list(exclude), limit)
+            )
+            result = cur.fetchall()
+
+        return [
+            {"post_id": post_id, "title": title, "content": content, "subreddit": subreddit}
+            for post_id, title, content, subreddit in result
+        ]
+
+    def claim_posts(self, post_ids: list[str], lease_seconds: int, worker_id: str) -> list[dict]:
+        # Lease the given posts to worker_id, skipping posts already analyzed or leased elsewhere
+        if not post_ids:
+            return []
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE posts
+                SET claimed_by = %s, claimed_until = now() + %s * interval '1 second'
+                WHERE id IN (
+                    SELECT id FROM posts
+                    WHERE post_id = ANY(%s)
+                        AND sentiment IS NULL AND (claimed_until IS NULL OR claimed_until < now())
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING post_id, title, content, subreddit
+                """,
+                (worker_id, lease_seconds, list(post_ids))
+            )
+            result = cur.fetchall()
+
+        return [
+            {"post_id": post_id, "title": title, "content": content, "subreddit": subreddit}
+            for post_id, title, content, subreddit in result
+        ]
+
+    def iter_unsentimented_posts(
+        self,
+        batch_size: int,
+        lease_seconds: int,
+        worker_id: str,
+        exclude: Collection[str] = ()
+    ) -> Iterator[list[dict]]:
+        # Yield claimed batches until no unclaimed post without sentiment is left. `exclude` is read
+        # again before every claim, so the caller can add post_ids to it between batches
+        while True:
+            posts = self.claim_unsentimented_posts(batch_size, lease_seconds, worker_id, exclude)
+            if not posts:
+                return
+            yield posts
+
+    def mark_posts_sentiment(self, results: list[tuple[str, str, str, float | None]]) -> None:
+        # Store (post_id, sentiment, model, confidence) results in one statement and release their lease.
+        # Posts that already have a sentiment (e.g. a worker whose lease expired finished first) keep it
+        if not results:
+            return
+        with self._cursor() as cur:
+            execute_values(
+                cur,
+                """
+                UPDATE posts AS p
+                SET sentiment = v.sentiment, model_version = v.model_version, confidence = v.confidence,
+                    claimed_by = NULL, claimed_until = NULL
+                FROM (VALUES %s) AS v(post_id, sentiment, model_version, confidence)
+                WHERE p.post_id = v.post_id AND p.sentiment IS NULL
+                """,
+                results,
+                template="(%s, %s, %s, %s::real)",
+                page_size=len(results)
+            )
+
+    def release_posts(self, post_ids: list[str]) -> None:
+        # Make claimed posts available to other workers again
+        if not post_ids:
+            return
+        with self._cursor() as cur:
+            cur.execute(
+                "UPDATE posts SET claimed_by = NULL, claimed_until = NULL WHERE post_id = ANY(%s)",
+                (list(post_ids),)
+            )
+
+    def get_existing_comment_ids(self, comment_ids: list[str]) -> set[str]:
+        # Return the subset of comment_ids already stored in the database
+        if not comment_ids:
+            return set()
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT comment_id FROM comments WHERE comment_id = ANY(%s)",
+                (list(comment_ids),)
+            )
+
+            return {row[0] for row in cur.fetchall()}
+
+    def count_comments_per_post(self, post_ids: list[str]) -> dict[str, int]:
+        # Return post_id -> number of stored comments, posts without comments are left out
+        if not post_ids:
+            return {}
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT post_id, COUNT(*) FROM comments WHERE post_id = ANY(%s) GROUP BY post_id",
+                (list(post_ids),)
+            )
+
+            return {post_id: count for post_id, count in cur.fetchall()}
+
+    def add_comments(self, comments: list[tuple[str, str, str, int | None, datetime, str, str]]) -> list[str]:
+        # Insert (comment_id, post_id, parent_id, depth, created_at, subreddit, body) rows in a single
+        # statement, skipping stored comment_ids. The posts must exist. Returns the inserted comment_ids
+        if not comments:
+            return []
+        with self._cursor() as cur:
+            inserted = execute_values(
+                cur,
+                "INSERT INTO comments (comment_id, post_id, parent_id, depth, created_at, subreddit, body) "
+                "VALUES %s ON CONFLICT (comment_id) DO NOTHING RETURNING comment_id",
+                comments,
+                page_size=len(comments),
+                fetch=True
+            )
+
+        return [row[0] for row in inserted]
+
+    def claim_posts_for_comments(self, min_age_hours: float, max_age_hours: float, limit: int) -> list[tuple[str, str]]:
+        # Mark up to `limit` posts aged between min_age_hours and max_age_hours, whose comment trees
+        # were not fetched yet, as fetched and return their (post_id, subreddit), newest first
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE posts
+                SET comments_fetched_at = now()
+                WHERE id IN (
+                    SELECT id FROM posts
+                    WHERE comments_fetched_at IS NULL
+                        AND created_at < now() - %s * interval '1 hour'
+                        AND created_at > now() - %s * interval '1 hour'
+                    ORDER BY created_at DESC
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING post_id, subreddit
+                """,
+                (min_age_hours, max_age_hours, limit)
+            )
+
+            return [(post_id, subreddit) for post_id, subreddit in cur.fetchall()]
+
+    def claim_unsentimented_comments(
+        self,
+        limit: int,
+        lease_seconds: int,
+        worker_id: str,
+        exclude: Collection[str] = ()
+    ) -> list[dict]:
+        # Lease up to `limit` comments without sentiment to worker_id, like claim_unsentimented_posts.
+        # Comments are returned in the pipeline's post format with the comment_id as post_id
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE comments
+                SET claimed_by = %s, claimed_until = now() + %s * interval '1 second'
+                WHERE id IN (
+                    SELECT id FROM comments
+                    WHERE sentiment IS NULL AND (claimed_until IS NULL OR claimed_until < now())
+                        AND comment_id <> ALL(%s::text[])
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING comment_id, body, subreddit
+                """,
+                (worker_id, lease_seconds, list(exclude), limit)
+            )
+            result = cur.fetchall()
+
+        return [
+            {"post_id": comment_id, "title": "", "content": body, "subreddit": subreddit}
+            for comment_id, body, subreddit in result
+        ]
+
+    def mark_comments_sentiment(self, results: list[tuple[str, str, str, float | None]]) -> None:
+        # Store (comment_id, sentiment, model, confidence) results in one statement and release their lease
+        if not results:
+            return
+        with self._cursor() as cur:
+            execute_values(
+                cur,
+                """
+                UPDATE comments AS c
+                SET sentiment = v.sentiment, model_version = v.model_version, confidence = v.confidence,
+                    claimed_by = NULL, claimed_until = NULL
+                FROM (VALUES %s) AS v(comment_id, sentiment, model_version, confidence)
+                WHERE c.comment_id = v.comment_id AND c.sentiment IS NULL
+                """,
+                results,
+                template="(%s, %s, %s, %s::real)",
+                page_size=len(results)
+            )
+
+    def release_comments(self, comment_ids: list[str]) -> None:
+        # Make claimed comments available to other workers again
+        if not comment_ids:
+            return
+        with self._cursor() as cur:
+            cur.execute(
+                "UPDATE comments SET claimed_by = NULL, claimed_until = NULL WHERE comment_id = ANY(%s)",
+                (list(comment_ids),)
+            )
+
+    def has_comments(self) -> bool:
+        # True if at least one comment is stored
+        with self._cursor() as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM comments)")
+
+            return cur.fetchone()[0]
+
+    def count_comment_backlog(self, cap: int = 100000) -> int:
+        # Number of comments without sentiment, counted up to `cap`
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM comments WHERE sentiment IS NULL LIMIT %s) AS backlog",
+                (cap,)
+            )
+
+            return cur.fetchone()[0]
 
-    def get_unsentimented_posts(self) -> list[str]:
-        # Retrieve all post_ids where sentiment is not yet assigned
-        self._cursor.execute(
-            "SELECT post_id FROM posts WHERE sentiment IS NULL"
+    def get_subreddit_cursors(self) -> dict[str, tuple]:
+        # Return subreddit -> (last_fullname, last_created_utc, posts_per_hour, last_polled_utc, next_poll_utc)
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                SELECT subreddit, last_fullname, last_created_utc, posts_per_hour, last_polled_utc, next_poll_utc
+                FROM subreddit_cursors
+                """
+            )
+
+            return {row[0]: row[1:] for row in cur.fetchall()}
+
+    def save_subreddit_cursor(
+        self,
+        subreddit: str,
+        last_fullname: str | None,
+        last_created_utc: float | None,
+        posts_per_hour: float,
+        last_polled_utc: float,
+        next_poll_utc: float
+    ) -> None:
+        # Insert or update the high-water mark and poll schedule of a subreddit
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO subreddit_cursors
+                    (subreddit, last_fullname, last_created_utc, posts_per_hour, last_polled_utc, next_poll_utc)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (subreddit) DO UPDATE
+                SET last_fullname = EXCLUDED.last_fullname,
+                    last_created_utc = EXCLUDED.last_created_utc,
+                    posts_per_hour = EXCLUDED.posts_per_hour,
+                    last_polled_utc = EXCLUDED.last_polled_utc,
+                    next_poll_utc = EXCLUDED.next_poll_utc
+                """,
+                (subreddit, last_fullname, last_created_utc, posts_per_hour, last_polled_utc, next_poll_utc)
+            )
+
+    def get_backfill_checkpoint(self, subreddit: str, listing: str) -> tuple | None:
+        # (after_fullname, oldest_created_utc, pages, posts, done) of a backfill, None if it never ran
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                SELECT after_fullname, oldest_created_utc, pages, posts, done
+                FROM backfill_checkpoints WHERE subreddit = %s AND listing = %s
+                """,
+                (subreddit, listing)
+            )
+
+            return cur.fetchone()
+
+    def save_backfill_checkpoint(
+        self,
+        subreddit: str,
+        listing: str,
+        after_fullname: str | None,
+        oldest_created_utc: float | None,
+        pages: int,
+        posts: int,
+        done: bool
+    ) -> None:
+        # Insert or update the paging position of a backfill
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO backfill_checkpoints
+                    (subreddit, listing, after_fullname, oldest_created_utc, pages, posts, done)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (subreddit, listing) DO UPDATE
+                SET after_fullname = EXCLUDED.after_fullname,
+                    oldest_created_utc = EXCLUDED.oldest_created_utc,
+                    pages = EXCLUDED.pages,
+                    posts = EXCLUDED.posts,
+                    done = EXCLUDED.done,
+                    updated_at = now()
+                """,
+                (subreddit, listing, after_fullname, oldest_created_utc, pages, posts, done)
+            )
+
+    def get_export_checkpoint(self, name: str) -> int:
+        # Last exported posts.id of the named export, 0 if it never ran
+        with self._cursor() as cur:
+            cur.execute("SELECT last_id FROM export_checkpoints WHERE name = %s", (name,))
+            row = cur.fetchone()
+
+        return row[0] if row else 0
+
+    def save_export_checkpoint(self, name: str, last_id: int) -> None:
+        # Insert or move the high-water mark of the named export
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO export_checkpoints (name, last_id) VALUES (%s, %s)
+                ON CONFLICT (name) DO UPDATE SET last_id = EXCLUDED.last_id, updated_at = now()
+                """,
+                (name, last_id)
+            )
+
+    def get_export_upper_bound(self, lag_seconds: int = 300) -> int:
+        # Highest id such that every post up to it has a sentiment and was inserted at least
+        # lag_seconds ago: the oldest post still in the work queue (partial index) caps it, and so
+        # does the newest post old enough (backward primary key scan over the last few minutes).
+        # Ids are taken at insert time, so a post of a transaction that is still open stays above
+        # the bound as long as the transaction is shorter than the lag
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                SELECT LEAST(
+                    (SELECT min(id) - 1 FROM posts WHERE sentiment IS NULL),
+                    COALESCE((
+                        SELECT id FROM posts
+                        WHERE inserted_at IS NULL OR inserted_at < now() - make_interval(secs => %s)
+                        ORDER BY id DESC LIMIT 1
+                    ), 0)
+                )
+                """,
+                (lag_seconds,)
+            )
+
+            return cur.fetchone()[0]
+
+    def get_posts_for_export(self, after_id: int, until_id: int, limit: int, include_text: bool = False) -> list[tuple]:
+        # Posts with after_id < id <= until_id in id order: (id, post_id, created_at, subreddit,
+        # sentiment, model_version, confidence), followed by title and content with include_text
+        columns = "id, post_id, created_at, subreddit, sentiment, model_version, confidence"
+        if include_text:
+            columns += ", title, content"
+        with self._cursor() as cur:
+            cur.execute(
+                f"SELECT {columns} FROM posts WHERE id > %s AND id <= %s ORDER BY id LIMIT %s",
+                (after_id, until_id, limit)
+            )
+
+            return cur.fetchall()
+
+    def get_max_post_id(self) -> int:
+        # Newest posts.id, 0 for an empty table (primary key lookup)
+        with self._cursor() as cur:
+            cur.execute("SELECT COALESCE(max(id), 0) FROM posts")
+
+            return cur.fetchone()[0]
+
+    def get_shadow_run(self, run_id: str) -> dict | None:
+        # Settings, paging position and counters of a shadow run, None if it does not exist
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                SELECT model_version, selection, settings, until_id, last_id, requests, posts, failed, seconds,
+                    promoted_at
+                FROM shadow_runs WHERE run_id = %s
+                """,
+                (run_id,)
+            )
+            row = cur.fetchone()
+        if row is None:
+            return None
+        keys = (
+            "model_version", "selection", "settings", "until_id", "last_id", "requests", "posts", "failed", "seconds",
+            "promoted_at"
         )
-        result = self._cursor.fetchall()
 
-        return [row[0] for row in result]
+        return dict(zip(keys, row))
+
+    def create_shadow_run(self, run_id: str, model: str, selection: dict, settings: dict, until_id: int) -> None:
+        # Register a shadow run with its post selection and prompt settings; an existing run keeps its own
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO shadow_runs (run_id, model_version, selection, settings, until_id) VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (run_id) DO NOTHING
+                """,
+                (run_id, model, Json(selection), Json(settings), until_id)
+            )
+
+    def get_posts_for_shadow(self, after_id: int, until_id: int, limit: int, selection: dict) -> list[tuple]:
+        # Classified posts with after_id < id <= until_id matching the selection, in id order:
+        # (id, post_id, title, content, subreddit, sentiment, model_version). The id window bounds
+        # the scan of every call, however few posts the selection matches
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                SELECT id, post_id, title, content, subreddit, sentiment, model_version
+                FROM posts
+                WHERE id > %(after_id)s AND id <= %(until_id)s
+                    AND sentiment IS NOT NULL AND sentiment <> 'SKIPPED'
+                    AND (%(model_versions)s::text[] IS NULL OR model_version = ANY(%(model_versions)s::text[]))
+                    AND (%(subreddits)s::text[] IS NULL OR subreddit = ANY(%(subreddits)s::text[]))
+                    AND (%(since)s::timestamptz IS NULL OR created_at >= %(since)s::timestamptz)
+                    AND (%(until)s::timestamptz IS NULL OR created_at < %(until)s::timestamptz)
+                    AND (hashtext(post_id) & 1048575) < %(sample)s * 1048576
+                ORDER BY id
+                LIMIT %(limit)s
+                """,
+                {
+                    "after_id": after_id,
+                    "until_id": until_id,
+                    "limit": limit,
+                    "model_versions": selection.get("model_versions"),
+                    "subreddits": selection.get("subreddits"),
+                    "since": selection.get("since"),
+                    "until": selection.get("until"),
+                    "sample": selection.get("sample") or 1.0
+                }
+            )
+
+            return cur.fetchall()
+
+    def save_shadow_results(
+        self,
+        run_id: str,
+        results: list[tuple[int, str, str, str, float | None, str, str]],
+        last_id: int,
+        requests: int,
+        failed: int,
+        seconds: float
+    ) -> None:
+        # Store (id, post_id, sentiment, model_version, confidence, production_sentiment,
+        # production_model_version) rows of a page and move the run's checkpoint in the same transaction
+        with self._cursor() as cur:
+            if results:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO shadow_sentiments
+                        (run_id, id, post_id, sentiment, model_version, confidence,
+                         production_sentiment, production_model_version)
+                    VALUES %s
+                    ON CONFLICT (run_id, id) DO UPDATE
+                    SET sentiment = EXCLUDED.sentiment, model_version = EXCLUDED.model_version,
+                        confidence = EXCLUDED.confidence
+                    """,
+                    [(run_id, *row) for row in results],
+                    template="(%s, %s, %s, %s, %s, %s::real, %s, %s)",
+                    page_size=len(results)
+                )
+            cur.execute(
+                """
+                UPDATE shadow_runs
+                SET last_id = %s, requests = requests + %s, posts = posts + %s, failed = failed + %s,
+                    seconds = seconds + %s, updated_at = now()
+                WHERE run_id = %s
+                """,
+                (last_id, requests, len(results), failed, seconds, run_id)
+            )
+
+    def get_shadow_confusion(self, run_id: str) -> list[tuple[str, str, int]]:
+        # (production_sentiment, shadow sentiment, count) of a shadow run
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                SELECT COALESCE(production_sentiment, ''), sentiment, count(*)
+                FROM shadow_sentiments WHERE run_id = %s
+                GROUP BY 1, 2
+                """,
+                (run_id,)
+            )
+
+            return cur.fetchall()
+
+    def promote_shadow_results(self, run_id: str, after_id: int, limit: int) -> tuple[int, int]:
+        # Copy the next `limit` valid shadow labels after after_id to posts in one transaction.
+        # Posts whose production label changed since the shadow run are left alone.
+        # Returns (last id of the chunk, 0 when done; number of updated posts)
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                SELECT max(id) FROM (
+                    SELECT id FROM shadow_sentiments WHERE run_id = %s AND id > %s ORDER BY id LIMIT %s
+                ) AS chunk
+                """,
+                (run_id, after_id, limit)
+            )
+            last_id = cur.fetchone()[0]
+            if last_id is None:
+                return 0, 0
+            cur.execute(
+                """
+                UPDATE posts AS p
+                SET sentiment = s.sentiment, model_version = s.model_version, confidence = s.confidence
+                FROM shadow_sentiments AS s
+                WHERE s.run_id = %s AND s.id > %s AND s.id <= %s AND p.id = s.id
+                    AND s.sentiment IN ('POSITIVE', 'NEUTRAL', 'NEGATIVE')
+                    AND p.sentiment IS NOT DISTINCT FROM s.production_sentiment
+                    AND p.model_version IS NOT DISTINCT FROM s.production_model_version
+                """,
+                (run_id, after_id, last_id)
+            )
+
+            return last_id, cur.rowcount
+
+    def mark_shadow_run_promoted(self, run_id: str) -> None:
+        # Record that the labels of a shadow run replaced the production ones
+        with self._cursor() as cur:
+            cur.execute("UPDATE shadow_runs SET promoted_at = now() WHERE run_id = %s", (run_id,))
+
+    def get_cached_sentiments(
+        self,
+        content_hashes: list[str],
+        model: str,
+        prompt_version: str,
+        ttl_days: int
+    ) -> dict[str, tuple[str, float]]:
+        # Return content_hash -> (sentiment, classified at epoch seconds) for non-expired cache entries
+        if not content_hashes:
+            return {}
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                SELECT content_hash, sentiment, extract(epoch FROM created_at)
+                FROM sentiment_cache
+                WHERE content_hash = ANY(%s) AND model_version = %s AND prompt_version = %s
+                    AND created_at > now() - %s * interval '1 day'
+                """,
+                (content_hashes, model, prompt_version, ttl_days)
+            )
+
+            return {content_hash: (sentiment, float(created)) for content_hash, sentiment, created in cur.fetchall()}
+
+    def cache_sentiments(self, entries: list[tuple[str, str, str, str]]) -> None:
+        # Upsert (content_hash, model, prompt_version, sentiment) cache entries
+        if not entries:
+            return
+        with self._cursor() as cur:
+            execute_values(
+                cur,
+                "INSERT INTO sentiment_cache (content_hash, model_version, prompt_version, sentiment) VALUES %s "
+                "ON CONFLICT (content_hash, model_version, prompt_version) "
+                "DO UPDATE SET sentiment = EXCLUDED.sentiment, created_at = now()",
+                entries,
+                page_size=len(entries)
+            )
+
+    def purge_sentiment_cache(self, ttl_days: int) -> int:
+        # Delete cache entries older than ttl_days, returns the number of deleted rows
+        with self._cursor() as cur:
+            cur.execute(
+                "DELETE FROM sentiment_cache WHERE created_at < now() - %s * interval '1 day'",
+                (ttl_days,)
+            )
+
+            return cur.rowcount
 
     def get_post_to_analyze(self, post_id: str) -> tuple[str, str, str] | None:
         # Get title, content, and subreddit for a post by post_id
-        self._cursor.execute(
-            "SELECT title, content, subreddit FROM posts WHERE post_id = %s",
-            (post_id,)
-        )
-        result = self._cursor.fetchone()
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT title, content, subreddit FROM posts WHERE post_id = %s",
+                (post_id,)
+            )
 
-        return result
+            return cur.fetchone()
 
     def get_database_size(self) -> int:
         # Return the total number of posts in the database
-        self._cursor.execute(
-            "SELECT COUNT(*) FROM posts"
-        )
-        result = self._cursor.fetchone()
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM posts"
+            )
+            result = cur.fetchone()
 
         return result[0] if result else 0
 
+    def has_posts(self) -> bool:
+        # True if at least one post is stored, without counting the table
+        with self._cursor() as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM posts)")
+
+            return cur.fetchone()[0]
+
+    def estimate_database_size(self) -> int:
+        # Planner estimate of the number of posts (kept current by autovacuum/ANALYZE),
+        # exact count only while the table has never been analyzed
+        with self._cursor() as cur:
+            cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = 'posts'::regclass")
+            estimate = cur.fetchone()[0]
+            if estimate < 0:
+                cur.execute("SELECT COUNT(*) FROM posts")
+                estimate = cur.fetchone()[0]
+
+        return estimate
+
+    def count_backlog(self, cap: int = 100000) -> int:
+        # Number of posts without sentiment, counted up to `cap` on the partial work queue index
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM posts WHERE sentiment IS NULL LIMIT %s) AS backlog",
+                (cap,)
+            )
+
+            return cur.fetchone()[0]
+
     def update_post_sentiment_invalid(self, post_id: str, model: str) -> None:
         # Mark a post's sentiment as INVALID with specified model version
-        self._cursor.execute(
-            "UPDATE posts SET model_version = %s, sentiment = %s WHERE post_id = %s",
-            (model, "INVALID", post_id)
-        )
-        self._conn.commit()
+        with self._cursor() as cur:
+            cur.execute(
+                "UPDATE posts SET model_version = %s, sentiment = %s WHERE post_id = %s",
+                (model, "INVALID", post_id)
+            )
 
     def get_first_record(self) -> str | None:
         # Retrieve post_id of the first post
-        self._cursor.execute(
-            "SELECT post_id FROM posts LIMIT 1"
-        )
-        result = self._cursor.fetchone()
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT post_id FROM posts LIMIT 1"
+            )
+            result = cur.fetchone()
         if result is None:
             return None
 
-        return result[0]
\ No newline at end of file
+        return result[0]
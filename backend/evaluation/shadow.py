@@ -0,0 +1,342 @@
+"""
+shadow.py
+
+This module defines the ShadowRun class, which re-classifies already labelled posts
+with a candidate model in shadow mode: the candidate's labels go to the
+shadow_sentiments side table, next to a snapshot of the production label, and posts
+is left untouched until the run is explicitly promoted.
+
+A run selects classified posts by production model_version, subreddit and creation
+date range, optionally as a deterministic sample (a hash of the post_id, so a resumed
+run picks the same posts). The newest posts.id at creation bounds the run. Posts are
+streamed in keyset pages over the primary key, and every query scans a bounded id
+window, so millions of rows never sit in memory or in one long transaction. Each
+page is classified with the concurrent client. Its labels are then stored in the
+same transaction as the run's checkpoint, so a stopped run resumes at the next page.
+
+The candidate's prompt settings (batch size, constrained mode) are stored with the
+run. A resumed run reuses them, and a candidate with different settings is refused,
+so one report never mixes two prompt regimes.
+
+A run stops when its request budget (max_requests, counted over all of its
+sessions) is spent. The report gives the agreement with production, Cohen's kappa,
+the confusion matrix and the throughput. promote copies the candidate's valid
+labels and confidences to posts in short chunks; the rollup triggers move the
+dashboard counts along. The Parquet export is append-only and keeps the labels it
+already exported.
+
+Usage (from the backend directory):
+    python -m evaluation.shadow run nemo-v2 --model mistralai/mistral-nemo --from-model meta-llama/llama-4-scout:free --sample 0.05
+    python -m evaluation.shadow run nemo-v2                # resume
+    python -m evaluation.shadow report nemo-v2
+    python -m evaluation.shadow promote nemo-v2
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+import threading
+import time
+from collections.abc import Callable
+from dotenv import load_dotenv
+from database.postgresql import PostgreSQLClient, close_pool
+from logging_config.logging_config import get_config
+from openrouter.factory import get_preprocessor
+from openrouter.sentiment_model import SentimentModel
+import yaml
+
+LABELS = ("POSITIVE", "NEUTRAL", "NEGATIVE", "INVALID")
+
+class ShadowRun:
+    """
+    Shadow re-classification of stored posts with a candidate model.
+
+    Attributes:
+    - _run_id: name of the run, key of its checkpoint and results
+    - _candidate: SentimentModel producing the shadow labels
+    - _page_size: posts read and classified per page
+    - _scan_window: ids scanned per query, bounds queries on sparse selections
+    - _concurrency: requests in flight per page
+    - _max_requests: request budget of the whole run, None for no limit
+
+    Methods:
+    - settings: prompt settings of the candidate, stored with the run
+    - create: register the run with its selection and settings, unless it exists
+    - run: classify the remaining pages, returns the number of posts classified in this session
+    - report: agreement, confusion matrix and throughput of the run
+    - promote: replace the production labels with the run's labels
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        candidate: SentimentModel,
+        storage: PostgreSQLClient | None = None,
+        page_size: int = 500,
+        scan_window: int = 50000,
+        concurrency: int = 8,
+        max_requests: int | None = None
+    ):
+        # Validate the settings
+        if page_size < 1 or scan_window < 1:
+            raise ValueError("page_size and scan_window must be at least 1!")
+        self._run_id = run_id
+        self._candidate = candidate
+        self._storage = storage or PostgreSQLClient()
+        self._page_size = page_size
+        self._scan_window = scan_window
+        self._concurrency = concurrency
+        self._max_requests = max_requests
+
+    def create(
+        self,
+        model_versions: list[str] | None = None,
+        subreddits: list[str] | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        sample: float = 1.0
+    ) -> None:
+        # Register the run over the posts stored so far; since/until are ISO dates or timestamps
+        if not 0 < sample <= 1:
+            raise ValueError("sample must be greater than 0 and at most 1!")
+        selection = {
+            "model_versions": model_versions,
+            "subreddits": subreddits,
+            "since": since,
+            "until": until,
+            "sample": sample
+        }
+        self._storage.create_shadow_run(
+            self._run_id, self._candidate.model, selection, self.settings(), self._storage.get_max_post_id()
+        )
+
+    def settings(self) -> dict:
+        # Candidate settings that change the prompt, and with it the labels
+        return {"batch_size": self._candidate.batch_size, "constrained": self._candidate.constrained}
+
+    def _state(self) -> dict:
+        # Stored state of the run, which must exist
+        state = self._storage.get_shadow_run(self._run_id)
+        if state is None:
+            raise ValueError(f"Shadow run {self._run_id} does not exist!")
+
+        return state
+
+    def run(self, stop: Callable[[], bool] | None = None) -> int:
+        # Classify page after page from the checkpoint until the selection or the request budget is exhausted
+        state = self._state()
+        if state["promoted_at"] is not None:
+            raise ValueError(f"Shadow run {self._run_id} is already promoted!")
+        if state["model_version"] != self._candidate.model:
+            raise ValueError(f"Shadow run {self._run_id} belongs to {state['model_version']}!")
+        # Runs created before settings were stored have none to compare
+        if state["settings"] and state["settings"] != self.settings():
+            raise ValueError(f"Shadow run {self._run_id} was started with {state['settings']}, not {self.settings()}!")
+
+        after, until_id, used = state["last_id"], state["until_id"], state["requests"]
+        start, classified = time.monotonic(), 0
+        while after < until_id:
+            if stop is not None and stop():
+                logging.info(f"Shadow run {self._run_id}: stop requested")
+                break
+            limit = self._page_size
+            if self._max_requests is not None:
+                remaining = self._max_requests - used
+                if remaining <= 0:
+                    logging.info(f"Shadow run {self._run_id}: request budget of {self._max_requests} spent")
+                    break
+                # Single-post fallbacks can still overshoot the budget by a few requests
+                limit = min(limit, remaining * self._candidate.batch_size)
+
+            window_end = min(after + self._scan_window, until_id)
+            rows = self._storage.get_posts_for_shadow(after, window_end, limit, state["selection"])
+            last_id = rows[-1][0] if len(rows) == limit else window_end
+            posts = [
+                {"post_id": post_id, "title": title, "content": content, "subreddit": subreddit}
+                for _, post_id, title, content, subreddit, _, _ in rows
+            ]
+
+            page_start, requests_before = time.monotonic(), self._candidate.requests
+            results = asyncio.run(self._candidate.classify_async(posts, self._concurrency)) if posts else {}
+            requests = self._candidate.requests - requests_before
+            shadow_rows = [
+                (row_id, post_id, *results[post_id], sentiment, model_version)
+                for row_id, post_id, _, _, _, sentiment, model_version in rows
+                if post_id in results
+            ]
+            seconds = time.monotonic() - page_start
+            self._storage.save_shadow_results(
+                self._run_id, shadow_rows, last_id, requests, len(posts) - len(shadow_rows), seconds
+            )
+            after, used, classified = last_id, used + requests, classified + len(shadow_rows)
+            if posts:
+                logging.info(
+                    f"Shadow run {self._run_id}: {len(shadow_rows)}/{len(posts)} posts up to id {last_id} of "
+                    f"{until_id}, {requests} requests, {len(posts) / max(seconds, 1e-9):.1f} posts/s"
+                )
+        logging.info(
+            f"Shadow run {self._run_id}: {classified} posts classified in {time.monotonic() - start:.1f}s, "
+            + ("complete" if after >= until_id else f"paused at id {after}")
+        )
+
+        return classified
+
+    def report(self) -> dict:
+        # Agreement with production, Cohen's kappa, confusion matrix and throughput of the run
+        state = self._state()
+        confusion = {(production, shadow): count for production, shadow, count in self._storage.get_shadow_confusion(self._run_id)}
+        total = sum(confusion.values())
+        agreeing = sum(count for (production, shadow), count in confusion.items() if production == shadow)
+        kappa = None
+        if total:
+            production_totals: dict[str, int] = {}
+            shadow_totals: dict[str, int] = {}
+            for (production, shadow), count in confusion.items():
+                production_totals[production] = production_totals.get(production, 0) + count
+                shadow_totals[shadow] = shadow_totals.get(shadow, 0) + count
+            expected = sum(production_totals[label] * shadow_totals.get(label, 0) for label in production_totals) / total ** 2
+            kappa = (agreeing / total - expected) / (1 - expected) if expected < 1 else 1.0
+
+        return {
+            "run_id": self._run_id,
+            "model_version": state["model_version"],
+            "selection": state["selection"],
+            "settings": state["settings"],
+            "complete": state["last_id"] >= state["until_id"],
+            "promoted": state["promoted_at"] is not None,
+            "posts": state["posts"],
+            "failed": state["failed"],
+            "requests": state["requests"],
+            "posts_per_second": state["posts"] / state["seconds"] if state["seconds"] else 0.0,
+            "posts_per_request": state["posts"] / state["requests"] if state["requests"] else 0.0,
+            "agreement": agreeing / total if total else None,
+            "kappa": kappa,
+            "confusion": confusion
+        }
+
+    def promote(self, chunk_size: int = 5000, allow_partial: bool = False) -> int:
+        # Copy the run's valid labels to posts chunk by chunk, returns the number of updated posts
+        state = self._state()
+        if state["last_id"] < state["until_id"] and not allow_partial:
+            raise ValueError(f"Shadow run {self._run_id} is not complete, finish it or allow a partial promote!")
+
+        after, updated = 0, 0
+        while True:
+            after, count = self._storage.promote_shadow_results(self._run_id, after, chunk_size)
+            if not after:
+                break
+            updated += count
+        self._storage.mark_shadow_run_promoted(self._run_id)
+        logging.info(f"Shadow run {self._run_id}: {updated} production labels replaced by {state['model_version']}")
+
+        return updated
+
+def format_report(report: dict) -> str:
+    """
+    Render a ShadowRun report as text: summary lines and a production x candidate confusion matrix.
+    """
+    confusion = report["confusion"]
+    labels = list(LABELS) + sorted({label for pair in confusion for label in pair} - set(LABELS))
+    width = max(len(label) for label in labels) + 2
+    lines = [
+        f"Shadow run {report['run_id']} ({report['model_version']}), "
+        + ("complete" if report["complete"] else "incomplete") + (", promoted" if report["promoted"] else ""),
+        f"Selection: {report['selection']}",
+        f"Settings: {report['settings']}",
+        f"Posts: {report['posts']} classified, {report['failed']} without an answer",
+        f"Requests: {report['requests']} ({report['posts_per_request']:.1f} posts/request), "
+        f"{report['posts_per_second']:.1f} posts/s",
+    ]
+    if report["agreement"] is not None:
+        lines.append(f"Agreement: {report['agreement']:.1%}, Cohen's kappa: {report['kappa']:.3f}")
+    lines.append("")
+    lines.append("production \\ candidate".ljust(24) + "".join(label.rjust(width) for label in labels))
+    for production in labels:
+        counts = [confusion.get((production, shadow), 0) for shadow in labels]
+        if any(counts):
+            lines.append(production.ljust(24) + "".join(str(count).rjust(width) for count in counts))
+
+    return "\n".join(lines)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shadow re-classification of stored posts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="create or resume a shadow run")
+    run_parser.add_argument("run_id")
+    run_parser.add_argument("--model", help="candidate model (default: the model of an existing run)")
+    run_parser.add_argument("--batch-size", type=int, help="posts per request of the candidate (default: 1, or the run's)")
+    run_parser.add_argument(
+        "--constrained", action="store_true", default=None,
+        help="single-token answers with logprob confidence (default: off, or the run's)"
+    )
+    run_parser.add_argument("--from-model", nargs="+", help="only posts labelled by these model versions")
+    run_parser.add_argument("--subreddits", nargs="+", help="only posts of these subreddits")
+    run_parser.add_argument("--since", help="only posts created at or after this date")
+    run_parser.add_argument("--until", help="only posts created before this date")
+    run_parser.add_argument("--sample", type=float, default=1.0, help="fraction of the matching posts, e.g. 0.05")
+    run_parser.add_argument("--max-requests", type=int, help="request budget of the whole run")
+    for name in ("report", "promote"):
+        command = commands.add_parser(name)
+        command.add_argument("run_id")
+    commands.choices["promote"].add_argument("--partial", action="store_true", help="promote an unfinished run")
+    args = parser.parse_args()
+
+    load_dotenv(dotenv_path="config/.env")
+    get_config()
+    with open("config/config.yaml") as f:
+        cfg = yaml.safe_load(f)
+    sentiment_cfg = cfg.get("sentiment") or {}
+    shadow_cfg = cfg.get("shadow") or {}
+    storage = PostgreSQLClient()
+
+    state = storage.get_shadow_run(args.run_id)
+    model = getattr(args, "model", None)
+    if model is None:
+        if state is None:
+            raise SystemExit(f"Shadow run {args.run_id} does not exist, start it with --model")
+        model = state["model_version"]
+    # A resumed run keeps the settings it was started with, differing flags are refused by ShadowRun.run
+    settings = {"batch_size": 1, "constrained": False, **(state["settings"] if state is not None else {})}
+    for key in ("batch_size", "constrained"):
+        if getattr(args, key, None) is not None:
+            settings[key] = getattr(args, key)
+    candidate = SentimentModel(model=model, temperature=0, max_tokens=3, batch_size=settings["batch_size"], storage=storage)
+    candidate.set_preprocessor(get_preprocessor(sentiment_cfg))
+    candidate.set_constrained(settings["constrained"])
+    candidate.set_rate_limit(
+        requests_per_minute=shadow_cfg.get("requests_per_minute", 10),
+        burst=shadow_cfg.get("burst")
+    )
+    shadow = ShadowRun(
+        args.run_id,
+        candidate,
+        storage,
+        page_size=shadow_cfg.get("page_size", 500),
+        scan_window=shadow_cfg.get("scan_window", 50000),
+        concurrency=shadow_cfg.get("concurrency", 4),
+        max_requests=getattr(args, "max_requests", None) or shadow_cfg.get("max_requests")
+    )
+
+    try:
+        if args.command == "run":
+            shadow.create(args.from_model, args.subreddits, args.since, args.until, args.sample)
+            stop_event = threading.Event()
+
+            def request_stop(signum, frame):
+                logging.info("Stopping shadow run after the current page...")
+                stop_event.set()
+
+            signal.signal(signal.SIGTERM, request_stop)
+            signal.signal(signal.SIGINT, request_stop)
+            shadow.run(stop=stop_event.is_set)
+            print(format_report(shadow.report()))
+        elif args.command == "report":
+            print(format_report(shadow.report()))
+        else:
+            shadow.promote(allow_partial=args.partial)
+    finally:
+        close_pool()
+
+if __name__ == "__main__":
+    main()
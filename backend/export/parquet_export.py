@@ -0,0 +1,172 @@
+"""
+parquet_export.py
+
+This module defines the ParquetExporter class, which copies classified posts from the
+live posts table into date-partitioned Parquet files for analytics:
+
+    <root>/posts/date=YYYY-MM-DD/part-<first id>.parquet
+
+Exports are incremental. The last exported posts.id is checkpointed in the
+export_checkpoints table, and every run reads only newer rows, page by page in id
+order (keyset pagination on the primary key, so it never scans the table or holds a
+long transaction). A run stops below the oldest post still waiting for
+classification, so every exported row carries its final label, and below posts
+inserted during the last `lag_seconds`, so a post whose inserting transaction had
+not committed yet is not skipped once the checkpoint has moved past its id.
+Partitions are cut by UTC date, whatever the time zone of the database session. Pages are streamed
+through one Arrow ParquetWriter per date, which appends a row group per page, so
+memory stays bounded by the page size. Files written before the confidence column
+existed lack it; readers should combine files by column name.
+
+Files are written under a temporary name and renamed when complete. The checkpoint
+is saved only after that. A run that crashes midway is repeated from the same
+checkpoint and overwrites its own files, because file names depend on the first
+id of the run only. After each run, <root>/_export.json records the checkpoint.
+The dashboard's DuckDB mode uses it as its cache key.
+
+Usage (from the backend directory):
+    python -m export.parquet_export --root /data/parquet
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from database.postgresql import PostgreSQLClient
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("post_id", pa.string()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+    ("subreddit", pa.string()),
+    ("sentiment", pa.string()),
+    ("model_version", pa.string()),
+    ("confidence", pa.float32()),
+])
+TEXT_FIELDS = [("title", pa.string()), ("content", pa.string())]
+MARKER_FILE = "_export.json"
+
+class ParquetExporter:
+    """
+    Incremental export of classified posts to date-partitioned Parquet files.
+
+    Attributes:
+    - _root: directory holding the dataset and the export marker
+    - _batch_size: rows read from PostgreSQL per page, one row group per page and date
+    - _min_rows: runs with fewer new rows are skipped, which keeps files from getting tiny
+    - _include_text: also export title and content
+    - _lag_seconds: posts inserted more recently are left to the next run
+
+    Methods:
+    - run: export all posts classified since the last checkpoint, returns the number of rows
+    """
+
+    def __init__(
+        self,
+        root: str,
+        storage: PostgreSQLClient | None = None,
+        batch_size: int = 50000,
+        min_rows: int = 1000,
+        compression: str = "zstd",
+        include_text: bool = False,
+        name: str = "posts",
+        lag_seconds: int = 300
+    ):
+        # Validate the settings and prepare the schema
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1!")
+        self._root = root
+        self._storage = storage or PostgreSQLClient()
+        self._batch_size = batch_size
+        self._min_rows = min_rows
+        self._compression = compression
+        self._include_text = include_text
+        self._name = name
+        self._lag_seconds = lag_seconds
+        self._schema = pa.schema(list(SCHEMA) + (TEXT_FIELDS if include_text else []))
+
+    def _to_tables(self, rows: list[tuple]) -> dict[str, pa.Table]:
+        # Split a page of rows by UTC creation date, one Arrow table per date
+        by_date: dict[str, list[tuple]] = {}
+        for row in rows:
+            by_date.setdefault(row[2].astimezone(timezone.utc).strftime("%Y-%m-%d"), []).append(row)
+
+        return {
+            date: pa.Table.from_arrays(
+                [pa.array([row[i] for row in date_rows], type=field.type) for i, field in enumerate(self._schema)],
+                schema=self._schema
+            )
+            for date, date_rows in by_date.items()
+        }
+
+    def _write_marker(self, last_id: int) -> None:
+        # Record the export state next to the dataset, atomically
+        path = os.path.join(self._root, MARKER_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"name": self._name, "last_id": last_id, "exported_at": datetime.now().astimezone().isoformat()}, f)
+        os.replace(path + ".tmp", path)
+
+    def run(self) -> int:
+        # Export posts classified since the last checkpoint
+        start = time.monotonic()
+        first_id = self._storage.get_export_checkpoint(self._name)
+        until_id = self._storage.get_export_upper_bound(self._lag_seconds)
+        # Ids can have gaps, so this is an upper estimate of the new rows
+        if until_id - first_id < max(1, self._min_rows):
+            logging.info(f"Parquet export: at most {max(0, until_id - first_id)} new rows, waiting for {self._min_rows}")
+            return 0
+
+        writers: dict[str, tuple[pq.ParquetWriter, str]] = {}
+        last_id, exported = first_id, 0
+        file_name = f"part-{first_id + 1:012d}.parquet"
+        try:
+            while True:
+                rows = self._storage.get_posts_for_export(last_id, until_id, self._batch_size, self._include_text)
+                if not rows:
+                    break
+                for date, table in self._to_tables(rows).items():
+                    if date not in writers:
+                        directory = os.path.join(self._root, self._name, f"date={date}")
+                        os.makedirs(directory, exist_ok=True)
+                        path = os.path.join(directory, file_name)
+                        writers[date] = (pq.ParquetWriter(path + ".tmp", self._schema, compression=self._compression), path)
+                    writers[date][0].write_table(table)
+                last_id = rows[-1][0]
+                exported += len(rows)
+        except BaseException:
+            for writer, path in writers.values():
+                writer.close()
+                os.remove(path + ".tmp")
+            raise
+        for writer, path in writers.values():
+            writer.close()
+            os.replace(path + ".tmp", path)
+
+        self._storage.save_export_checkpoint(self._name, last_id)
+        os.makedirs(self._root, exist_ok=True)
+        self._write_marker(last_id)
+        logging.info(
+            f"Parquet export: {exported} rows in {len(writers)} partition(s) up to id {last_id}, "
+            f"{time.monotonic() - start:.1f}s"
+        )
+
+        return exported
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export classified posts to Parquet")
+    parser.add_argument("--root", default=os.getenv("PARQUET_PATH", "data/parquet"), help="dataset directory")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--include-text", action="store_true", help="also export title and content")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv(dotenv_path="config/.env")
+    ParquetExporter(args.root, batch_size=args.batch_size, min_rows=1, include_text=args.include_text).run()
+
+if __name__ == "__main__":
+    main()
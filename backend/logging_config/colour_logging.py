@@ -8,6 +8,7 @@ to log messages based on their severity level for better console readability.
 import logging
 
 FMT = "{asctime} | {levelname} | {message}"
+DATEFMT = "%Y-%m-%d %H:%M:%S"
 FORMATS = {
     logging.INFO: f"\33[32m{FMT}\33[0m",
     logging.WARNING: f"\33[33m{FMT}\33[0m",
@@ -18,12 +19,19 @@ class CustomFormatted(logging.Formatter):
     """
     Custom logging formatter that colors messages by log level.
 
+    Attributes:
+    - _formatters: one pre-built formatter per colored level
+
     Methods:
     - format: Applies color formatting to log messages.
     """
 
+    def __init__(self):
+        # Build the per-level formatters once instead of one for every record
+        super().__init__(FMT, style="{", datefmt=DATEFMT)
+        self._formatters = {level: logging.Formatter(fmt, style="{", datefmt=DATEFMT) for level, fmt in FORMATS.items()}
+
     def format(self, record):
         # Format log record with color according to its level
-        log_fmt = FORMATS.get(record.levelno, FMT)
-        formatter = logging.Formatter(log_fmt, style="{", datefmt="%Y-%m-%d %H:%M:%S")
-        return formatter.format(record)
+        formatter = self._formatters.get(record.levelno)
+        return formatter.format(record) if formatter is not None else super().format(record)
@@ -0,0 +1,41 @@
+"""
+json_logging.py
+
+This module defines a formatter writing every log record as one JSON object per line,
+for log collectors that parse fields instead of text.
+
+Besides time, level, logger, thread and message, every attribute passed with
+`extra=` (post_id, model, latency, subreddit, ...) becomes a field of its own.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has, everything else on a record came in through `extra`
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatter producing one JSON object per record.
+
+    Methods:
+    - format: serialize the record, its extra fields and its exception, if any
+    """
+
+    def format(self, record):
+        # Standard fields first, then the extra fields of the record
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str, ensure_ascii=False)
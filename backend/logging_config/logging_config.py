@@ -1,26 +1,97 @@
 """
 logger_config.py
 
-This module configures the root logger with a custom stream handler
-using the CustomFormatted formatter for colored log output.
+This module configures the root logger from the `logging` section of config.yaml:
+
+- format: "colour" (CustomFormatted, for terminals) or "json" (JsonFormatter, one
+  object per line with the extra fields of the record),
+- mode: "sync" formats and writes records in the thread that logs them; "queue" only
+  puts them on a queue (RecordQueueHandler) and a background QueueListener thread formats
+  and writes them, so pipeline threads never wait for stderr,
+- rate_limit: optional RateLimitFilter for INFO messages logged per post or batch,
+  applied before records are queued.
 
 It also sets log levels to ERROR for specified noisy libraries to reduce verbosity.
 """
 
 from .colour_logging import CustomFormatted
+from .json_logging import JsonFormatter
+from .rate_limit import RateLimitFilter
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import copy
 import logging
+import os
+import queue
+import threading
+import yaml
+
+_listener: QueueListener | None = None
+_configured = False
+_config_lock = threading.Lock()
 
-def get_config():
+class RecordQueueHandler(QueueHandler):
+    """
+    QueueHandler leaving the formatting of exceptions to the listener's formatter.
+
+    The default prepare() formats the record, folds the traceback into the message
+    and drops exc_info, so JsonFormatter could not write its `exception` field. The
+    queue never leaves the process, so the record keeps its exception; only the
+    message arguments are merged, as they may change after the call returns.
+
+    Methods:
+    - prepare: copy of the record with its message merged and its exception kept
+    """
+
+    def prepare(self, record):
+        # Merge the message arguments, keep exc_info/exc_text/stack_info for the listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+
+        return record
+
+def get_config(path: str = "config/config.yaml"):
     """
     Set up logging configuration with custom formatting and
     reduced log verbosity for selected libraries.
+    Settings are read from the `logging` section of the config file, if present.
+    Only the first call in a process configures logging.
     """
-    handler = logging.StreamHandler()
-    handler.setFormatter(CustomFormatted())
-    logging.basicConfig(
-        level=logging.INFO,
-        handlers=[handler],
-    )
+    global _listener, _configured
+    with _config_lock:
+        if _configured:
+            return
+        _configured = True
+
+        cfg = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                cfg = (yaml.safe_load(f) or {}).get("logging") or {}
+
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter() if cfg.get("format", "colour") == "json" else CustomFormatted())
+        if cfg.get("mode", "sync") == "queue":
+            # The queue is unbounded, logging calls never block; the listener drains it at exit
+            log_queue = queue.SimpleQueue()
+            _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+            handler = RecordQueueHandler(log_queue)
+
+        rate_cfg = cfg.get("rate_limit") or {}
+        if rate_cfg.get("enabled", False):
+            handler.addFilter(RateLimitFilter(
+                per_second=rate_cfg.get("per_second", 5),
+                burst=rate_cfg.get("burst"),
+                modules=rate_cfg.get("modules")
+            ))
+
+        logging.basicConfig(
+            level=cfg.get("level", "INFO"),
+            handlers=[handler],
+        )
 
     for lib in [
         "apscheduler.scheduler",
@@ -34,4 +105,4 @@ def get_config():
     ]:
         logging.getLogger(lib).setLevel(logging.ERROR)
 
-    logging.info("Logger configured")
\ No newline at end of file
+    logging.info(f"Logger configured ({cfg.get('mode', 'sync')} mode, {cfg.get('format', 'colour')} format)")
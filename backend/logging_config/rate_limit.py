@@ -0,0 +1,79 @@
+"""
+rate_limit.py
+
+This module defines a logging filter that rate limits records per call site, so
+messages logged for every post or batch cannot flood the output (and the logging
+thread) at high throughput.
+
+A call site is the file and line of the logging call, so messages built with
+f-strings are still recognized as one message type. Every site gets a token bucket;
+records beyond it are dropped, and the next record that passes reports how many
+were suppressed. Warnings and errors are never dropped.
+"""
+
+import logging
+import threading
+import time
+
+class RateLimitFilter(logging.Filter):
+    """
+    Per call site token bucket for low-severity log records.
+
+    Attributes:
+    - _per_second: records per second and site let through in the long run
+    - _burst: records a quiet site may log back to back
+    - _max_level: records above this level always pass
+    - _modules: module names (e.g. "openrouter_client") the limit applies to, None for all
+
+    Methods:
+    - filter: decide whether a record is logged
+    - suppressed: number of records dropped so far
+    """
+
+    def __init__(
+        self,
+        per_second: float,
+        burst: float | None = None,
+        max_level: int = logging.INFO,
+        modules: list[str] | None = None
+    ):
+        # Validate the limits and prepare the per-site buckets
+        if per_second <= 0:
+            raise ValueError("per_second must be positive!")
+        super().__init__()
+        self._per_second = per_second
+        self._burst = burst if burst is not None else max(1.0, per_second)
+        self._max_level = max_level
+        self._modules = set(modules) if modules else None
+        self._sites: dict[tuple[str, int], list[float]] = {}
+        self._lock = threading.Lock()
+        self._suppressed = 0
+
+    def filter(self, record):
+        # Spend a token of the record's call site, drop the record if none is left
+        if record.levelno > self._max_level or (self._modules is not None and record.module not in self._modules):
+            return True
+        now = time.monotonic()
+        with self._lock:
+            # [tokens, last refill, records dropped since the last one logged]
+            site = self._sites.setdefault((record.pathname, record.lineno), [self._burst, now, 0])
+            site[0] = min(self._burst, site[0] + (now - site[1]) * self._per_second)
+            site[1] = now
+            if site[0] < 1:
+                site[2] += 1
+                self._suppressed += 1
+                return False
+            site[0] -= 1
+            dropped, site[2] = site[2], 0
+        if dropped:
+            record.suppressed = dropped
+            record.msg = f"{record.getMessage()} ({dropped} similar messages suppressed)"
+            record.args = None
+
+        return True
+
+    @property
+    def suppressed(self) -> int:
+        # Number of records dropped since start
+        with self._lock:
+            return self._suppressed
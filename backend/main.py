@@ -1,11 +1,21 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from reddit_api.reddit_client import RedditClient
-from openrouter.models import LlamaScout, MistralNemo
+from reddit_api.cursor_store import CursorStore
+from reddit_api.ingestion import CommentCoordinator, IngestionCoordinator
+from reddit_api.stream import SubmissionStream
+from rate_limiter.token_bucket import RedditRateBudget
+from openrouter.model_router import ModelRouter
+from openrouter.factory import get_model_router
 from logging_config.logging_config import get_config
+from database.postgresql import PostgreSQLClient, close_pool
+from database.comment_queue import CommentQueue
+from export.parquet_export import ParquetExporter
+from monitoring.metrics import instrument_scheduler, start_metrics_server
 from dotenv import load_dotenv
 import time
 import os
+import signal
 import yaml
 import logging
 
@@ -15,36 +25,37 @@ class MissingEnvFileError(Exception):
 class MissingConfigFileError(Exception):
     pass
 
-if not os.path.exists("config/.env"):
-    raise MissingEnvFileError("The .env file was not found!")
+def load_environment():
+    # Check the config files, load the .env file and configure logging
+    if not os.path.exists("config/.env"):
+        raise MissingEnvFileError("The .env file was not found!")
 
-if not os.path.exists("config/config.yaml"):
-    raise MissingConfigFileError("The config.yaml file was not found!")
+    if not os.path.exists("config/config.yaml"):
+        raise MissingConfigFileError("The config.yaml file was not found!")
 
-load_dotenv(dotenv_path='config/.env')
-get_config()
+    load_dotenv(dotenv_path='config/.env')
+    get_config()
 
-def get_available_sentiment_model() -> LlamaScout | MistralNemo | None:
-    llama = LlamaScout()
-    mistral = MistralNemo()
+def pipeline(router: ModelRouter, sentiment_cfg: dict, comment_router: ModelRouter | None = None):
+    # Comments are drained after the posts, never alongside them: each router has its own
+    # rate limiters, running both at once would double the provider request rate
+    for queue_router in (router, comment_router):
+        if queue_router is None:
+            continue
+        queue_router.pipeline(
+            mode=sentiment_cfg.get("mode", "async"),
+            concurrency=sentiment_cfg.get("concurrency", 8),
+            claim_size=sentiment_cfg.get("claim_size", 100),
+            lease_seconds=sentiment_cfg.get("lease_seconds", 600)
+        )
 
-    if llama.test_sentiment_model():
-        logging.info("Using meta-llama/llama-4-scout:free")
-        return llama
-    elif mistral.test_sentiment_model():
-        logging.info("Using mistralai/mistral-nemo:free")
-        return mistral
-    else:
-        logging.error("No available sentiment model found!")
-        return None
-
-def pipeline():
-    main_model = get_available_sentiment_model()
-    if main_model is None:
-        return
-    main_model.pipeline()
+def _terminate(signum, frame):
+    # Treat SIGTERM (docker stop) like Ctrl+C, so running work is shut down cleanly
+    raise KeyboardInterrupt
 
 def main():
+    load_environment()
+    signal.signal(signal.SIGTERM, _terminate)
     with open("config/config.yaml") as f:
         cfg = yaml.safe_load(f)
 
@@ -55,19 +66,114 @@ def main():
     cron_sentiment = CronTrigger(**cfg["cron_sentiment"])
 
     reddit = RedditClient.from_env()
+    fetch_cfg = cfg.get("fetch") or {}
+    if fetch_cfg.get("incremental", False):
+        reddit.set_cursor_store(CursorStore(
+            PostgreSQLClient(),
+            min_interval=fetch_cfg.get("min_interval", 60),
+            max_interval=fetch_cfg.get("max_interval", 3600),
+            target_posts_per_poll=fetch_cfg.get("target_posts_per_poll", 25)
+        ))
+    ingestion_cfg = cfg.get("ingestion") or {}
+    reddit.set_rate_budget(RedditRateBudget(
+        requests_per_minute=ingestion_cfg.get("requests_per_minute", 100),
+        burst=ingestion_cfg.get("burst")
+    ))
+    coordinator = IngestionCoordinator(
+        reddit,
+        subreddits,
+        post_limit,
+        max_workers=ingestion_cfg.get("max_workers", 8),
+        multireddit_size=ingestion_cfg.get("multireddit_size", 1)
+    )
+    sentiment_cfg = cfg.get("sentiment") or {}
+    router = get_model_router(sentiment_cfg)
+    comments_cfg = cfg.get("comments") or {}
+    comment_coordinator = None
+    comment_router = None
+    if comments_cfg.get("enabled", False):
+        comment_coordinator = CommentCoordinator(
+            reddit,
+            subreddits,
+            mode=comments_cfg.get("mode", "listing"),
+            limit=comments_cfg.get("limit", 500),
+            max_per_thread=comments_cfg.get("max_per_thread", 200),
+            max_depth=comments_cfg.get("max_depth", 5),
+            replace_more_limit=comments_cfg.get("replace_more_limit", 0),
+            min_age_hours=comments_cfg.get("min_age_hours", 6),
+            max_age_hours=comments_cfg.get("max_age_hours", 48),
+            threads_per_cycle=comments_cfg.get("threads_per_cycle", 20),
+            max_workers=ingestion_cfg.get("max_workers", 8),
+            multireddit_size=ingestion_cfg.get("multireddit_size", 1)
+        )
+        comment_router = get_model_router(sentiment_cfg, CommentQueue())
+
+    # A run still busy when its next trigger fires is not started twice, missed runs collapse into one
+    scheduler = BackgroundScheduler(job_defaults={
+        "coalesce": True,
+        "max_instances": 1,
+        "misfire_grace_time": ingestion_cfg.get("misfire_grace_time", 60)
+    })
+    metrics_cfg = cfg.get("metrics") or {}
+    if metrics_cfg.get("enabled", False):
+        start_metrics_server(metrics_cfg.get("port", 8000))
+        instrument_scheduler(scheduler)
+    stream = None
+    if cfg.get("mode", "cron") == "stream":
+        # Posts are classified as they arrive; the scheduled pipeline only picks up what the stream left behind
+        stream_cfg = cfg.get("stream") or {}
+        stream = SubmissionStream(
+            reddit,
+            router,
+            subreddits,
+            multireddit_size=stream_cfg.get("multireddit_size", 100),
+            workers=stream_cfg.get("workers", 4),
+            queue_size=stream_cfg.get("queue_size", 50),
+            batch_size=stream_cfg.get("batch_size", 10),
+            pause_after=stream_cfg.get("pause_after", 0),
+            poll_interval=stream_cfg.get("poll_interval", 5),
+            put_timeout=stream_cfg.get("put_timeout", 30),
+            lease_seconds=sentiment_cfg.get("lease_seconds", 600)
+        )
+    else:
+        scheduler.add_job(coordinator.run, cron_post, id="fetch_posts")
+        logging.info(f"Scheduled job 'fetch_posts' for {len(subreddits)} subreddits in {len(coordinator.listings)} listings")
+
+    if comment_coordinator is not None:
+        cron_comments = CronTrigger(**cfg["cron_comments"]) if cfg.get("cron_comments") else cron_post
+        scheduler.add_job(comment_coordinator.run, cron_comments, id="fetch_comments")
+        logging.info(f"Scheduled job 'fetch_comments' in {comments_cfg.get('mode', 'listing')} mode")
 
-    scheduler = BackgroundScheduler()
-    for subreddit in subreddits:
-        scheduler.add_job(reddit.get_new_posts, cron_post, args=[subreddit, post_limit])
-        logging.info(f"Scheduled job 'get_new_posts' for subreddit r/{subreddit}")
+    export_cfg = cfg.get("export") or {}
+    if export_cfg.get("enabled", False):
+        exporter = ParquetExporter(
+            export_cfg.get("path", "data/parquet"),
+            batch_size=export_cfg.get("batch_size", 50000),
+            min_rows=export_cfg.get("min_rows", 1000),
+            compression=export_cfg.get("compression", "zstd"),
+            include_text=export_cfg.get("include_text", False),
+            lag_seconds=export_cfg.get("lag_seconds", 300)
+        )
+        scheduler.add_job(exporter.run, CronTrigger(**cfg["cron_export"]), id="export_parquet")
+        logging.info(f"Scheduled job 'export_parquet' to {export_cfg.get('path', 'data/parquet')}")
 
-    scheduler.add_job(pipeline, cron_sentiment)
+    # With separate workers (worker.py) classification does not run in the scheduler process
+    if sentiment_cfg.get("scheduled", True):
+        scheduler.add_job(pipeline, cron_sentiment, args=[router, sentiment_cfg, comment_router], id="sentiment")
     scheduler.start()
+    if stream is not None:
+        stream.start()
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
+        if stream is not None:
+            stream.stop()
         scheduler.shutdown()
+        coordinator.close()
+        if comment_coordinator is not None:
+            comment_coordinator.close()
+        close_pool()
         print("\nProgram terminated by user")
 
 if __name__ == "__main__":
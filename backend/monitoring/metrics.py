@@ -0,0 +1,136 @@
+"""
+metrics.py
+
+This module defines the Prometheus metrics of the backend and small helpers to record
+them. Metrics live in the default registry of prometheus_client and are served by
+start_metrics_server on /metrics; with several worker processes each process serves
+its own port.
+
+Metrics:
+- sentiment_request_seconds: request latency per model and request kind (single/batch)
+- sentiment_requests_total: requests per model and outcome (ok/rate_limited/error)
+- sentiment_tokens_total: prompt and completion tokens per model
+- sentiment_validation_failures_total: answers without a valid label per model
+- sentiment_labels_total: stored labels per model and sentiment, INVALID rate is
+  sentiment_labels_total{sentiment="INVALID"} over the sum
+- sentiment_cache_lookups_total: classification cache lookups per model and result
+  (memory_hit/db_hit/miss), hit ratio is the hits over the sum
+- sentiment_backlog_posts: posts (or comments) waiting for classification per queue (capped count)
+- posts_estimated: estimated number of stored posts (planner statistics)
+- posts_ingested_total: new posts stored per subreddit
+- comments_ingested_total: new comments stored per subreddit
+- db_query_seconds: duration of every PostgreSQLClient method
+- scheduler_job_seconds / scheduler_job_misfires_total / scheduler_job_errors_total:
+  APScheduler job durations and failures, recorded by a scheduler listener
+"""
+
+import functools
+import inspect
+import logging
+import time
+from apscheduler.events import (
+    EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
+)
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+REQUEST_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+JOB_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600)
+
+SENTIMENT_REQUEST_SECONDS = Histogram(
+    "sentiment_request_seconds", "Chat completion latency", ["model", "kind"], buckets=REQUEST_BUCKETS
+)
+SENTIMENT_REQUESTS = Counter("sentiment_requests_total", "Chat completion requests", ["model", "outcome"])
+SENTIMENT_TOKENS = Counter("sentiment_tokens_total", "Tokens used", ["model", "type"])
+SENTIMENT_VALIDATION_FAILURES = Counter(
+    "sentiment_validation_failures_total", "Answers without a valid label", ["model"]
+)
+SENTIMENT_LABELS = Counter("sentiment_labels_total", "Stored sentiment labels", ["model", "sentiment"])
+SENTIMENT_CACHE_LOOKUPS = Counter(
+    "sentiment_cache_lookups_total", "Classification cache lookups", ["model", "result"]
+)
+SENTIMENT_BACKLOG = Gauge("sentiment_backlog_posts", "Posts waiting for classification", ["queue"])
+POSTS_ESTIMATED = Gauge("posts_estimated", "Estimated number of stored posts")
+POSTS_INGESTED = Counter("posts_ingested_total", "New posts stored", ["subreddit"])
+COMMENTS_INGESTED = Counter("comments_ingested_total", "New comments stored", ["subreddit"])
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "PostgreSQLClient method duration", ["method"], buckets=DB_BUCKETS)
+JOB_SECONDS = Histogram("scheduler_job_seconds", "Scheduler job duration", ["job"], buckets=JOB_BUCKETS)
+JOB_MISFIRES = Counter(
+    "scheduler_job_misfires_total", "Scheduler runs skipped as misfired or still running", ["job"]
+)
+JOB_ERRORS = Counter("scheduler_job_errors_total", "Scheduler runs that raised", ["job"])
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0") -> None:
+    """
+    Serve /metrics on the given port from a background thread.
+    """
+    start_http_server(port, addr=addr)
+    logging.info(f"Metrics served on {addr}:{port}/metrics")
+
+def record_chat(model: str, kind: str, seconds: float, usage) -> None:
+    """
+    Record a successful chat completion and its token usage (usage may be None).
+    """
+    SENTIMENT_REQUEST_SECONDS.labels(model, kind).observe(seconds)
+    SENTIMENT_REQUESTS.labels(model, "ok").inc()
+    if usage is not None:
+        SENTIMENT_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+        SENTIMENT_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+
+def record_labels(results: list[tuple[str, str, str, float | None]]) -> None:
+    """
+    Count stored (post_id, sentiment, model, confidence) results.
+    """
+    for _, sentiment, model, _ in results:
+        SENTIMENT_LABELS.labels(model, sentiment).inc()
+
+def timed_methods(histogram: Histogram):
+    """
+    Class decorator observing the duration of every public method in `histogram`,
+    labelled with the method name. Generator methods are left alone, their time is
+    spent in the methods they call.
+    """
+    def decorate(cls):
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(method) or inspect.isgeneratorfunction(method):
+                continue
+            setattr(cls, name, _timed(method, histogram.labels(name)))
+        return cls
+
+    return decorate
+
+def _timed(method, observer):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            observer.observe(time.perf_counter() - start)
+
+    return wrapper
+
+SCHEDULER_EVENTS = (
+    EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+)
+
+def instrument_scheduler(scheduler) -> None:
+    """
+    Record job durations, errors and misfires of an APScheduler scheduler.
+    """
+    submitted: dict[str, float] = {}
+
+    def listener(event) -> None:
+        if event.code == EVENT_JOB_SUBMITTED:
+            submitted[event.job_id] = time.monotonic()
+            return
+        if event.code in (EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES):
+            JOB_MISFIRES.labels(event.job_id).inc()
+            return
+        started = submitted.pop(event.job_id, None)
+        if started is not None:
+            JOB_SECONDS.labels(event.job_id).observe(time.monotonic() - started)
+        if event.code == EVENT_JOB_ERROR:
+            JOB_ERRORS.labels(event.job_id).inc()
+
+    scheduler.add_listener(listener, SCHEDULER_EVENTS)
@@ -0,0 +1,83 @@
+"""
+factory.py
+
+This module builds the sentiment models from the `sentiment` section of config.yaml.
+It is shared by the entry points (main.py, worker.py, evaluation.shadow) and has no
+import-time side effects: loading the .env file and configuring logging is left to
+the entry point that imports it.
+
+Functions:
+- get_preprocessor: TextPreprocessor shared by every model, None when disabled.
+- get_model_router: ModelRouter over the configured models for the posts or comments queue.
+"""
+
+from database.postgresql import PostgreSQLClient
+from database.comment_queue import CommentQueue
+from .models import LlamaScout, MistralNemo
+from .sentiment_model import SentimentModel
+from .model_router import ModelRouter
+from .lexicon_model import LexiconModel
+from .preprocessing import TextPreprocessor
+from .sentiment_cache import get_sentiment_cache
+
+def get_preprocessor(sentiment_cfg: dict) -> TextPreprocessor | None:
+    # Text cleaning shared by every model, None when disabled
+    preprocessing_cfg = sentiment_cfg.get("preprocessing", {})
+    if not preprocessing_cfg.get("enabled", True):
+        return None
+
+    return TextPreprocessor(
+        max_content_tokens=preprocessing_cfg.get("max_content_tokens", 256),
+        max_title_tokens=preprocessing_cfg.get("max_title_tokens", 64),
+        skip_removed=preprocessing_cfg.get("skip_removed", True)
+    )
+
+def get_model_router(sentiment_cfg: dict, storage: PostgreSQLClient | CommentQueue | None = None) -> ModelRouter:
+    # storage selects the work queue, posts by default
+    storage = storage or PostgreSQLClient()
+    models = [LlamaScout(storage), MistralNemo(storage)]
+    # Label token ids are tokenizer specific, so a logit_bias is only known for configured models
+    logit_biases = {}
+    for extra in sentiment_cfg.get("models") or []:
+        models.append(SentimentModel(
+            model=extra["model"],
+            temperature=extra.get("temperature", 0),
+            max_tokens=extra.get("max_tokens", 3),
+            batch_size=extra.get("batch_size", 1),
+            storage=storage
+        ))
+        logit_biases[extra["model"]] = extra.get("logit_bias")
+
+    cache_cfg = sentiment_cfg.get("cache", {})
+    cache = None
+    if cache_cfg.get("enabled", True):
+        cache = get_sentiment_cache(
+            max_entries=cache_cfg.get("max_entries", 10000),
+            ttl_days=cache_cfg.get("ttl_days", 30)
+        )
+    local_cfg = sentiment_cfg.get("local", {})
+    local_model = None
+    if local_cfg.get("enabled", False):
+        threshold = local_cfg.get("confidence_threshold", 0.6)
+        if local_cfg.get("lexicon_path"):
+            local_model = LexiconModel.from_file(local_cfg["lexicon_path"], confidence_threshold=threshold)
+        else:
+            local_model = LexiconModel(confidence_threshold=threshold)
+    preprocessor = get_preprocessor(sentiment_cfg)
+    for model in models:
+        model.set_preprocessor(preprocessor)
+        model.set_local_model(local_model)
+        model.set_rate_limit(
+            requests_per_minute=sentiment_cfg.get("requests_per_minute", 20),
+            burst=sentiment_cfg.get("burst")
+        )
+        model.set_cache(cache)
+        model.set_constrained(sentiment_cfg.get("constrained", False), logit_biases.get(model.model))
+
+    router_cfg = sentiment_cfg.get("router", {})
+    return ModelRouter(
+        models,
+        probe_ttl=router_cfg.get("probe_ttl", 600),
+        failure_threshold=router_cfg.get("failure_threshold", 3),
+        recovery_timeout=router_cfg.get("recovery_timeout", 300)
+    )
@@ -0,0 +1,145 @@
+"""
+lexicon_model.py
+
+This module defines the LexiconModel class, a local CPU sentiment scorer used as
+a fast first pass before the OpenRouter models.
+
+Posts are scored VADER-style: token valences from a lexicon are summed per post
+(with simple negation handling) and normalized into a compound score in [-1, 1].
+Scoring is vectorized with NumPy over whole batches of posts, so thousands of
+posts are labelled in milliseconds without any API call. Only labels whose
+confidence reaches the configured threshold are kept, the rest go to the LLMs.
+"""
+
+import re
+import numpy as np
+
+# Compact built-in lexicon (valence on the VADER -4..4 scale)
+DEFAULT_LEXICON = {
+    "love": 3.2, "loved": 2.9, "loving": 2.9, "amazing": 2.8, "awesome": 3.1, "excellent": 2.7,
+    "fantastic": 2.6, "great": 3.1, "good": 1.9, "nice": 1.8, "happy": 2.7, "glad": 2.0,
+    "excited": 1.4, "exciting": 2.2, "wonderful": 2.7, "best": 3.2, "better": 1.9, "beautiful": 2.9,
+    "perfect": 2.7, "brilliant": 2.8, "enjoy": 2.2, "enjoyed": 2.3, "thanks": 1.9, "thank": 1.5,
+    "grateful": 2.0, "congrats": 2.4, "congratulations": 2.9, "win": 2.8, "won": 2.7, "winning": 2.4,
+    "success": 2.7, "successful": 2.8, "profit": 1.9, "gains": 1.8, "bullish": 1.8, "moon": 1.2,
+    "recommend": 1.5, "helpful": 1.8, "impressive": 2.3, "incredible": 2.0, "cool": 1.3, "fun": 2.3,
+    "like": 1.5, "liked": 1.8, "proud": 2.1, "hope": 1.9, "hopeful": 1.6, "optimistic": 1.3,
+    "hate": -2.7, "hated": -3.2, "terrible": -2.1, "awful": -2.0, "horrible": -2.5, "worst": -3.1,
+    "bad": -2.5, "worse": -2.1, "sad": -2.1, "angry": -2.3, "annoying": -1.7, "annoyed": -1.6,
+    "disappointed": -1.9, "disappointing": -2.2, "fail": -2.5, "failed": -2.3, "failure": -2.3,
+    "scam": -2.4, "fraud": -2.8, "crash": -1.7, "crashed": -1.8, "loss": -1.3, "losses": -1.7,
+    "lost": -1.3, "bearish": -1.6, "dump": -1.6, "broken": -2.1, "bug": -1.0, "useless": -1.8,
+    "stupid": -2.4, "ugly": -2.3, "scared": -1.9, "afraid": -2.0, "worried": -1.2, "fear": -2.2,
+    "panic": -2.3, "problem": -1.7, "problems": -1.7, "issue": -0.7, "wrong": -2.1, "sucks": -1.5,
+    "rip": -1.3, "dead": -3.3, "die": -2.9, "kill": -3.7, "pain": -2.3, "ruined": -2.4, "toxic": -2.3,
+}
+NEGATIONS = {"not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "cannot",
+             "dont", "don't", "doesnt", "doesn't", "didnt", "didn't", "isnt", "isn't", "wasnt", "wasn't",
+             "wont", "won't", "cant", "can't", "aint", "ain't", "shouldnt", "shouldn't"}
+NEGATION_SCALAR = -0.74
+NORMALIZATION_ALPHA = 15
+NEUTRAL_BAND = 0.05
+TOKEN_PATTERN = re.compile(r"[a-z']+")
+
+class LexiconModel:
+    """
+    Local lexicon-based sentiment scorer with a SentimentModel-like interface.
+
+    Attributes:
+    - _lexicon_words / _valences: vocabulary index and NumPy valence vector
+    - _confidence_threshold: minimum confidence for a label to be accepted
+
+    Methods:
+    - from_file: build the model from a VADER-format lexicon file
+    - score: compound scores for a batch of posts (vectorized)
+    - classify: labels and confidences for a batch of posts
+    - split_confident: separate posts labelled with enough confidence from the rest
+    - test_sentiment_model: always True, the model has no external dependency
+    """
+
+    model_version = "local/lexicon-v1"
+
+    def __init__(self, lexicon: dict[str, float] | None = None, confidence_threshold: float = 0.6):
+        # Build the vocabulary index and valence vector
+        lexicon = lexicon or DEFAULT_LEXICON
+        self._lexicon_words = {word: index for index, word in enumerate(lexicon)}
+        self._valences = np.fromiter(lexicon.values(), dtype=np.float64, count=len(lexicon))
+        if not (0 <= confidence_threshold <= 1):
+            raise ValueError("confidence_threshold must be between 0 and 1!")
+        self._confidence_threshold = confidence_threshold
+
+    @classmethod
+    def from_file(cls, path: str, confidence_threshold: float = 0.6):
+        # Load a lexicon with one "token<TAB>mean valence<TAB>..." entry per line (vader_lexicon.txt)
+        lexicon = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) >= 2:
+                    try:
+                        lexicon[parts[0].lower()] = float(parts[1])
+                    except ValueError:
+                        continue
+
+        return cls(lexicon, confidence_threshold)
+
+    @property
+    def model(self) -> str:
+        # Identifier stored as model_version of labels produced by this tier
+        return self.model_version
+
+    def test_sentiment_model(self) -> bool:
+        # The local model is always available
+        return True
+
+    def score(self, posts: list[dict]) -> np.ndarray:
+        # Compound score in [-1, 1] for every post, computed for the whole batch at once
+        token_ids: list[int] = []
+        post_ids: list[int] = []
+        negators: list[bool] = []
+        for index, post in enumerate(posts):
+            text = f"{post.get('title') or ''} {post.get('content') or ''}".lower()
+            for token in TOKEN_PATTERN.findall(text):
+                token_ids.append(self._lexicon_words.get(token, -1))
+                post_ids.append(index)
+                negators.append(token in NEGATIONS)
+
+        if not token_ids:
+            return np.zeros(len(posts))
+        ids = np.asarray(token_ids)
+        owners = np.asarray(post_ids)
+        negations = np.asarray(negators)
+
+        known = ids >= 0
+        valence = np.where(known, self._valences[np.where(known, ids, 0)], 0.0)
+        # A negation word directly before a sentiment word of the same post dampens and flips it
+        negated = np.zeros_like(negations)
+        negated[1:] = negations[:-1] & (owners[1:] == owners[:-1])
+        valence = np.where(negated, valence * NEGATION_SCALAR, valence)
+
+        totals = np.bincount(owners, weights=valence, minlength=len(posts))
+
+        return totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)
+
+    def classify(self, posts: list[dict]) -> tuple[list[str], np.ndarray]:
+        # Labels and confidences; confidence is |compound|, NEUTRAL labels are never confident
+        compound = self.score(posts)
+        labels = np.where(compound >= NEUTRAL_BAND, "POSITIVE", np.where(compound <= -NEUTRAL_BAND, "NEGATIVE", "NEUTRAL"))
+        confidence = np.where(labels == "NEUTRAL", 0.0, np.abs(compound))
+
+        return labels.tolist(), confidence
+
+    def split_confident(self, posts: list[dict]) -> tuple[dict[str, tuple[str, float]], list[dict]]:
+        # Return post_id -> (label, confidence) for confident posts, and the posts left for the LLMs
+        if not posts:
+            return {}, []
+        labels, confidence = self.classify(posts)
+        accepted = confidence >= self._confidence_threshold
+        confident = {
+            post["post_id"]: (label, float(score))
+            for post, label, score, keep in zip(posts, labels, confidence, accepted)
+            if keep
+        }
+        remaining = [post for post, keep in zip(posts, accepted) if not keep]
+
+        return confident, remaining
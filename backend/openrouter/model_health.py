@@ -0,0 +1,131 @@
+"""
+model_health.py
+
+This module tracks the health of a sentiment model from real traffic and probes.
+
+Classes:
+- CircuitOpenError: raised instead of sending a request to a model whose circuit is open.
+- ModelHealth: circuit breaker (closed, open, half-open) plus latency and error rate statistics.
+"""
+
+import threading
+import time
+from openai import OpenAIError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+class CircuitOpenError(OpenAIError):
+    """
+    Raised when a request is refused locally because the model's circuit is open.
+    """
+    pass
+
+class ModelHealth:
+    """
+    Health state of one model.
+
+    The circuit opens after `failure_threshold` consecutive failures, or when the
+    error rate (exponentially weighted) exceeds `max_error_rate`. After
+    `recovery_timeout` seconds it becomes half-open and lets a single trial request
+    through: success closes it, failure opens it again.
+
+    Methods:
+    - allow_request: whether a request may be sent now
+    - available: whether the model should be used for new work
+    - record_success: report a successful request and its latency
+    - record_failure: report a failed request
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        recovery_timeout: float = 300,
+        max_error_rate: float = 0.5,
+        smoothing: float = 0.2
+    ):
+        # Initialize breaker state and traffic statistics
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._max_error_rate = max_error_rate
+        self._smoothing = smoothing
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.last_activity = 0.0
+
+    @property
+    def state(self) -> str:
+        # Current breaker state, an open circuit turns half-open once the recovery timeout passed
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        # State evaluation without locking (caller holds the lock)
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._recovery_timeout:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def available(self) -> bool:
+        # True unless the circuit is open
+        return self.state != OPEN
+
+    def allow_request(self) -> bool:
+        # Closed circuits allow everything, half-open ones a single trial request
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency: float) -> None:
+        # Close the circuit and update latency/error rate averages
+        with self._lock:
+            self.requests += 1
+            self.last_activity = time.monotonic()
+            self.latency = latency if self.latency is None else (
+                self._smoothing * latency + (1 - self._smoothing) * self.latency
+            )
+            self.error_rate = (1 - self._smoothing) * self.error_rate
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+            self._state = CLOSED
+
+    def record_failure(self) -> None:
+        # Count the failure and open the circuit when a threshold is crossed
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.last_activity = time.monotonic()
+            self.error_rate = self._smoothing + (1 - self._smoothing) * self.error_rate
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if (
+                self._current_state() == HALF_OPEN
+                or self._consecutive_failures >= self._failure_threshold
+                or (self.requests >= self._failure_threshold and self.error_rate > self._max_error_rate)
+            ):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        # Statistics for logging
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "requests": self.requests,
+                "failures": self.failures,
+                "error_rate": round(self.error_rate, 3),
+                "latency": round(self.latency, 3) if self.latency is not None else None,
+            }
@@ -0,0 +1,107 @@
+"""
+model_router.py
+
+This module defines the ModelRouter class, which owns the sentiment models for the
+lifetime of the process and routes the pipeline to the healthiest one, failing over
+to the others in the middle of a run.
+"""
+
+import asyncio
+import time
+import logging
+from collections.abc import Callable
+from .model_health import ModelHealth
+from .sentiment_model import SentimentModel
+
+class ModelRouter:
+    """
+    Routes sentiment analysis to the healthiest configured model.
+
+    The router is created once per process, so model objects, rate limiters and
+    health state survive between scheduler ticks. A model is probed with a real
+    request only if it saw no traffic within `probe_ttl` seconds; models with an
+    open circuit are not probed at all until the circuit turns half-open.
+    Models are ordered by configuration priority, skipping open circuits; the first
+    one runs the pipeline and the others are its fallbacks for posts it fails on.
+
+    Methods:
+    - ordered_models: healthy models in priority order, probing stale ones
+    - pipeline: run the sentiment pipeline with failover
+    - analyze_posts: classify and store already claimed posts with failover (stream mode)
+    """
+
+    def __init__(
+        self,
+        models: list[SentimentModel],
+        probe_ttl: float = 600,
+        failure_threshold: int = 3,
+        recovery_timeout: float = 300
+    ):
+        # Attach a ModelHealth to every model
+        self._models = models
+        self._probe_ttl = probe_ttl
+        for model in models:
+            model.set_health(ModelHealth(failure_threshold=failure_threshold, recovery_timeout=recovery_timeout))
+
+    def _probe(self, model: SentimentModel) -> bool:
+        # Send a test request unless recent traffic already tells whether the model works
+        health = model.health
+        if time.monotonic() - health.last_activity < self._probe_ttl:
+            return True
+        if not health.allow_request():
+            return False
+        start = time.monotonic()
+        if model.test_sentiment_model():
+            health.record_success(time.monotonic() - start)
+            return True
+        health.record_failure()
+
+        return False
+
+    def ordered_models(self) -> list[SentimentModel]:
+        # Models with a closed or half-open circuit that passed their (cached) probe
+        models = [model for model in self._models if model.health.available() and self._probe(model)]
+        for model in self._models:
+            logging.info(f"{model.model}: {model.health.snapshot()}")
+
+        return models
+
+    def analyze_posts(self, posts: list[dict]) -> int:
+        # Classify claimed posts on the best available model, returns the number of stored results
+        models = [model for model in self._models if model.health.available() and self._probe(model)]
+        if not models:
+            logging.error("No available sentiment model found!")
+            self._models[0]._storage.release_posts([post["post_id"] for post in posts])
+            return 0
+
+        return models[0].analyze_posts(posts, fallbacks=models[1:])
+
+    def pipeline(
+        self,
+        mode: str = "async",
+        concurrency: int = 8,
+        claim_size: int = 100,
+        lease_seconds: int = 600,
+        stop: Callable[[], bool] | None = None
+    ) -> None:
+        # Run the pipeline on the best model, the remaining healthy models act as fallbacks
+        if self._models[0]._check_if_empty_db():
+            logging.warning(f"Empty database!")
+            return
+        models = self.ordered_models()
+        if not models:
+            logging.error("No available sentiment model found!")
+            return
+        primary, fallbacks = models[0], models[1:]
+        logging.info(f"Using {primary.model}" + (f", fallbacks: {[m.model for m in fallbacks]}" if fallbacks else ""))
+
+        if mode == "async":
+            asyncio.run(primary.pipeline_async(
+                concurrency=concurrency,
+                claim_size=claim_size,
+                lease_seconds=lease_seconds,
+                fallbacks=fallbacks,
+                stop=stop
+            ))
+        else:
+            primary.pipeline(claim_size=claim_size, lease_seconds=lease_seconds, fallbacks=fallbacks, stop=stop)
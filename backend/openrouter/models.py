@@ -7,8 +7,12 @@ that inherit from the base SentimentModel.
 Classes:
 - LlamaScout: Uses the "meta-llama/llama-4-scout" model with fixed parameters.
 - MistralNemo: Uses the "mistralai/mistral-nemo" model with fixed parameters.
+
+batch_size sets how many posts each model classifies with a single request.
+storage selects the work queue, e.g. a CommentQueue to classify comments.
 """
 
+from database.postgresql import PostgreSQLClient
 from .sentiment_model import SentimentModel
 
 class LlamaScout(SentimentModel):
@@ -16,11 +20,13 @@ class LlamaScout(SentimentModel):
     SentimentModel subclass using the meta-llama/llama-4-scout model.
     """
 
-    def __init__(self):
+    def __init__(self, storage: PostgreSQLClient | None = None):
         super().__init__(
             model="meta-llama/llama-4-scout:free",
             temperature=0,
-            max_tokens=3
+            max_tokens=3,
+            batch_size=10,
+            storage=storage
         )
 
 class MistralNemo(SentimentModel):
@@ -28,9 +34,11 @@ class MistralNemo(SentimentModel):
     SentimentModel subclass using the mistralai/mistral-nemo model.
     """
 
-    def __init__(self):
+    def __init__(self, storage: PostgreSQLClient | None = None):
         super().__init__(
             model="mistralai/mistral-nemo:free",
             temperature=0,
-            max_tokens=3
+            max_tokens=3,
+            batch_size=5,
+            storage=storage
         )
@@ -4,18 +4,47 @@ openrouter_client.py
 This module defines the OpenRouter abstract base class that manages
 sentiment analysis workflow using OpenAI-compatible models and PostgreSQL storage.
 
-It fetches unsentimented posts, builds prompts, sends requests to the model,
+It claims unsentimented posts from the database work queue, builds prompts, sends requests to the model,
 validates responses, and updates the database accordingly.
+
+Requests are paced by an AdaptiveRateLimiter instead of a fixed sleep. Besides the
+sequential pipeline, an asyncio pipeline keeps several requests in flight at once
+using the async OpenAI client.
+
+In constrained mode every post gets its own request limited to a single output
+token, with logprobs. The label is read from the top token alternatives (any
+unambiguous prefix of positive/neutral/negative counts), and the probability of the
+chosen label, normalized over the label alternatives, is stored as its confidence.
 """
 
+import asyncio
+import json
+import math
 import time
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Sequence
 from database.postgresql import PostgreSQLClient
-from openai import OpenAI, OpenAIError
-from openai.types.chat import ChatCompletionUserMessageParam
+from rate_limiter.token_bucket import AdaptiveRateLimiter
+from .sentiment_cache import SentimentCache
+from .model_health import CircuitOpenError, ModelHealth
+from .lexicon_model import LexiconModel
+from .preprocessing import SKIPPED, TextPreprocessor
+from monitoring.metrics import (
+    SENTIMENT_BACKLOG, SENTIMENT_REQUESTS, SENTIMENT_VALIDATION_FAILURES, record_chat, record_labels
+)
+from openai import AsyncOpenAI, OpenAI, OpenAIError, RateLimitError
+from openai.types.chat import ChatCompletion, ChatCompletionUserMessageParam
 import os
+import socket
+import uuid
 import logging
 
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+MAX_RATE_LIMIT_RETRIES = 5
+BATCH_TOKENS_PER_POST = 12
+LABEL_WORDS = {"positive": "POSITIVE", "neutral": "NEUTRAL", "negative": "NEGATIVE"}
+TOP_LOGPROBS = 5
+
 class OpenRouter(ABC):
     """
     Abstract base class for OpenAI-based sentiment analysis clients.
@@ -26,40 +55,417 @@ class OpenRouter(ABC):
     - _temperature: temperature setting for generation
     - _max_tokens: max tokens for model responses
     - _client: OpenAI API client instance
+    - _batch_size: number of posts packed into one request (1 disables batching)
+    - _async_client: AsyncOpenAI API client instance, created for each pipeline_async run
+    - _limiter: AdaptiveRateLimiter pacing requests to the provider
+    - _prompt_version: version of the prompt templates, part of the cache key
+    - _cache: optional SentimentCache consulted before any API call
+    - _health: optional ModelHealth, requests are refused while its circuit is open
+    - _local_model: optional LexiconModel labelling confident posts before any API call
+    - _preprocessor: optional TextPreprocessor cleaning and truncating posts before classification
+    - _requests: number of chat completion requests sent, including rate limited attempts
+    - _constrained: classify one post per request with a single label token and logprobs
+    - _logit_bias: optional token id -> bias sent with constrained requests
+    - _confidences: post_id -> label probability of constrained answers, until the results are built
 
     Methods:
-    - pipeline: process all unsentimented posts from DB
+    - pipeline: claim and process unsentimented posts from DB one request at a time
+    - pipeline_async: claim and process unsentimented posts with several requests in flight
+      (both accept fallback models that take over the posts this model fails on, and a stop
+      callback checked between claimed batches for graceful shutdown)
+    - analyze_posts: classify and store posts claimed by the caller, e.g. the stream workers
+    - classify_async: classify posts concurrently without touching any work queue, e.g. shadow runs
     - _build_prompt: abstract method to build prompt string (to be implemented in subclass)
-    - _analyze_sentiment: send prompt and update DB with sentiment result
+    - _build_constrained_prompt: abstract method to build the single-word prompt of constrained mode
+    - _analyze_sentiment: send prompt and return the validated sentiment
+    - _analyze_sentiment_async: asyncio counterpart of _analyze_sentiment
+    - _analyze_batch: classify several posts with one request, falling back to single-post mode
     - test_sentiment_model: check if the model responds correctly
     """
 
-    def __init__(self):
-        # Initialize DB client and OpenAI client
-        self._storage = PostgreSQLClient()
+    def __init__(self, storage: PostgreSQLClient | None = None):
+        # Initialize DB client, OpenAI client and the default rate limiter
+        self._storage = storage or PostgreSQLClient()
         self._model = None
         self._temperature = None
         self._max_tokens = None
+        self._batch_size = 1
+        self._prompt_version = None
+        self._cache = None
+        self._health = None
+        self._local_model = None
+        self._preprocessor = None
         self._client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
+            base_url=os.getenv("OPENROUTER_BASE_URL", OPENROUTER_BASE_URL),
+            api_key=os.getenv("API_KEY")
+        )
+        self._async_client = None
+        self._limiter = AdaptiveRateLimiter(requests_per_minute=20)
+        self._requests = 0
+        self._constrained = False
+        self._logit_bias = None
+        self._confidences: dict[str, float] = {}
+
+    def set_rate_limit(self, requests_per_minute: float, burst: float | None = None) -> None:
+        # Replace the rate limiter, e.g. with limits matching the provider's quota
+        self._limiter = AdaptiveRateLimiter(requests_per_minute=requests_per_minute, burst=burst)
+
+    @staticmethod
+    def _worker_id() -> str:
+        # Identifier stored with claimed posts, unique per pipeline run
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def set_cache(self, cache: SentimentCache | None) -> None:
+        # Enable (or disable with None) the content hash classification cache
+        self._cache = cache
+
+    def set_local_model(self, local_model: LexiconModel | None) -> None:
+        # Enable (or disable with None) the local first-pass classifier
+        self._local_model = local_model
+
+    def set_constrained(self, enabled: bool, logit_bias: dict[int, float] | None = None) -> None:
+        # Enable (or disable) single-token classification with logprob confidences, one post per request.
+        # logit_bias maps token ids of the label words to a bias; the ids depend on the model's tokenizer
+        self._constrained = enabled
+        self._logit_bias = logit_bias
+        if enabled:
+            self._batch_size = 1
+
+    def set_preprocessor(self, preprocessor: TextPreprocessor | None) -> None:
+        # Enable (or disable with None) text cleaning and truncation before classification
+        self._preprocessor = preprocessor
+
+    def _pre_pass(self, posts: list[dict]) -> tuple[dict[str, tuple[str, str, float | None]], list[dict]]:
+        # Preprocess posts and run the local model; returns post_id -> (sentiment, model, confidence) for
+        # posts settled without the LLM (SKIPPED or confidently labelled) and the cleaned posts left for it
+        results = {}
+        if self._preprocessor is not None:
+            prepared = []
+            for post in posts:
+                cleaned = self._preprocessor.prepare(post)
+                if cleaned is None:
+                    results[post["post_id"]] = (SKIPPED, "preprocessing", None)
+                else:
+                    prepared.append(cleaned)
+            if results:
+                logging.info(f"{len(results)} of {len(posts)} post(s) skipped as empty or removed")
+            posts = prepared
+        local, posts = self._local_pass(posts)
+        results.update(local)
+
+        return results, posts
+
+    def _local_pass(self, posts: list[dict]) -> tuple[dict[str, tuple[str, str, float | None]], list[dict]]:
+        # Label confident posts locally, returns post_id -> (sentiment, model, confidence) and the posts left for the LLM
+        if self._local_model is None:
+            return {}, posts
+        confident, remaining = self._local_model.split_confident(posts)
+        if confident:
+            logging.info(f"{len(confident)} of {len(posts)} post(s) labelled by {self._local_model.model}")
+
+        return {
+            post_id: (label, self._local_model.model, confidence) for post_id, (label, confidence) in confident.items()
+        }, remaining
+
+    def set_health(self, health: ModelHealth | None) -> None:
+        # Attach the circuit breaker and traffic statistics maintained for this model
+        self._health = health
+
+    @property
+    def health(self) -> ModelHealth | None:
+        # Getter for the model's health state
+        return self._health
+
+    @property
+    def requests(self) -> int:
+        # Getter for the number of requests sent so far, e.g. to enforce a request budget
+        return self._requests
+
+    @property
+    def constrained(self) -> bool:
+        # Getter for constrained mode, see set_constrained
+        return self._constrained
+
+    def _split(self, posts: list[dict]) -> list[list[dict]]:
+        # Group claimed posts into batches of `_batch_size` posts
+        return [posts[i:i + self._batch_size] for i in range(0, len(posts), self._batch_size)]
+
+    def _cache_version(self) -> str:
+        # Prompt version part of the cache key, constrained mode uses its own prompt
+        return f"{self._prompt_version}+constrained" if self._constrained else self._prompt_version
+
+    def _cache_lookup(self, posts: list[dict]) -> tuple[dict[str, str], dict[str, str], list[dict]]:
+        # Return post_id -> content hash, post_id -> cached sentiment and the posts still to classify.
+        # Posts sharing a content hash are classified once, through their first occurrence
+        hashes = {post["post_id"]: SentimentCache.content_hash(post["title"], post["content"]) for post in posts}
+        cached = self._cache.get_many(set(hashes.values()), self._model, self._cache_version())
+        sentiments = {post_id: cached[content_hash] for post_id, content_hash in hashes.items() if content_hash in cached}
+
+        unique: dict[str, dict] = {}
+        for post in posts:
+            if post["post_id"] not in sentiments:
+                unique.setdefault(hashes[post["post_id"]], post)
+
+        return hashes, sentiments, list(unique.values())
+
+    def _cache_store(self, hashes: dict[str, str], sentiments: dict[str, str], answers: dict[str, str]) -> None:
+        # Cache valid new answers and copy them to the duplicates of the classified posts
+        by_hash = {hashes[post_id]: sentiment for post_id, sentiment in answers.items()}
+        self._cache.put_many(
+            {content_hash: sentiment for content_hash, sentiment in by_hash.items() if self._sentiment_validation(sentiment)},
+            self._model,
+            self._cache_version()
+        )
+        for post_id, content_hash in hashes.items():
+            if post_id not in sentiments and content_hash in by_hash:
+                sentiments[post_id] = by_hash[content_hash]
+
+    def _classify_posts(self, posts: list[dict], fallbacks: Sequence["OpenRouter"] = ()) -> dict[str, tuple[str, str, float | None]]:
+        # Classify claimed posts, returns post_id -> (sentiment, model, confidence) for the posts that got an answer.
+        # Posts this model fails on are handed to the fallback models in order
+        try:
+            sentiments = {}
+            if self._health is None or self._health.available():
+                if self._cache is None:
+                    hashes, sentiments, to_classify = {}, {}, posts
+                else:
+                    hashes, sentiments, to_classify = self._cache_lookup(posts)
+
+                answers = {}
+                for batch in self._split(to_classify):
+                    logging.info(
+                        f"Analyzing sentiment for {len(batch)} post(s) using {self._model}",
+                        extra={"model": self._model, "posts": len(batch)}
+                    )
+                    try:
+                        answers.update(self._analyze_batch(batch))
+                    except OpenAIError as e:
+                        logging.warning(f"Request for {len(batch)} post(s) failed: {e}", extra={"model": self._model})
+
+                if self._cache is None:
+                    sentiments = answers
+                else:
+                    self._cache_store(hashes, sentiments, answers)
+
+            results = self._with_confidence(sentiments)
+            remaining = [post for post in posts if post["post_id"] not in results]
+            if remaining and fallbacks:
+                logging.warning(f"Failing over {len(remaining)} post(s) from {self._model} to {fallbacks[0]._model}")
+                results.update(fallbacks[0]._classify_posts(remaining, fallbacks[1:]))
+
+            return results
+        finally:
+            self._drop_confidences(posts)
+
+    async def _classify_posts_async(
+        self,
+        posts: list[dict],
+        semaphore: asyncio.Semaphore,
+        fallbacks: Sequence["OpenRouter"] = ()
+    ) -> dict[str, tuple[str, str, float | None]]:
+        # Async counterpart of _classify_posts, at most `semaphore` requests are in flight
+        async def analyze(batch: list[dict]) -> dict[str, str]:
+            async with semaphore:
+                try:
+                    return await self._analyze_batch_async(batch)
+                except OpenAIError as e:
+                    logging.warning(f"Request for {len(batch)} post(s) failed: {e}", extra={"model": self._model})
+                    return {}
+
+        try:
+            sentiments = {}
+            if self._health is None or self._health.available():
+                if self._cache is None:
+                    hashes, sentiments, to_classify = {}, {}, posts
+                else:
+                    hashes, sentiments, to_classify = self._cache_lookup(posts)
+
+                answers = {}
+                for result in await asyncio.gather(*(analyze(batch) for batch in self._split(to_classify))):
+                    answers.update(result)
+
+                if self._cache is None:
+                    sentiments = answers
+                else:
+                    self._cache_store(hashes, sentiments, answers)
+
+            results = self._with_confidence(sentiments)
+            remaining = [post for post in posts if post["post_id"] not in results]
+            if remaining and fallbacks:
+                logging.warning(f"Failing over {len(remaining)} post(s) from {self._model} to {fallbacks[0]._model}")
+                results.update(await fallbacks[0]._classify_posts_async(remaining, semaphore, fallbacks[1:]))
+
+            return results
+        finally:
+            self._drop_confidences(posts)
+
+    def _with_confidence(self, sentiments: dict[str, str]) -> dict[str, tuple[str, str, float | None]]:
+        # post_id -> (sentiment, model, confidence); only constrained answers have a confidence,
+        # cached ones and their duplicates do not
+        return {
+            post_id: (sentiment, self._model, self._confidences.pop(post_id, None))
+            for post_id, sentiment in sentiments.items()
+        }
+
+    def _drop_confidences(self, posts: list[dict]) -> None:
+        # Forget the confidences of a batch whose results are built, including the ones of posts that
+        # got no valid label. Only the batch's own entries, other threads may classify on this model
+        for post in posts:
+            self._confidences.pop(post["post_id"], None)
+
+    def _open_async_client(self) -> None:
+        # The async client is bound to the running event loop, so it lives only for one run
+        self._async_client = AsyncOpenAI(
+            base_url=os.getenv("OPENROUTER_BASE_URL", OPENROUTER_BASE_URL),
             api_key=os.getenv("API_KEY")
         )
 
-    def pipeline(self) -> None:
-        # Analyze all posts without sentiment in DB
+    async def _close_async_client(self) -> None:
+        # Close the async client opened for the current run
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def _store_results(self, results: dict[str, tuple[str, str, float | None]]) -> None:
+        # Store post_id -> (sentiment, model, confidence) results and count the labels
+        rows = [(post_id, *result) for post_id, result in results.items()]
+        self._storage.mark_posts_sentiment(rows)
+        record_labels(rows)
+
+    def _any_model_available(self, fallbacks: Sequence["OpenRouter"]) -> bool:
+        # True unless this model and every fallback have an open circuit
+        return any(model._health is None or model._health.available() for model in (self, *fallbacks))
+
+    def _finish_batch(self, pending: set[str], results: dict, failed: set[str], fallbacks: Sequence["OpenRouter"]) -> bool:
+        # Release the posts of a claimed batch that got no answer, so other workers can retry them,
+        # and remember them so this run does not claim them again. Returns False once nothing was
+        # classified and no model is left to classify with, i.e. claiming more would only pile up leases
+        unanswered = pending - results.keys()
+        self._storage.release_posts(list(unanswered))
+        failed.update(unanswered)
+        if not results and not self._any_model_available(fallbacks):
+            logging.error("No available sentiment model left, not claiming more posts")
+            return False
+
+        return True
+
+    def _finish_run(self) -> None:
+        # Update the backlog gauge, report cache efficiency and drop expired cache entries after a run
+        SENTIMENT_BACKLOG.labels(self._storage.queue).set(self._storage.count_backlog())
+        if self._cache is None:
+            return
+        removed = self._cache.purge_expired()
+        logging.info(f"Sentiment cache: {self._cache.stats}, {removed} expired entries removed")
+
+    def analyze_posts(self, posts: list[dict], fallbacks: Sequence["OpenRouter"] = ()) -> int:
+        # Classify posts already claimed by the caller and store the results.
+        # Posts left without an answer are released, returns the number of stored results
+        stored: dict[str, tuple[str, str, float | None]] = {}
+        try:
+            results, remaining = self._pre_pass(posts)
+            results.update(self._classify_posts(remaining, fallbacks))
+            self._store_results(results)
+            stored = results
+        finally:
+            self._storage.release_posts([post["post_id"] for post in posts if post["post_id"] not in stored])
+
+        return len(stored)
+
+    async def classify_async(self, posts: list[dict], concurrency: int = 8) -> dict[str, tuple[str, str, float | None]]:
+        # Classify posts with `concurrency` requests in flight and return post_id -> (sentiment, model,
+        # confidence) for the posts that got an answer. Nothing is claimed, stored or released
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive integer!")
+        self._open_async_client()
+        try:
+            results, posts = self._pre_pass(posts)
+            results.update(await self._classify_posts_async(posts, asyncio.Semaphore(concurrency)))
+        finally:
+            await self._close_async_client()
+
+        return results
+
+    def pipeline(
+        self,
+        claim_size: int = 100,
+        lease_seconds: int = 600,
+        fallbacks: Sequence["OpenRouter"] = (),
+        stop: Callable[[], bool] | None = None
+    ) -> None:
+        # Analyze all posts without sentiment in DB, claiming them in chunks of `claim_size`
+        if self._check_if_empty_db():
+            logging.warning(f"Empty database!")
+            return
+
+        worker_id = self._worker_id()
+        failed: set[str] = set()
+        pending: set[str] = set()
+        analyzed = 0
+        try:
+            for posts in self._storage.iter_unsentimented_posts(claim_size, lease_seconds, worker_id, failed):
+                pending = {post["post_id"] for post in posts}
+                results, posts = self._pre_pass(posts)
+                results.update(self._classify_posts(posts, fallbacks))
+                self._store_results(results)
+                proceed = self._finish_batch(pending, results, failed, fallbacks)
+                pending.clear()
+                analyzed += len(results)
+                logging.info(f"Analyzed: {analyzed}")
+                if not proceed:
+                    break
+                if stop is not None and stop():
+                    logging.info("Stop requested, not claiming more posts")
+                    break
+        finally:
+            self._storage.release_posts(list(pending))
+        self._finish_run()
+        logging.info(f"Sentiment analysis DONE")
+
+    async def pipeline_async(
+        self,
+        concurrency: int = 8,
+        claim_size: int = 100,
+        lease_seconds: int = 600,
+        fallbacks: Sequence["OpenRouter"] = (),
+        stop: Callable[[], bool] | None = None
+    ) -> None:
+        # Analyze all posts without sentiment in DB keeping `concurrency` requests in flight
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive integer!")
         if self._check_if_empty_db():
             logging.warning(f"Empty database!")
             return
 
-        posts_id = self._storage.get_unsentimented_posts()
-        logging.info(f"Posts to analyze: {len(posts_id)}")
+        worker_id = self._worker_id()
+        semaphore = asyncio.Semaphore(concurrency)
+        failed: set[str] = set()
+        pending: set[str] = set()
+        analyzed = 0
 
-        for num, post_id in enumerate(posts_id):
-            title, content, subreddit = self._storage.get_post_to_analyze(post_id)
-            logging.info(f"Analyzing sentiment for: {post_id} using {self._model}")
-            self._analyze_sentiment(post_id, title=title, content=content, subreddit=subreddit)
-            logging.info(f"Queue: {len(posts_id) - num - 1}")
-            time.sleep(5)
+        for model in (self, *fallbacks):
+            model._open_async_client()
+        # Claim enough posts per round to keep every request slot busy
+        claim_size = max(claim_size, concurrency * self._batch_size)
+        try:
+            for posts in self._storage.iter_unsentimented_posts(claim_size, lease_seconds, worker_id, failed):
+                pending = {post["post_id"] for post in posts}
+                results, posts = self._pre_pass(posts)
+                results.update(await self._classify_posts_async(posts, semaphore, fallbacks))
+                self._store_results(results)
+                proceed = self._finish_batch(pending, results, failed, fallbacks)
+                pending.clear()
+                analyzed += len(results)
+                logging.info(f"Analyzed: {analyzed} ({concurrency} concurrent requests)")
+                if not proceed:
+                    break
+                if stop is not None and stop():
+                    logging.info("Stop requested, not claiming more posts")
+                    break
+        finally:
+            self._storage.release_posts(list(pending))
+            for model in (self, *fallbacks):
+                await model._close_async_client()
+        self._finish_run()
         logging.info(f"Sentiment analysis DONE")
 
     @abstractmethod
@@ -69,6 +475,20 @@ class OpenRouter(ABC):
         """
         pass
 
+    @abstractmethod
+    def _build_batch_prompt(self, posts: list[dict]) -> str:
+        """
+        Generates a single prompt covering several posts, answered with one label per post_id.
+        """
+        pass
+
+    @abstractmethod
+    def _build_constrained_prompt(self, **kwargs) -> str:
+        """
+        Generates a prompt for one post answered with a single lowercase label word (constrained mode).
+        """
+        pass
+
     @staticmethod
     def _test_prompt(**kwargs) -> str:
         # Template prompt for testing sentiment analysis
@@ -97,23 +517,278 @@ class OpenRouter(ABC):
 
         return messages
 
-    def _analyze_sentiment(self, post_id: str, **kwargs) -> None:
-        # Analyze sentiment and update DB
-        prompt = self._build_prompt(**kwargs)
-        messages = self._messages(prompt)
+    @staticmethod
+    def _retry_after(error: RateLimitError) -> float | None:
+        # Read the Retry-After header of a 429 response, if the provider sent one
+        value = error.response.headers.get("retry-after")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
 
-        chat = self._client.chat.completions.create(
-            model=self._model,
-            messages=messages,
-            temperature=self._temperature,
-            max_tokens=self._max_tokens
+    def _check_circuit(self) -> None:
+        # Refuse the request locally while the model's circuit is open
+        if self._health is not None and not self._health.allow_request():
+            raise CircuitOpenError(f"Circuit open for {self._model}")
+
+    def _record_success(self, latency: float) -> None:
+        # Report a successful request to the model's health state
+        if self._health is not None:
+            self._health.record_success(latency)
+
+    def _record_failure(self) -> None:
+        # Report a failed request to the model's health state
+        if self._health is not None:
+            self._health.record_failure()
+
+    def _create_chat(
+        self,
+        messages: list[ChatCompletionUserMessageParam],
+        max_tokens: int | None = None,
+        **options
+    ) -> ChatCompletion:
+        # Send a rate limited chat completion request, backing off on 429 responses.
+        # options are passed on to the API, e.g. logprobs
+        self._check_circuit()
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            self._limiter.acquire()
+            self._requests += 1
+            start = time.monotonic()
+            try:
+                chat = self._client.chat.completions.create(
+                    model=self._model,
+                    messages=messages,
+                    temperature=self._temperature,
+                    max_tokens=max_tokens or self._max_tokens,
+                    **options
+                )
+            except RateLimitError as e:
+                SENTIMENT_REQUESTS.labels(self._model, "rate_limited").inc()
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    self._record_failure()
+                    raise
+                delay = self._limiter.on_rate_limited(self._retry_after(e))
+                logging.warning(f"Rate limited by {self._model}, retrying in {delay:.1f}s", extra={"model": self._model})
+                time.sleep(delay)
+                continue
+            except OpenAIError:
+                SENTIMENT_REQUESTS.labels(self._model, "error").inc()
+                self._record_failure()
+                raise
+            self._limiter.on_success()
+            latency = time.monotonic() - start
+            self._record_success(latency)
+            record_chat(self._model, self._request_kind(max_tokens, options), latency, chat.usage)
+            # Lazy %-arguments, the message is only built when DEBUG is enabled
+            logging.debug("%s answered in %.2fs", self._model, latency, extra={"model": self._model, "latency": round(latency, 3)})
+            return chat
+
+    async def _create_chat_async(
+        self,
+        messages: list[ChatCompletionUserMessageParam],
+        max_tokens: int | None = None,
+        **options
+    ) -> ChatCompletion:
+        # Async counterpart of _create_chat
+        self._check_circuit()
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await self._limiter.acquire_async()
+            self._requests += 1
+            start = time.monotonic()
+            try:
+                chat = await self._async_client.chat.completions.create(
+                    model=self._model,
+                    messages=messages,
+                    temperature=self._temperature,
+                    max_tokens=max_tokens or self._max_tokens,
+                    **options
+                )
+            except RateLimitError as e:
+                SENTIMENT_REQUESTS.labels(self._model, "rate_limited").inc()
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    self._record_failure()
+                    raise
+                delay = self._limiter.on_rate_limited(self._retry_after(e))
+                logging.warning(f"Rate limited by {self._model}, retrying in {delay:.1f}s", extra={"model": self._model})
+                await asyncio.sleep(delay)
+                continue
+            except OpenAIError:
+                SENTIMENT_REQUESTS.labels(self._model, "error").inc()
+                self._record_failure()
+                raise
+            self._limiter.on_success()
+            latency = time.monotonic() - start
+            self._record_success(latency)
+            record_chat(self._model, self._request_kind(max_tokens, options), latency, chat.usage)
+            # Lazy %-arguments, the message is only built when DEBUG is enabled
+            logging.debug("%s answered in %.2fs", self._model, latency, extra={"model": self._model, "latency": round(latency, 3)})
+            return chat
+
+    @staticmethod
+    def _request_kind(max_tokens: int | None, options: dict) -> str:
+        # Request kind label of the latency metric
+        if options.get("logprobs"):
+            return "constrained"
+
+        return "batch" if max_tokens else "single"
+
+    def _constrained_options(self) -> dict:
+        # Extra API parameters of a constrained request
+        options = {"logprobs": True, "top_logprobs": TOP_LOGPROBS}
+        if self._logit_bias:
+            options["logit_bias"] = {str(token): bias for token, bias in self._logit_bias.items()}
+
+        return options
+
+    @staticmethod
+    def _label_for_token(token: str) -> str | None:
+        # Label of an answer token: an unambiguous prefix of a label word, or a word starting with one
+        word = token.strip().strip(".").lower()
+        if not word:
+            return None
+        labels = {label for label_word, label in LABEL_WORDS.items() if label_word.startswith(word) or word.startswith(label_word)}
+
+        return labels.pop() if len(labels) == 1 else None
+
+    def _constrained_sentiment(self, chat: ChatCompletion, post_id: str) -> str:
+        # Label with the highest probability among the top alternatives of the answer token. Its share of
+        # the label probabilities is recorded as confidence; without logprobs the answer token decides
+        choice = chat.choices[0]
+        content = choice.logprobs.content if getattr(choice, "logprobs", None) else None
+        probabilities: dict[str, float] = {}
+        if content:
+            for alternative in content[0].top_logprobs or [content[0]]:
+                label = self._label_for_token(alternative.token)
+                if label is not None:
+                    probabilities[label] = probabilities.get(label, 0.0) + math.exp(alternative.logprob)
+        if probabilities:
+            sentiment = max(probabilities, key=probabilities.get)
+            self._confidences[post_id] = probabilities[sentiment] / sum(probabilities.values())
+            return sentiment
+
+        sentiment = self._label_for_token(choice.message.content or "")
+        if sentiment is not None:
+            return sentiment
+        SENTIMENT_VALIDATION_FAILURES.labels(self._model).inc()
+        logging.warning(
+            f"Invalid constrained answer returned: {choice.message.content}",
+            extra={"post_id": post_id, "model": self._model}
         )
+
+        return "INVALID"
+
+    def _validated_sentiment(self, chat: ChatCompletion) -> str:
+        # Return the model answer if it is a valid label, INVALID otherwise
         sentiment = chat.choices[0].message.content.strip().upper()
         if self._sentiment_validation(sentiment):
-            self._storage.update_post_sentiment(post_id, sentiment, self._model)
-        else:
-            logging.warning(f"Invalid sentiment value returned: {sentiment}")
-            self._storage.update_post_sentiment_invalid(post_id, self._model)
+            return sentiment
+        SENTIMENT_VALIDATION_FAILURES.labels(self._model).inc()
+        logging.warning(f"Invalid sentiment value returned: {sentiment}", extra={"model": self._model})
+
+        return "INVALID"
+
+    def _analyze_sentiment(self, post_id: str, **kwargs) -> str:
+        # Analyze sentiment of a single post
+        if self._constrained:
+            messages = self._messages(self._build_constrained_prompt(**kwargs))
+            chat = self._create_chat(messages, max_tokens=1, **self._constrained_options())
+            return self._constrained_sentiment(chat, post_id)
+        prompt = self._build_prompt(**kwargs)
+        messages = self._messages(prompt)
+
+        chat = self._create_chat(messages)
+
+        return self._validated_sentiment(chat)
+
+    async def _analyze_sentiment_async(self, post_id: str, **kwargs) -> str:
+        # Analyze sentiment of a single post with the async client
+        if self._constrained:
+            messages = self._messages(self._build_constrained_prompt(**kwargs))
+            chat = await self._create_chat_async(messages, max_tokens=1, **self._constrained_options())
+            return self._constrained_sentiment(chat, post_id)
+        prompt = self._build_prompt(**kwargs)
+        messages = self._messages(prompt)
+
+        chat = await self._create_chat_async(messages)
+
+        return self._validated_sentiment(chat)
+
+    def _batch_max_tokens(self, posts: list[dict]) -> int:
+        # Token budget for a JSON answer with one label per post
+        return BATCH_TOKENS_PER_POST * len(posts) + 16
+
+    def _parse_batch_response(self, chat: ChatCompletion, posts: list[dict]) -> dict[str, str]:
+        # Extract valid labels from a JSON object keyed by post_id, ignoring anything else
+        answer = chat.choices[0].message.content or ""
+        start, end = answer.find("{"), answer.rfind("}")
+        if start == -1 or end <= start:
+            logging.warning(f"Batch answer is not a JSON object: {answer[:100]}")
+            SENTIMENT_VALIDATION_FAILURES.labels(self._model).inc(len(posts))
+            return {}
+        try:
+            labels = json.loads(answer[start:end + 1])
+        except json.JSONDecodeError:
+            logging.warning(f"Batch answer is not valid JSON: {answer[:100]}")
+            SENTIMENT_VALIDATION_FAILURES.labels(self._model).inc(len(posts))
+            return {}
+        if not isinstance(labels, dict):
+            SENTIMENT_VALIDATION_FAILURES.labels(self._model).inc(len(posts))
+            return {}
+
+        sentiments = {}
+        for post in posts:
+            label = labels.get(post["post_id"])
+            if isinstance(label, str) and self._sentiment_validation(label.strip().upper()):
+                sentiments[post["post_id"]] = label.strip().upper()
+        if len(sentiments) < len(posts):
+            SENTIMENT_VALIDATION_FAILURES.labels(self._model).inc(len(posts) - len(sentiments))
+
+        return sentiments
+
+    def _analyze_batch(self, posts: list[dict]) -> dict[str, str]:
+        # Classify several posts with one request, posts missing from the answer fall back to single mode.
+        # A failed single-post request keeps the labels already parsed; the posts still missing are
+        # left out of the result, so they go to the fallback models
+        if len(posts) == 1:
+            return {posts[0]["post_id"]: self._analyze_sentiment(**posts[0])}
+
+        messages = self._messages(self._build_batch_prompt(posts))
+        chat = self._create_chat(messages, max_tokens=self._batch_max_tokens(posts))
+        sentiments = self._parse_batch_response(chat, posts)
+        for post in posts:
+            if post["post_id"] not in sentiments:
+                try:
+                    sentiments[post["post_id"]] = self._analyze_sentiment(**post)
+                except OpenAIError as e:
+                    self._log_retry_failure(posts, sentiments, e)
+                    break
+
+        return sentiments
+
+    async def _analyze_batch_async(self, posts: list[dict]) -> dict[str, str]:
+        # Async counterpart of _analyze_batch
+        if len(posts) == 1:
+            return {posts[0]["post_id"]: await self._analyze_sentiment_async(**posts[0])}
+
+        messages = self._messages(self._build_batch_prompt(posts))
+        chat = await self._create_chat_async(messages, max_tokens=self._batch_max_tokens(posts))
+        sentiments = self._parse_batch_response(chat, posts)
+        for post in posts:
+            if post["post_id"] not in sentiments:
+                try:
+                    sentiments[post["post_id"]] = await self._analyze_sentiment_async(**post)
+                except OpenAIError as e:
+                    self._log_retry_failure(posts, sentiments, e)
+                    break
+
+        return sentiments
+
+    def _log_retry_failure(self, posts: list[dict], sentiments: dict[str, str], error: OpenAIError) -> None:
+        # Report a failed single-post retry of a batch, the batch keeps its parsed labels
+        logging.warning(
+            f"Single-post retry failed, keeping {len(sentiments)} of {len(posts)} label(s) from the batch: {error}",
+            extra={"model": self._model}
+        )
 
     def _test_analyze_sentiment(self, prompt: str) -> str:
         # Run a test sentiment query on prompt
@@ -150,4 +825,4 @@ class OpenRouter(ABC):
 
     def _check_if_empty_db(self) -> bool:
         # Returns True if the database has no records
-        return self._storage.get_database_size() == 0
\ No newline at end of file
+        return not self._storage.has_posts()
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+preprocessing.py
+
+This module defines the TextPreprocessor class, which turns raw Reddit posts into
+compact prompt input before any model sees them.
+
+Markdown syntax, code blocks, quoted replies, tables, URLs and HTML entities are
+removed and whitespace is collapsed. Content is then cut to a token budget, estimated
+as characters / 4 (close to BPE tokenizers on English text and orders of magnitude
+cheaper than running one). Posts with nothing left to classify, or whose body was
+deleted or removed, are labelled SKIPPED without an API call.
+"""
+
+import html
+import re
+
+SKIPPED = "SKIPPED"
+REMOVED_MARKERS = {"[deleted]", "[removed]", "[removed by reddit]"}
+CHARS_PER_TOKEN = 4
+
+FENCED_CODE = re.compile(r"^(```|~~~).*?^\1[^\n]*$", re.MULTILINE | re.DOTALL)
+INDENTED_CODE = re.compile(r"(?:^(?: {4}|\t).*(?:\n|$))+", re.MULTILINE)
+INLINE_CODE = re.compile(r"`[^`\n]*`")
+QUOTE = re.compile(r"^\s*(?:>|&gt;).*$", re.MULTILINE)
+TABLE_ROW = re.compile(r"^\s*\|?(?:[^|\n]*\|){2,}[^|\n]*$", re.MULTILINE)
+IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+URL = re.compile(r"(?:https?://|www\.)\S+")
+HEADING = re.compile(r"^\s{0,3}#{1,6}\s*", re.MULTILINE)
+LIST_MARKER = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+", re.MULTILINE)
+HORIZONTAL_RULE = re.compile(r"^\s*(?:[-*_]\s*){3,}$", re.MULTILINE)
+EMPHASIS = re.compile(r"(\*{1,3}|_{2,3}|~~|\^)")
+SPOILER = re.compile(r">!(.*?)!<", re.DOTALL)
+HTML_TAG = re.compile(r"<[^>\n]+>")
+WHITESPACE = re.compile(r"\s+")
+
+class TextPreprocessor:
+    """
+    Cleans post text and enforces a prompt token budget.
+
+    Attributes:
+    - max_content_tokens: estimated token budget for the post content
+    - max_title_tokens: estimated token budget for the title
+    - skip_removed: skip posts whose body is [deleted] / [removed] even if the title remains
+
+    Methods:
+    - estimate_tokens: fast token count estimate
+    - clean: strip markdown, code, quotes, tables and URLs, collapse whitespace
+    - truncate: cut text to a token budget at a word boundary
+    - prepare: cleaned copy of a post, or None if it should be skipped
+    """
+
+    def __init__(self, max_content_tokens: int = 256, max_title_tokens: int = 64, skip_removed: bool = True):
+        if max_content_tokens < 1 or max_title_tokens < 1:
+            raise ValueError("Token budgets must be positive integers!")
+        self.max_content_tokens = max_content_tokens
+        self.max_title_tokens = max_title_tokens
+        self.skip_removed = skip_removed
+
+    @staticmethod
+    def estimate_tokens(text: str | None) -> int:
+        # Roughly four characters per token
+        return -(-len(text or "") // CHARS_PER_TOKEN)
+
+    @staticmethod
+    def clean(text: str | None) -> str:
+        # Keep the words a reader would see, drop formatting and non-prose blocks
+        if not text:
+            return ""
+        text = FENCED_CODE.sub(" ", text)
+        text = INDENTED_CODE.sub(" ", text)
+        text = INLINE_CODE.sub(" ", text)
+        text = SPOILER.sub(r"\1", text)
+        text = QUOTE.sub(" ", text)
+        text = TABLE_ROW.sub(" ", text)
+        text = IMAGE.sub(" ", text)
+        text = LINK.sub(r"\1", text)
+        text = URL.sub(" ", text)
+        text = HEADING.sub("", text)
+        text = LIST_MARKER.sub("", text)
+        text = HORIZONTAL_RULE.sub(" ", text)
+        text = html.unescape(HTML_TAG.sub(" ", text))
+        text = EMPHASIS.sub("", text)
+
+        return WHITESPACE.sub(" ", text).strip()
+
+    @staticmethod
+    def truncate(text: str, max_tokens: int) -> str:
+        # Cut to the estimated budget, preferring a word boundary
+        limit = max_tokens * CHARS_PER_TOKEN
+        if len(text) <= limit:
+            return text
+        cut = text.rfind(" ", 0, limit)
+
+        return text[:cut if cut > limit // 2 else limit].rstrip() + " ..."
+
+    def prepare(self, post: dict) -> dict | None:
+        # Cleaned and truncated copy of the post, None if there is nothing worth classifying
+        content = (post.get("content") or "").strip()
+        removed = content.lower() in REMOVED_MARKERS
+        if removed and self.skip_removed:
+            return None
+        title = self.truncate(self.clean(post.get("title")), self.max_title_tokens)
+        content = "" if removed else self.truncate(self.clean(content), self.max_content_tokens)
+        if not title and not content:
+            return None
+
+        return {**post, "title": title, "content": content}
@@ -0,0 +1,131 @@
+"""
+sentiment_cache.py
+
+This module defines the SentimentCache class, a two-level cache of classification
+results keyed by a hash of the normalized post text, the model id and the prompt
+template version. An in-process LRU sits in front of the persistent
+sentiment_cache table, so crossposts, reposts and bot threads with identical
+text are classified only once.
+"""
+
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from database.postgresql import PostgreSQLClient
+from monitoring.metrics import SENTIMENT_CACHE_LOOKUPS
+
+class SentimentCache:
+    """
+    Classification cache shared by all sentiment models of the process.
+
+    Entries expire `ttl_days` after they were classified, both in memory and in
+    the database. The in-memory LRU holds at most `max_entries` entries.
+
+    Methods:
+    - content_hash: hash of the normalized title and content of a post
+    - get_many: look up several hashes, memory first and then one DB query for the rest
+    - put_many: store new results in memory and in the database
+    - purge_expired: delete expired entries from the database
+    - stats: hit/miss counters since process start, also exported as sentiment_cache_lookups_total
+    """
+
+    def __init__(self, storage: PostgreSQLClient, max_entries: int = 10000, ttl_days: int = 30):
+        # Initialize LRU storage and hit/miss counters
+        self._storage = storage
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_days * 86400
+        self._ttl_days = ttl_days
+        self._lru: OrderedDict[tuple[str, str, str], tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    @staticmethod
+    def content_hash(title: str | None, content: str | None) -> str:
+        # Hash of the post text after unicode, case and whitespace normalization
+        text = "\x1f".join(
+            " ".join(unicodedata.normalize("NFKC", part or "").casefold().split())
+            for part in (title, content)
+        )
+
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: tuple[str, str, str], sentiment: str, created: float) -> None:
+        # Insert into the LRU and evict the least recently used entries (caller holds the lock)
+        self._lru[key] = (sentiment, created)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self._max_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, hashes: set[str], model: str, prompt_version: str) -> dict[str, str]:
+        # Return cached sentiments for the given content hashes
+        found = {}
+        now = time.time()
+        with self._lock:
+            for content_hash in hashes:
+                key = (content_hash, model, prompt_version)
+                entry = self._lru.get(key)
+                if entry is None:
+                    continue
+                if now - entry[1] > self._ttl_seconds:
+                    del self._lru[key]
+                    continue
+                self._lru.move_to_end(key)
+                found[content_hash] = entry[0]
+            self._stats["memory_hits"] += len(found)
+        SENTIMENT_CACHE_LOOKUPS.labels(model, "memory_hit").inc(len(found))
+
+        remaining = hashes - found.keys()
+        stored = self._storage.get_cached_sentiments(list(remaining), model, prompt_version, self._ttl_days)
+        with self._lock:
+            for content_hash, (sentiment, created) in stored.items():
+                self._remember((content_hash, model, prompt_version), sentiment, created)
+                found[content_hash] = sentiment
+            self._stats["db_hits"] += len(stored)
+            self._stats["misses"] += len(remaining) - len(stored)
+        SENTIMENT_CACHE_LOOKUPS.labels(model, "db_hit").inc(len(stored))
+        SENTIMENT_CACHE_LOOKUPS.labels(model, "miss").inc(len(remaining) - len(stored))
+
+        return found
+
+    def put_many(self, sentiments: dict[str, str], model: str, prompt_version: str) -> None:
+        # Store content hash -> sentiment results of one model and prompt version
+        if not sentiments:
+            return
+        now = time.time()
+        with self._lock:
+            for content_hash, sentiment in sentiments.items():
+                self._remember((content_hash, model, prompt_version), sentiment, now)
+        self._storage.cache_sentiments(
+            [(content_hash, model, prompt_version, sentiment) for content_hash, sentiment in sentiments.items()]
+        )
+
+    def purge_expired(self) -> int:
+        # Delete expired entries from the database, returns the number of removed rows
+        return self._storage.purge_sentiment_cache(self._ttl_days)
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        # Hit/miss counters and hit ratio since process start
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["db_hits"]) / lookups, 3) if lookups else 0.0
+
+        return stats
+
+_cache: SentimentCache | None = None
+_cache_lock = threading.Lock()
+
+def get_sentiment_cache(max_entries: int = 10000, ttl_days: int = 30) -> SentimentCache:
+    """
+    Return the process-wide SentimentCache, creating it on first use.
+    The arguments are only used when the cache is created.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SentimentCache(PostgreSQLClient(), max_entries=max_entries, ttl_days=ttl_days)
+
+        return _cache
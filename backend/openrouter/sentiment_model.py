@@ -7,6 +7,10 @@ of Reddit posts using OpenAI models.
 """
 
 from .openrouter_client import OpenRouter
+from database.postgresql import PostgreSQLClient
+
+# Bump whenever _build_prompt or _build_batch_prompt change, so cached results are not reused
+PROMPT_VERSION = "1"
 
 class SentimentModel(OpenRouter):
     """
@@ -16,17 +20,29 @@ class SentimentModel(OpenRouter):
     - _model: OpenAI model identifier
     - _temperature: sampling temperature for generation
     - _max_tokens: max tokens to generate
+    - _batch_size: number of posts classified with a single request
 
     Methods:
     - _build_prompt: constructs a prompt for sentiment analysis based on post data
+    - _build_batch_prompt: constructs a numbered prompt for several posts asking for a JSON answer
+    - _build_constrained_prompt: constructs a prompt answered with a single lowercase label word
     """
 
-    def __init__(self, model: str, temperature: int, max_tokens: int):
+    def __init__(
+        self,
+        model: str,
+        temperature: int,
+        max_tokens: int,
+        batch_size: int = 1,
+        storage: PostgreSQLClient | None = None
+    ):
         # Initialize with specific model parameters
-        super().__init__()
+        super().__init__(storage)
         self._model = model
+        self._prompt_version = PROMPT_VERSION
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.batch_size = batch_size
 
     @property
     def model(self) -> str:
@@ -64,6 +80,19 @@ class SentimentModel(OpenRouter):
             raise ValueError("max_tokens must be a positive integer!")
         self._max_tokens = value
 
+    @property
+    def batch_size(self) -> int:
+        # Getter for batch_size — returns the number of posts sent in one request
+        return self._batch_size
+
+    @batch_size.setter
+    def batch_size(self, value: int) -> None:
+        # Setter for batch_size with validation
+        # Value must be a positive integer, otherwise raises ValueError
+        if not (isinstance(value, int) and value > 0):
+            raise ValueError("batch_size must be a positive integer!")
+        self._batch_size = value
+
     def _build_prompt(self, **kwargs) -> str:
         # Build a detailed prompt for sentiment analysis
         title = kwargs.get("title")
@@ -79,4 +108,41 @@ class SentimentModel(OpenRouter):
             "Return ONLY ONE WORD: POSITIVE, NEUTRAL, or NEGATIVE."
         )
 
-        return prompt
\ No newline at end of file
+        return prompt
+
+    def _build_constrained_prompt(self, **kwargs) -> str:
+        # Build a prompt whose first answer token already decides the label (constrained mode)
+        title = kwargs.get("title")
+        content = kwargs.get("content")
+        subreddit = kwargs.get("subreddit")
+
+        prompt = (
+            "Analyze sentiment of this Reddit post using ALL available information:\n"
+            f"1. Title: '{title}'\n"
+            f"2. Content: '{content}'\n"
+            f"3. Subreddit: '{subreddit}'\n\n"
+            "Consider emotional tone.\n"
+            "Answer with exactly one lowercase word: positive, neutral or negative."
+        )
+
+        return prompt
+
+    def _build_batch_prompt(self, posts: list[dict]) -> str:
+        # Build a numbered prompt for several posts answered with a JSON object keyed by post_id
+        lines = [
+            "Analyze sentiment of each of the following Reddit posts using ALL available information.",
+            "Consider emotional tone.\n"
+        ]
+        for num, post in enumerate(posts, start=1):
+            lines.append(
+                f"Post {num} (post_id: {post['post_id']})\n"
+                f"1. Title: '{post['title']}'\n"
+                f"2. Content: '{post['content']}'\n"
+                f"3. Subreddit: '{post['subreddit']}'\n"
+            )
+        lines.append(
+            "Return ONLY a JSON object mapping every post_id to ONE WORD: POSITIVE, NEUTRAL, or NEGATIVE.\n"
+            'Example: {"abc123": "POSITIVE", "def456": "NEGATIVE"}'
+        )
+
+        return "\n".join(lines)
@@ -0,0 +1,180 @@
+"""
+token_bucket.py
+
+This module contains the rate limiting primitives shared by the API clients.
+
+Classes:
+- TokenBucket: thread-safe token bucket usable from both threads and asyncio tasks.
+- AdaptiveRateLimiter: token bucket with AIMD rate adaptation and exponential
+  backoff on HTTP 429 responses.
+- RedditRateBudget: token bucket following Reddit's X-Ratelimit-* headers.
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+class TokenBucket:
+    """
+    Classic token bucket limiter.
+
+    Tokens are refilled continuously at `rate` tokens per second up to `capacity`.
+    Every acquire reserves one token; if the bucket is empty the caller waits
+    until its reserved token becomes available. Reservations are taken under a lock,
+    so concurrent callers are spaced out evenly instead of waking up together.
+
+    Methods:
+    - acquire: block the current thread until a token is available
+    - acquire_async: await until a token is available
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        # rate is expressed in tokens per second, capacity defaults to one second of tokens
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0!")
+        self._rate = float(rate)
+        self._capacity = float(capacity) if capacity is not None else max(1.0, self._rate)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        # Getter for rate — tokens refilled per second
+        return self._rate
+
+    @rate.setter
+    def rate(self, value: float) -> None:
+        # Setter for rate — refill with the old rate before switching
+        if value <= 0:
+            raise ValueError("rate must be greater than 0!")
+        with self._lock:
+            self._refill()
+            self._rate = float(value)
+
+    @property
+    def capacity(self) -> float:
+        # Getter for capacity — maximum burst size
+        return self._capacity
+
+    def _refill(self) -> None:
+        # Add tokens accumulated since the last update (caller holds the lock)
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def _reserve(self) -> float:
+        # Take one token and return how long the caller has to wait for it
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def acquire(self) -> None:
+        # Block until a token is available
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        # Await until a token is available without blocking the event loop
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket that adapts its rate to the responses of the provider.
+
+    On a 429 response the rate is cut multiplicatively and the caller gets an
+    exponential backoff delay (or the provider's Retry-After, whichever is longer).
+    Every `recovery_after` consecutive successes the rate grows additively again,
+    up to the configured maximum.
+
+    Methods:
+    - on_success: report a successful request
+    - on_rate_limited: report a 429 response, returns the delay to sleep before retrying
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        burst: float | None = None,
+        min_requests_per_minute: float = 1,
+        decrease_factor: float = 0.5,
+        recovery_after: int = 10,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0
+    ):
+        super().__init__(requests_per_minute / 60, burst)
+        self._max_rate = requests_per_minute / 60
+        self._min_rate = min(min_requests_per_minute, requests_per_minute) / 60
+        self._decrease_factor = decrease_factor
+        self._recovery_after = recovery_after
+        self._base_backoff = base_backoff
+        self._max_backoff = max_backoff
+        self._successes = 0
+        self._failures = 0
+        self._state_lock = threading.Lock()
+
+    @property
+    def requests_per_minute(self) -> float:
+        # Current effective rate in requests per minute
+        return self.rate * 60
+
+    def on_success(self) -> None:
+        # Additive increase after a streak of successful requests
+        with self._state_lock:
+            self._failures = 0
+            self._successes += 1
+            if self._successes < self._recovery_after or self.rate >= self._max_rate:
+                return
+            self._successes = 0
+            self.rate = min(self._max_rate, self.rate + self._max_rate * 0.1)
+
+    def on_rate_limited(self, retry_after: float | None = None) -> float:
+        # Multiplicative decrease and exponential backoff with jitter
+        with self._state_lock:
+            self._successes = 0
+            self._failures += 1
+            self.rate = max(self._min_rate, self.rate * self._decrease_factor)
+            backoff = min(self._max_backoff, self._base_backoff * 2 ** (self._failures - 1))
+        backoff += random.uniform(0, backoff / 2)
+
+        return max(backoff, retry_after or 0.0)
+
+class RedditRateBudget(TokenBucket):
+    """
+    Token bucket shared by all Reddit API callers of the process.
+
+    Reddit reports the remaining requests of the current window and the seconds until
+    it resets in X-Ratelimit-* headers, exposed by PRAW as `reddit.auth.limits`.
+    After every request the rate is set so the remaining budget is spread evenly
+    over the rest of the window, which keeps concurrent workers from draining the
+    window early and then stalling on PRAW's own sleeps.
+
+    Methods:
+    - update_from_limits: adjust the rate to the latest X-Ratelimit-* values
+    """
+
+    def __init__(self, requests_per_minute: float = 100, burst: float | None = None, reserve: int = 5):
+        super().__init__(requests_per_minute / 60, burst)
+        self._max_rate = requests_per_minute / 60
+        self._min_rate = self._max_rate / 100
+        self._reserve_requests = reserve
+
+    @property
+    def requests_per_minute(self) -> float:
+        # Current effective rate in requests per minute
+        return self.rate * 60
+
+    def update_from_limits(self, limits: dict | None) -> None:
+        # limits: {"remaining": float, "reset_timestamp": epoch seconds, "used": int}, values may be None
+        if not limits or limits.get("remaining") is None or limits.get("reset_timestamp") is None:
+            return
+        seconds_left = max(1.0, limits["reset_timestamp"] - time.time())
+        remaining = max(0.0, limits["remaining"] - self._reserve_requests)
+        self.rate = min(self._max_rate, max(self._min_rate, remaining / seconds_left))
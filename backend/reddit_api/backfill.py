@@ -0,0 +1,99 @@
+"""
+backfill.py
+
+This module defines the Backfill class, which pages backwards through the listings of
+a subreddit to store its history, e.g. after the subreddit was added to config.yaml.
+
+Every page of 100 posts is requested with after=<oldest fullname seen>, stored with
+one bulk insert, and followed by a checkpoint (backfill_checkpoints table) holding the
+paging position. An interrupted backfill therefore resumes at the page it was on;
+a page fetched twice is harmless, because known posts are skipped.
+
+Reddit serves about 1000 posts per listing, so "new" alone reaches back only that far
+on a busy subreddit; adding "top:all" / "top:year" listings digs out older posts.
+Backfilled posts enter the work queue with BACKFILL_PRIORITY and are classified after
+fresh posts. The caller gives the Backfill a RedditClient with its own, smaller
+RedditRateBudget, so live ingestion keeps its budget.
+"""
+
+import logging
+import time
+from collections.abc import Callable
+from database.postgresql import PostgreSQLClient
+from .reddit_client import REDDIT_PAGE_SIZE, RedditClient
+
+BACKFILL_PRIORITY = -1
+
+class Backfill:
+    """
+    Resumable historical backfill of subreddits.
+
+    Attributes:
+    - _listings: listings paged per subreddit, e.g. ["new", "top:all"]
+    - _max_pages: page limit per listing and run, None for no limit
+    - _oldest_utc: epoch seconds, paging stops at posts older than this (None: as far as Reddit goes)
+
+    Methods:
+    - run: backfill one subreddit, resuming from its checkpoints
+    """
+
+    def __init__(
+        self,
+        reddit: RedditClient,
+        storage: PostgreSQLClient | None = None,
+        listings: list[str] | None = None,
+        max_pages: int | None = None,
+        oldest_utc: float | None = None
+    ):
+        # The RedditClient should carry the backfill's own rate budget
+        self._reddit = reddit
+        self._storage = storage or PostgreSQLClient()
+        self._listings = listings or ["new"]
+        self._max_pages = max_pages
+        self._oldest_utc = oldest_utc
+
+    def run(self, subreddit: str, stop: Callable[[], bool] | None = None) -> int:
+        # Backfill every listing of the subreddit, returns the number of inserted posts
+        inserted = 0
+        for listing in self._listings:
+            inserted += self._run_listing(subreddit, listing, stop)
+            if stop is not None and stop():
+                break
+
+        return inserted
+
+    def _run_listing(self, subreddit: str, listing: str, stop: Callable[[], bool] | None) -> int:
+        # Page one listing from its checkpoint until it is exhausted, the page limit or a stop request
+        checkpoint = self._storage.get_backfill_checkpoint(subreddit, listing)
+        after, oldest, pages, posts, done = checkpoint or (None, None, 0, 0, False)
+        if done:
+            logging.info(f"Backfill r/{subreddit} {listing}: already complete ({posts} posts)")
+            return 0
+
+        start, inserted, run_pages = time.monotonic(), 0, 0
+        while not done and (self._max_pages is None or run_pages < self._max_pages):
+            if stop is not None and stop():
+                break
+            page = self._reddit.get_listing(subreddit, listing, REDDIT_PAGE_SIZE, {"after": after} if after else None)
+            # A short page is the end of the listing
+            done = len(page) < REDDIT_PAGE_SIZE
+            if page:
+                after = page[-1].name
+                page_oldest = min(submission.created_utc for submission in page)
+                oldest = page_oldest if oldest is None else min(oldest, page_oldest)
+            if self._oldest_utc is not None:
+                # /new is ordered by time, so the first post past the limit ends it; /top is not
+                done = done or (listing == "new" and oldest is not None and oldest < self._oldest_utc)
+                page = [submission for submission in page if submission.created_utc >= self._oldest_utc]
+            stored = self._reddit.store_submissions(subreddit, page, BACKFILL_PRIORITY)
+            run_pages += 1
+            pages += 1
+            inserted += len(stored)
+            posts += len(stored)
+            self._storage.save_backfill_checkpoint(subreddit, listing, after, oldest, pages, posts, done)
+        logging.info(
+            f"Backfill r/{subreddit} {listing}: {inserted} posts added in {run_pages} page(s), "
+            f"{time.monotonic() - start:.1f}s, " + ("complete" if done else f"paused after {after}")
+        )
+
+        return inserted
@@ -0,0 +1,70 @@
+"""
+comments.py
+
+Helpers for comment ingestion, shared by the listing and threads modes of
+RedditClient.
+
+Comment volume is an order of magnitude above post volume, so comments are never
+collected into one list: listings are consumed lazily page by page, comment trees are
+walked breadth first with a depth and count cap (instead of CommentForest.list(),
+which flattens the whole tree), and both are stored in fixed-size chunks with one
+bulk insert each.
+"""
+
+from collections import deque
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+from praw.models import MoreComments
+
+def walk_comment_forest(forest: Iterable, max_depth: int, max_count: int) -> Iterator:
+    """
+    Yields the comments of a (partially expanded) comment forest breadth first, top-level
+    comments first, skipping MoreComments placeholders and replies deeper than `max_depth`
+    (0 keeps top-level comments only). Stops after `max_count` comments.
+    """
+    pending = deque((comment, 0) for comment in forest)
+    count = 0
+    while pending and count < max_count:
+        comment, depth = pending.popleft()
+        if isinstance(comment, MoreComments):
+            continue
+        yield comment
+        count += 1
+        if depth < max_depth:
+            pending.extend((reply, depth + 1) for reply in comment.replies)
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    """
+    Yields lists of up to `size` consecutive items.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def comment_row(comment, subreddit: str) -> tuple[str, str, str, int | None, datetime, str, str]:
+    """
+    Converts a PRAW comment to a (comment_id, post_id, parent_id, depth, created_at, subreddit, body) row.
+    Attributes are read from the instance dict: a missing attribute on a PRAW object would
+    trigger a request to fetch it. depth is only present in comment trees; top-level
+    comments of a listing get 0, listing replies None.
+    """
+    data = vars(comment)
+    parent_id = data.get("parent_id") or ""
+    depth = data.get("depth")
+    if depth is None and parent_id.startswith("t3_"):
+        depth = 0
+
+    return (
+        comment.id,
+        data["link_id"].removeprefix("t3_"),
+        parent_id,
+        depth,
+        datetime.fromtimestamp(data["created_utc"], tz=timezone.utc),
+        subreddit,
+        data.get("body")
+    )
@@ -0,0 +1,131 @@
+"""
+cursor_store.py
+
+This module defines the CursorStore class, which keeps a high-water mark (the
+fullname and created_utc of the newest stored post) and an adaptive poll schedule
+for every subreddit, persisted in the subreddit_cursors table.
+
+The poll interval follows the observed post rate: a subreddit is polled about when
+`target_posts_per_poll` new posts are expected, within [min_interval, max_interval].
+Busy subreddits are therefore polled on every scheduler run and quiet ones rarely.
+"""
+
+import threading
+import time
+from database.postgresql import PostgreSQLClient
+
+# Scheduler runs a few seconds early still count as due
+POLL_TOLERANCE = 5
+
+class SubredditCursor:
+    """
+    High-water mark and poll schedule of one subreddit.
+
+    Attributes:
+    - fullname / created_utc: newest post seen so far ("t3_..." and its epoch seconds)
+    - posts_per_hour: smoothed observed post rate
+    - last_polled_utc / next_poll_utc: epoch seconds of the last and next poll
+    """
+
+    def __init__(
+        self,
+        fullname: str | None = None,
+        created_utc: float | None = None,
+        posts_per_hour: float = 0.0,
+        last_polled_utc: float | None = None,
+        next_poll_utc: float | None = None
+    ):
+        self.fullname = fullname
+        self.created_utc = created_utc
+        self.posts_per_hour = posts_per_hour
+        self.last_polled_utc = last_polled_utc
+        self.next_poll_utc = next_poll_utc
+
+    def is_due(self, now: float) -> bool:
+        # True if the subreddit should be polled at `now`
+        return self.next_poll_utc is None or now + POLL_TOLERANCE >= self.next_poll_utc
+
+    def expected_posts(self, now: float) -> float:
+        # Posts expected since the last poll at the observed rate
+        if self.last_polled_utc is None:
+            return 0.0
+
+        return self.posts_per_hour * (now - self.last_polled_utc) / 3600
+
+class CursorStore:
+    """
+    Per-subreddit cursors shared by the ingestion jobs of the process.
+
+    Methods:
+    - get: cursor of a subreddit, loading all stored cursors on first use
+    - advance: record a poll, move the high-water mark and schedule the next poll
+    """
+
+    def __init__(
+        self,
+        storage: PostgreSQLClient,
+        min_interval: float = 60,
+        max_interval: float = 3600,
+        target_posts_per_poll: float = 25,
+        smoothing: float = 0.3
+    ):
+        # Initialize schedule settings, cursors are loaded lazily
+        if not (0 < min_interval <= max_interval):
+            raise ValueError("min_interval must be positive and not greater than max_interval!")
+        if target_posts_per_poll <= 0:
+            raise ValueError("target_posts_per_poll must be positive!")
+        self._storage = storage
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._target_posts_per_poll = target_posts_per_poll
+        self._smoothing = smoothing
+        self._cursors: dict[str, SubredditCursor] | None = None
+        self._lock = threading.Lock()
+
+    def get(self, subreddit: str) -> SubredditCursor:
+        # Stored cursor of the subreddit, or an empty one for a subreddit never polled
+        with self._lock:
+            if self._cursors is None:
+                self._cursors = {
+                    name: SubredditCursor(*row)
+                    for name, row in self._storage.get_subreddit_cursors().items()
+                }
+
+            return self._cursors.setdefault(subreddit, SubredditCursor())
+
+    def _interval(self, posts_per_hour: float) -> float:
+        # Seconds until about `target_posts_per_poll` new posts are expected
+        if posts_per_hour <= 0:
+            return self._max_interval
+
+        return min(self._max_interval, max(self._min_interval, self._target_posts_per_poll * 3600 / posts_per_hour))
+
+    def advance(self, subreddit: str, newest, new_posts: int, now: float | None = None) -> SubredditCursor:
+        """
+        Record a poll of `subreddit` that found `new_posts` posts, `newest` being the newest
+        submission returned (or None). Updates the rate estimate and the next poll time.
+        """
+        now = now or time.time()
+        cursor = self.get(subreddit)
+        with self._lock:
+            if newest is not None and (cursor.created_utc is None or newest.created_utc >= cursor.created_utc):
+                cursor.fullname = newest.name
+                cursor.created_utc = newest.created_utc
+            if cursor.last_polled_utc is not None and now > cursor.last_polled_utc:
+                observed = new_posts * 3600 / (now - cursor.last_polled_utc)
+                cursor.posts_per_hour = (1 - self._smoothing) * cursor.posts_per_hour + self._smoothing * observed
+                cursor.next_poll_utc = now + self._interval(cursor.posts_per_hour)
+            else:
+                # First poll, no rate known yet
+                cursor.next_poll_utc = now + self._min_interval
+            cursor.last_polled_utc = now
+        self._storage.save_subreddit_cursor(
+            subreddit,
+            cursor.fullname,
+            cursor.created_utc,
+            cursor.posts_per_hour,
+            cursor.last_polled_utc,
+            cursor.next_poll_utc
+        )
+
+        return cursor
@@ -0,0 +1,184 @@
+"""
+ingestion.py
+
+This module defines the IngestionCoordinator class, which runs one fetch cycle over
+all configured subreddits on a bounded thread pool.
+
+Every worker uses the shared RedditClient, whose database calls check out their own
+pooled connection, and whose listing requests draw from one RedditRateBudget. The
+cycle therefore takes about as long as the rate budget allows, instead of the sum of
+all serial fetches. Subreddits can optionally be grouped into multireddit listings
+("a+b+c"), which costs one request per group instead of one per subreddit.
+
+CommentCoordinator does the same for comments, in one of two modes:
+- "listing": the newest comments of every listing (subreddit.comments()), capped per
+  thread; cheap, one request per 100 comments across all threads of a listing,
+- "threads": the comment trees of stored posts once they are `min_age_hours` old,
+  each fetched once and capped in depth and size.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from database.postgresql import PostgreSQLClient
+from .reddit_client import RedditClient
+
+def multireddits(subreddits: list[str], size: int) -> list[str]:
+    """
+    Groups subreddits into multireddit listings ("a+b+c") of up to `size` subreddits,
+    in configuration order. A size of 1 keeps one listing per subreddit.
+    """
+    if size < 1:
+        raise ValueError("multireddit_size must be at least 1!")
+
+    return ["+".join(subreddits[i:i + size]) for i in range(0, len(subreddits), size)]
+
+class IngestionCoordinator:
+    """
+    Fans a fetch cycle out over subreddits.
+
+    Attributes:
+    - _listings: subreddit names or multireddit groups fetched every cycle
+    - _executor: worker pool, reused between cycles
+
+    Methods:
+    - run: fetch all listings once and log the totals
+    - close: shut the worker pool down
+    """
+
+    def __init__(
+        self,
+        reddit: RedditClient,
+        subreddits: list[str],
+        post_limit: int,
+        max_workers: int = 8,
+        multireddit_size: int = 1
+    ):
+        # Group subreddits into listings and create the worker pool
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1!")
+        self._reddit = reddit
+        self._post_limit = post_limit
+        self._listings = multireddits(subreddits, multireddit_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    @property
+    def listings(self) -> list[str]:
+        return list(self._listings)
+
+    def run(self) -> tuple[int, int]:
+        # One fetch cycle; a failing listing is logged and does not stop the others
+        start = time.monotonic()
+        futures = {
+            self._executor.submit(self._reddit.get_new_posts, listing, self._post_limit): listing
+            for listing in self._listings
+        }
+        inserted, skipped, failed = 0, 0, 0
+        for future in as_completed(futures):
+            try:
+                listing_inserted, listing_skipped = future.result()
+            except Exception as e:
+                failed += 1
+                logging.error(f"Fetching r/{futures[future]} failed: {e}")
+                continue
+            inserted += listing_inserted
+            skipped += listing_skipped
+        logging.info(
+            f"Fetch cycle: {len(self._listings)} listings in {time.monotonic() - start:.1f}s, "
+            f"{inserted} posts added, {skipped} already stored, {failed} failed"
+        )
+
+        return inserted, skipped
+
+    def close(self) -> None:
+        # Wait for running fetches and stop the workers
+        self._executor.shutdown(wait=True)
+
+class CommentCoordinator:
+    """
+    Fans a comment fetch cycle out over listings (listing mode) or stored posts (threads mode).
+
+    Attributes:
+    - _listings: subreddit names or multireddit groups, listing mode
+    - _executor: worker pool, reused between cycles
+
+    Methods:
+    - run: fetch comments once and log the totals
+    - close: shut the worker pool down
+    """
+
+    def __init__(
+        self,
+        reddit: RedditClient,
+        subreddits: list[str],
+        database: PostgreSQLClient | None = None,
+        mode: str = "listing",
+        limit: int = 500,
+        max_per_thread: int = 200,
+        max_depth: int = 5,
+        replace_more_limit: int = 0,
+        min_age_hours: float = 6,
+        max_age_hours: float = 48,
+        threads_per_cycle: int = 20,
+        max_workers: int = 8,
+        multireddit_size: int = 1
+    ):
+        # Validate the settings, group subreddits into listings and create the worker pool
+        if mode not in ("listing", "threads"):
+            raise ValueError("mode must be 'listing' or 'threads'!")
+        if max_per_thread < 1 or max_depth < 0 or replace_more_limit < 0:
+            raise ValueError("max_per_thread must be positive, max_depth and replace_more_limit non-negative!")
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1!")
+        self._reddit = reddit
+        self._database = database or PostgreSQLClient()
+        self._mode = mode
+        self._limit = limit
+        self._max_per_thread = max_per_thread
+        self._max_depth = max_depth
+        self._replace_more_limit = replace_more_limit
+        self._min_age_hours = min_age_hours
+        self._max_age_hours = max_age_hours
+        self._threads_per_cycle = threads_per_cycle
+        self._listings = multireddits(subreddits, multireddit_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="comments")
+
+    def run(self) -> int:
+        # One comment fetch cycle; a failing listing or thread is logged and does not stop the others
+        start = time.monotonic()
+        if self._mode == "listing":
+            futures = {self._executor.submit(self._fetch_listing, listing): listing for listing in self._listings}
+        else:
+            posts = self._database.claim_posts_for_comments(
+                self._min_age_hours, self._max_age_hours, self._threads_per_cycle
+            )
+            futures = {
+                self._executor.submit(
+                    self._reddit.get_thread_comments, post_id, subreddit, self._max_per_thread,
+                    self._max_depth, self._replace_more_limit
+                ): post_id
+                for post_id, subreddit in posts
+            }
+        inserted, failed = 0, 0
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                logging.error(f"Fetching comments of {futures[future]} failed: {e}")
+                continue
+            inserted += result
+        logging.info(
+            f"Comment cycle ({self._mode}): {len(futures)} fetches in {time.monotonic() - start:.1f}s, "
+            f"{inserted} comments added, {failed} failed"
+        )
+
+        return inserted
+
+    def _fetch_listing(self, listing: str) -> int:
+        # Newest comments of one listing, returns the number of inserted comments
+        return self._reddit.get_new_comments(listing, self._limit, self._max_per_thread)[0]
+
+    def close(self) -> None:
+        # Wait for running fetches and stop the workers
+        self._executor.shutdown(wait=True)
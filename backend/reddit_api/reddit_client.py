@@ -3,15 +3,38 @@ reddit_client.py
 
 This module contains the RedditClient class responsible for fetching new posts
 from specified subreddits using the PRAW library and storing them in a PostgreSQL database.
+
+With a CursorStore attached, fetching is incremental: only submissions newer than the
+subreddit's high-water mark are requested (before= paging) and quiet subreddits are
+polled less often, following their observed post rate.
+
+A listing name may also be a multireddit ("a+b+c"); posts are then stored under the
+subreddit they belong to. With a RedditRateBudget attached, every listing request
+takes a token from the budget shared by all threads of the process, including the
+polls of the submission streams.
+
+Comments are ingested either from the subreddit comment listing (get_new_comments)
+or from the comment trees of stored posts (get_thread_comments); see comments.py for
+the memory bounds.
 """
 
 from praw import Reddit
+from praw.models.util import stream_generator
 from database.postgresql import PostgreSQLClient
+from rate_limiter.token_bucket import RedditRateBudget
+from monitoring.metrics import COMMENTS_INGESTED, POSTS_ESTIMATED, POSTS_INGESTED
+from .comments import chunked, comment_row, walk_comment_forest
+from .cursor_store import CursorStore, SubredditCursor
 from datetime import datetime, timezone
+from collections.abc import Iterator
 import os
 import logging
+import math
 import time
 
+# Maximum listing size Reddit returns per request
+REDDIT_PAGE_SIZE = 100
+
 class RedditClient:
     """
     RedditClient handles interaction with Reddit API to retrieve new posts
@@ -20,12 +43,38 @@ class RedditClient:
     Methods:
     - from_env: initializes Reddit client using environment variables
     - get_new_posts: fetches new posts from a subreddit and saves those not already in the database
+    - _get_new_posts_bulk: collects the whole listing and stores new posts with one bulk insert
+    - _new: requests one /new listing, paced by the shared rate budget
+    - get_listing: requests a /new or /top listing, paced by the rate budget
+    - _fetch_since: fetches only submissions newer than the subreddit's cursor
+    - _store_submissions: stores submissions not yet in the database, returns counts
+    - store_submissions: stores submissions not yet in the database with one bulk insert
+    - stream_submissions: PRAW submission stream of a listing, for stream mode
+    - get_new_comments: stores the newest comments of a listing, page by page
+    - get_thread_comments: stores a capped part of one stored post's comment tree
+    - store_comments: stores comments of stored posts not yet in the database with one bulk insert
     """
 
-    def __init__(self, reddit_client: Reddit):
+    def __init__(
+        self,
+        reddit_client: Reddit,
+        database: PostgreSQLClient | None = None,
+        cursors: CursorStore | None = None,
+        budget: RedditRateBudget | None = None
+    ):
         # Initialize with an existing PRAW Reddit client and PostgreSQL client
         self._reddit = reddit_client
-        self._database = PostgreSQLClient()
+        self._database = database or PostgreSQLClient()
+        self._cursors = cursors
+        self._budget = budget
+
+    def set_cursor_store(self, cursors: CursorStore | None) -> None:
+        # Enable incremental fetching with per-subreddit cursors, None disables it
+        self._cursors = cursors
+
+    def set_rate_budget(self, budget: RedditRateBudget | None) -> None:
+        # Share a Reddit rate budget with other clients, None disables pacing
+        self._budget = budget
 
     @classmethod
     def from_env(cls):
@@ -38,13 +87,33 @@ class RedditClient:
 
         return cls(client)
 
-    def get_new_posts(self, subreddit: str, limit: int) -> None:
+    def get_new_posts(self, subreddit: str, limit: int, bulk: bool = True) -> tuple[int, int]:
         """
         Fetches new posts from a subreddit up to a specified limit.
         Adds only posts that don't already exist in the database.
+        Returns the number of inserted and skipped posts.
         """
-        for submission in self._reddit.subreddit(subreddit).new(limit=limit):
-            if not self._database.post_exists(submission.id):
+        if bulk and self._cursors is not None:
+            now = time.time()
+            cursor = self._cursors.get(subreddit)
+            if not cursor.is_due(now):
+                logging.debug(f"r/{subreddit}: not due, next poll in {cursor.next_poll_utc - now:.0f}s")
+                return 0, 0
+            submissions = self._fetch_since(subreddit, limit, cursor)
+            inserted, skipped = self._store_submissions(subreddit, submissions)
+            cursor = self._cursors.advance(subreddit, submissions[0] if submissions else None, len(submissions), now)
+            logging.info(
+                f"r/{subreddit}: {cursor.posts_per_hour:.1f} posts/h, "
+                f"next poll in {cursor.next_poll_utc - now:.0f}s"
+            )
+        elif bulk:
+            inserted, skipped = self._get_new_posts_bulk(subreddit, limit)
+        else:
+            inserted, skipped = 0, 0
+            for submission in self._reddit.subreddit(subreddit).new(limit=limit):
+                if self._database.post_exists(submission.id):
+                    skipped += 1
+                    continue
                 created_at = datetime.fromtimestamp(submission.created_utc, tz=timezone.utc)
                 self._database.add_post(
                     submission.id,
@@ -53,7 +122,226 @@ class RedditClient:
                     submission.title,
                     submission.selftext
                 )
-                logging.info(f"Added post {submission.id} from r/{subreddit}")
+                inserted += 1
+                logging.info(f"Added post {submission.id} from r/{subreddit}", extra={"post_id": submission.id, "subreddit": subreddit})
                 time.sleep(1)
-        logging.info("No more posts to fetch")
-        logging.info(f"Database size: {self._database.get_database_size()}")
\ No newline at end of file
+        logging.info(f"r/{subreddit}: {inserted} posts added, {skipped} already stored")
+        size = self._database.estimate_database_size()
+        POSTS_ESTIMATED.set(size)
+        logging.info(f"Database size: ~{size}")
+
+        return inserted, skipped
+
+    def _get_new_posts_bulk(self, subreddit: str, limit: int) -> tuple[int, int]:
+        # Collect the listing and store the posts not in the database yet
+        submissions = self._new(subreddit, limit)
+
+        return self._store_submissions(subreddit, submissions)
+
+    def _new(self, subreddit: str, limit: int, params: dict | None = None) -> list:
+        # Fetch one /new listing
+        return self.get_listing(subreddit, "new", limit, params)
+
+    def get_listing(self, subreddit: str, listing: str, limit: int, params: dict | None = None) -> list:
+        """
+        Fetches one listing page set: "new", or "top:<time filter>" (e.g. "top:all").
+        PRAW sends one request per page of 100, each takes a token from the rate budget.
+        """
+        if self._budget is not None:
+            for _ in range(max(1, math.ceil(limit / REDDIT_PAGE_SIZE))):
+                self._budget.acquire()
+        kind, _, time_filter = listing.partition(":")
+        if kind == "new":
+            items = self._reddit.subreddit(subreddit).new(limit=limit, params=params or {})
+        elif kind == "top":
+            items = self._reddit.subreddit(subreddit).top(time_filter=time_filter or "all", limit=limit, params=params or {})
+        else:
+            raise ValueError(f"Unsupported listing {listing}!")
+        submissions = list(items)
+        if self._budget is not None:
+            # X-Ratelimit-* values of the last response, as parsed by PRAW
+            self._budget.update_from_limits(getattr(getattr(self._reddit, "auth", None), "limits", None))
+
+        return submissions
+
+    def _fetch_since(self, subreddit: str, limit: int, cursor: SubredditCursor) -> list:
+        """
+        Returns up to `limit` submissions newer than the cursor, newest first.
+        Pages are requested with before=<newest fullname seen>, so a quiet subreddit costs
+        one small request, and iteration stops at the first already-seen post.
+        """
+        if cursor.fullname is None:
+            return self._new(subreddit, limit)
+
+        def is_seen(submission) -> bool:
+            return submission.name == cursor.fullname or submission.created_utc < cursor.created_utc
+
+        submissions = []
+        before = cursor.fullname
+        while len(submissions) < limit:
+            page_size = min(REDDIT_PAGE_SIZE, limit - len(submissions))
+            page = []
+            for submission in self._new(subreddit, page_size, {"before": before}):
+                if is_seen(submission):
+                    break
+                page.append(submission)
+            # Pages move towards newer posts, each one goes in front of the previous
+            submissions[:0] = page
+            if len(page) < page_size:
+                break
+            before = page[0].name
+
+        if not submissions and cursor.expected_posts(time.time()) >= 1:
+            # Nothing newer than the cursor although posts were expected: the cursor post may
+            # have been deleted, which makes before= return nothing. Re-anchor on the plain listing
+            submissions = []
+            for submission in self._new(subreddit, min(limit, REDDIT_PAGE_SIZE)):
+                if is_seen(submission):
+                    break
+                submissions.append(submission)
+
+        return submissions
+
+    def _store_submissions(self, subreddit: str, submissions: list) -> tuple[int, int]:
+        # Store the submissions, returns the number of inserted and skipped posts
+        inserted = self.store_submissions(subreddit, submissions)
+
+        return len(inserted), len(submissions) - len(inserted)
+
+    def store_submissions(self, subreddit: str, submissions: list, priority: int = 0) -> list[dict]:
+        """
+        Stores submissions of a subreddit (or multireddit) listing that are not in the database yet.
+        Known post_ids are dropped with one query and the rest is inserted in one transaction
+        with the given work queue priority.
+        Returns the inserted posts as dicts with post_id, title, content and subreddit.
+        """
+        existing = self._database.get_existing_post_ids([submission.id for submission in submissions])
+        # Posts of a multireddit listing are stored under their configured subreddit name
+        names = {name.lower(): name for name in subreddit.split("+")}
+        rows = [
+            (
+                submission.id,
+                datetime.fromtimestamp(submission.created_utc, tz=timezone.utc),
+                names.get(str(submission.subreddit).lower(), str(submission.subreddit)) if len(names) > 1 else subreddit,
+                submission.title,
+                submission.selftext
+            )
+            for submission in submissions
+            if submission.id not in existing
+        ]
+        # ON CONFLICT still guards against posts inserted concurrently by another job
+        inserted = set(self._database.add_posts(rows, priority))
+        for post_id, _, name, _, _ in rows:
+            if post_id in inserted:
+                POSTS_INGESTED.labels(name).inc()
+
+        return [
+            {"post_id": post_id, "title": title, "content": content, "subreddit": name}
+            for post_id, _, name, title, content in rows
+            if post_id in inserted
+        ]
+
+    def stream_submissions(self, subreddit: str, pause_after: int | None = None):
+        """
+        Returns PRAW's endless submission stream of a subreddit (or multireddit) listing.
+        With pause_after set, the stream yields None after that many requests without new posts.
+        PRAW backs off exponentially between requests without new posts, but not before
+        yielding None, so a caller with a small pause_after must wait before resuming.
+        Every poll of the stream is a /new request made through get_listing, so it takes a
+        token from the rate budget like the other listing requests.
+        """
+        def poll(limit: int, params: dict) -> list:
+            return self.get_listing(subreddit, "new", limit, params)
+
+        return stream_generator(poll, pause_after=pause_after)
+
+    def _paced(self, items: Iterator) -> Iterator:
+        # Take a budget token before each page request of a lazy PRAW listing
+        count = 0
+        while True:
+            if self._budget is not None and count % REDDIT_PAGE_SIZE == 0:
+                self._budget.acquire()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            count += 1
+            yield item
+
+    def get_new_comments(self, subreddit: str, limit: int, max_per_thread: int, chunk_size: int = 500) -> tuple[int, int]:
+        """
+        Stores up to `limit` of the newest comments of a subreddit (or multireddit) listing.
+        The listing is read lazily and stored in chunks; reading stops after the first chunk
+        containing already stored comments, as everything older was seen by the previous run.
+        Returns the number of inserted and skipped comments.
+        """
+        comments = self._paced(iter(self._reddit.subreddit(subreddit).comments(limit=limit)))
+        inserted, skipped = 0, 0
+        for chunk in chunked(comments, chunk_size):
+            seen = self._database.get_existing_comment_ids([comment.id for comment in chunk])
+            stored = self.store_comments(subreddit, [comment for comment in chunk if comment.id not in seen], max_per_thread)
+            inserted += len(stored)
+            skipped += len(chunk) - len(stored)
+            if seen:
+                break
+        logging.info(f"r/{subreddit}: {inserted} comments added, {skipped} skipped")
+
+        return inserted, skipped
+
+    def get_thread_comments(
+        self,
+        post_id: str,
+        subreddit: str,
+        max_per_thread: int,
+        max_depth: int,
+        replace_more_limit: int = 0,
+        chunk_size: int = 500
+    ) -> int:
+        """
+        Stores the comment tree of a stored post, breadth first, up to `max_depth` levels of
+        replies and `max_per_thread` comments. At most `replace_more_limit` "load more comments"
+        stubs are expanded, each one costing a request. Returns the number of inserted comments.
+        """
+        submission = self._reddit.submission(id=post_id)
+        # Reddit returns at most comment_limit comments with the submission
+        submission.comment_limit = max_per_thread
+        if self._budget is not None:
+            for _ in range(1 + replace_more_limit):
+                self._budget.acquire()
+        submission.comments.replace_more(limit=replace_more_limit)
+        inserted = 0
+        for chunk in chunked(walk_comment_forest(submission.comments, max_depth, max_per_thread), chunk_size):
+            inserted += len(self.store_comments(subreddit, chunk))
+
+        return inserted
+
+    def store_comments(self, subreddit: str, comments: list, max_per_thread: int | None = None) -> list[str]:
+        """
+        Stores comments that are not in the database yet and belong to a stored post.
+        With max_per_thread set, a post gets no more comments once it has that many stored.
+        Returns the inserted comment_ids.
+        """
+        names = {name.lower(): name for name in subreddit.split("+")}
+        existing = self._database.get_existing_comment_ids([comment.id for comment in comments])
+        rows = [
+            comment_row(comment, names.get(str(vars(comment).get("subreddit", "")).lower(), subreddit)
+                        if len(names) > 1 else subreddit)
+            for comment in comments
+            if comment.id not in existing
+        ]
+        posts = self._database.get_existing_post_ids(list({row[1] for row in rows}))
+        rows = [row for row in rows if row[1] in posts]
+        if max_per_thread is not None:
+            counts = self._database.count_comments_per_post(list(posts))
+            capped = []
+            for row in rows:
+                if counts.get(row[1], 0) < max_per_thread:
+                    counts[row[1]] = counts.get(row[1], 0) + 1
+                    capped.append(row)
+            rows = capped
+        inserted = set(self._database.add_comments(rows))
+        for row in rows:
+            if row[0] in inserted:
+                COMMENTS_INGESTED.labels(row[5]).inc()
+
+        return [row[0] for row in rows if row[0] in inserted]
@@ -0,0 +1,157 @@
+"""
+stream.py
+
+This module defines the SubmissionStream class, the long-running alternative to
+cron polling. Producer threads follow PRAW submission streams over multireddits,
+store new posts as they appear and put them on a bounded in-process queue; sentiment
+worker threads take them off the queue, claim them and classify them right away.
+Every poll of a stream takes a token from the RedditClient's rate budget, which the
+stream shares with the comment coordinator and the backfill, and a producer waits
+`poll_interval` seconds after each pause of its stream, so quiet listings do not
+spend the budget on back-to-back empty polls.
+
+Back-pressure: when the workers fall behind and the queue stays full for
+`put_timeout` seconds, the producer stops handing posts over and keeps streaming.
+The posts are already stored, so the scheduled sentiment pipeline picks them up
+from the database work queue later. Nothing is lost, only delayed.
+"""
+
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from openrouter.model_router import ModelRouter
+from database.postgresql import PostgreSQLClient
+from .ingestion import multireddits
+from .reddit_client import RedditClient
+
+class SubmissionStream:
+    """
+    Streams new submissions into the database and the sentiment workers.
+
+    Attributes:
+    - _listings: multireddit groups, one producer thread each
+    - _queue: bounded queue of stored, not yet classified post batches
+
+    Methods:
+    - start: start producer and worker threads
+    - stop: stop the producers, let the workers drain the queue and join all threads
+    """
+
+    def __init__(
+        self,
+        reddit: RedditClient,
+        router: ModelRouter,
+        subreddits: list[str],
+        storage: PostgreSQLClient | None = None,
+        multireddit_size: int = 100,
+        workers: int = 4,
+        queue_size: int = 50,
+        batch_size: int = 10,
+        pause_after: int = 0,
+        poll_interval: float = 5,
+        put_timeout: float = 30,
+        lease_seconds: int = 600
+    ):
+        # Group subreddits into stream listings and prepare the queue
+        if workers < 1:
+            raise ValueError("workers must be at least 1!")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1!")
+        self._reddit = reddit
+        self._router = router
+        self._storage = storage or PostgreSQLClient()
+        self._listings = multireddits(subreddits, multireddit_size)
+        self._workers = workers
+        self._batch_size = batch_size
+        self._pause_after = pause_after
+        self._poll_interval = poll_interval
+        self._put_timeout = put_timeout
+        self._lease_seconds = lease_seconds
+        self._queue: queue.Queue[list[dict]] = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._producers: list[threading.Thread] = []
+        self._consumers: list[threading.Thread] = []
+
+    def start(self) -> None:
+        # One producer per listing and `workers` sentiment workers
+        self._stopping.clear()
+        self._producers = [
+            threading.Thread(target=self._produce, args=(listing,), name=f"stream-{num}", daemon=True)
+            for num, listing in enumerate(self._listings)
+        ]
+        self._consumers = [
+            threading.Thread(target=self._consume, name=f"sentiment-{num}", daemon=True)
+            for num in range(self._workers)
+        ]
+        for thread in self._producers + self._consumers:
+            thread.start()
+        logging.info(f"Streaming {len(self._listings)} listing(s) into {self._workers} sentiment worker(s)")
+
+    def stop(self, timeout: float = 60) -> None:
+        # Producers exit at their next pause; workers finish the queued posts, then exit
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._producers:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        for _ in self._consumers:
+            self._queue.put(None)
+        for thread in self._consumers:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        alive = [thread.name for thread in self._producers + self._consumers if thread.is_alive()]
+        if alive:
+            logging.warning(f"Stream threads still running after {timeout}s: {alive}")
+        logging.info("Stream stopped")
+
+    def _hand_over(self, posts: list[dict]) -> None:
+        # Queue stored posts for the workers; if the queue stays full they wait for the scheduled pipeline
+        for i in range(0, len(posts), self._batch_size):
+            try:
+                self._queue.put(posts[i:i + self._batch_size], timeout=self._put_timeout)
+            except queue.Full:
+                logging.warning(f"Sentiment queue full, {len(posts) - i} post(s) left for the scheduled pipeline")
+                return
+
+    def _produce(self, listing: str) -> None:
+        # Follow the listing's stream until stopped, restarting it after errors
+        while not self._stopping.is_set():
+            batch = []
+            try:
+                for submission in self._reddit.stream_submissions(listing, pause_after=self._pause_after):
+                    if submission is not None:
+                        batch.append(submission)
+                    # Store on every pause (None) and whenever a batch is full
+                    if batch and (submission is None or len(batch) >= self._batch_size):
+                        self._hand_over(self._reddit.store_submissions(listing, batch))
+                        batch = []
+                    # PRAW does not back off before a pause, so wait here for new posts
+                    if submission is None:
+                        self._stopping.wait(self._poll_interval)
+                    if self._stopping.is_set():
+                        if batch:
+                            self._hand_over(self._reddit.store_submissions(listing, batch))
+                        return
+            except Exception as e:
+                logging.error(f"Stream of r/{listing} failed: {e}")
+                self._stopping.wait(10)
+
+    def _consume(self) -> None:
+        # Claim and classify queued posts; a None item tells the worker to exit
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        while True:
+            posts = self._queue.get()
+            try:
+                if posts is None:
+                    return
+                claimed = self._storage.claim_posts(
+                    [post["post_id"] for post in posts], self._lease_seconds, worker_id
+                )
+                if claimed:
+                    analyzed = self._router.analyze_posts(claimed)
+                    logging.info(f"Stream: {analyzed} of {len(claimed)} post(s) analyzed", extra={"posts": len(claimed)})
+            except Exception as e:
+                logging.error(f"Stream sentiment worker failed: {e}")
+            finally:
+                self._queue.task_done()
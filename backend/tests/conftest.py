@@ -0,0 +1,113 @@
+"""
+conftest.py
+
+Shared fixtures of the backend tests. Most tests need neither network access nor a
+database: chat completions, storage and clocks are replaced by in-memory fakes.
+Tests of the SQL paths run against throwaway databases on the PostgreSQL server in
+TEST_DATABASE_URL and are skipped when it is not set.
+
+Run from the backend directory:
+    python -m pytest
+    TEST_DATABASE_URL=postgresql://postgres@localhost:5432/postgres python -m pytest
+"""
+
+import os
+import uuid
+from types import SimpleNamespace
+import psycopg2
+import pytest
+
+class FakeClock:
+    """
+    Manually advanced replacement for the time module's clocks; sleeping advances it.
+    """
+
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+        self.slept: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    # The OpenAI client refuses to start without a key even though no request is sent
+    monkeypatch.setenv("API_KEY", "test")
+
+@pytest.fixture
+def make_chat():
+    # Build a chat completion shaped like the OpenAI client's, with optional top logprobs
+    def make(content: str | None, top_logprobs: list[tuple[str, float]] | None = None) -> SimpleNamespace:
+        logprobs = None
+        if top_logprobs is not None:
+            alternatives = [SimpleNamespace(token=token, logprob=logprob) for token, logprob in top_logprobs]
+            token = alternatives[0] if alternatives else SimpleNamespace(token=content, logprob=0.0)
+            logprobs = SimpleNamespace(content=[SimpleNamespace(token=token.token, logprob=token.logprob, top_logprobs=alternatives)])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), logprobs=logprobs)],
+            usage=None
+        )
+
+    return make
+
+@pytest.fixture
+def make_posts():
+    # Posts in the format the pipeline claims them
+    def make(count: int, prefix: str = "p") -> list[dict]:
+        return [
+            {"post_id": f"{prefix}{num}", "title": f"Title {num}", "content": f"Content {num}", "subreddit": "test"}
+            for num in range(count)
+        ]
+
+    return make
+
+@pytest.fixture(scope="session")
+def postgres_server() -> str:
+    # DSN of the server the SQL tests create their databases on
+    dsn = os.getenv("TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    return dsn
+
+@pytest.fixture
+def empty_database(postgres_server):
+    # Connection pool on a new, empty database that is dropped after the test
+    from database.pool import ConnectionPool
+
+    name = f"sentiment_test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(postgres_server)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {name}")
+        # Hourly buckets and dates do not depend on the server's time zone
+        cur.execute(f"ALTER DATABASE {name} SET TimeZone = 'UTC'")
+    pool = ConnectionPool(1, 4, dsn=psycopg2.extensions.make_dsn(postgres_server, dbname=name))
+    try:
+        yield pool
+    finally:
+        pool.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE {name} WITH (FORCE)")
+        admin.close()
+
+@pytest.fixture
+def database(empty_database):
+    # PostgreSQLClient on a throwaway database with all migrations applied
+    from database.postgresql import PostgreSQLClient
+
+    return PostgreSQLClient(empty_database)
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from reddit_api.backfill import Backfill
+from reddit_api.reddit_client import RedditClient
+
+class FakeReddit:
+    """PRAW stand-in serving one subreddit's /new listing of `count` posts, newest first."""
+
+    def __init__(self, count: int, newest_utc: float = 1_700_000_000):
+        self.posts = [
+            SimpleNamespace(
+                id=f"b{num}", name=f"t3_b{num}", created_utc=newest_utc - num * 60,
+                subreddit="python", title=f"Title {num}", selftext=""
+            )
+            for num in range(count)
+        ]
+        self.requests = []
+
+    def subreddit(self, name: str):
+        return self
+
+    def new(self, limit: int, params: dict):
+        # after=<fullname> pages past that post
+        self.requests.append(params.get("after"))
+        start = 0
+        if params.get("after"):
+            start = next(num for num, post in enumerate(self.posts) if post.name == params["after"]) + 1
+        return iter(self.posts[start:start + limit])
+
+@pytest.fixture
+def backfill(database):
+    # Backfill over a fake listing of 250 posts, stored in the test database
+    reddit = FakeReddit(250)
+
+    def make(**kwargs) -> Backfill:
+        return Backfill(RedditClient(reddit, database=database), storage=database, **kwargs)
+
+    make.reddit = reddit
+    return make
+
+def test_backfill_resumes_from_its_checkpoint(backfill, database):
+    assert backfill(max_pages=1).run("python") == 100
+    assert database.get_backfill_checkpoint("python", "new") == ("t3_b99", 1_700_000_000 - 99 * 60, 1, 100, False)
+
+    # A new process continues after the last stored page instead of starting over
+    assert backfill().run("python") == 150
+    assert backfill.reddit.requests == [None, "t3_b99", "t3_b199"]
+    assert database.get_backfill_checkpoint("python", "new")[2:] == (3, 250, True)
+    assert backfill().run("python") == 0
+    assert len(backfill.reddit.requests) == 3
+
+def test_backfill_stops_at_the_age_limit(backfill, database):
+    assert backfill(oldest_utc=1_700_000_000 - 30 * 60).run("python") == 31
+    assert database.get_backfill_checkpoint("python", "new")[4] is True
+
+def test_backfilled_posts_are_classified_after_fresh_ones(backfill, database):
+    backfill(max_pages=1).run("python")
+    database.add_posts([("fresh", datetime.now(timezone.utc), "python", "Title", "")])
+
+    # The fresh post has the highest id but the default priority, above BACKFILL_PRIORITY
+    assert [post["post_id"] for post in database.claim_unsentimented_posts(1, 600, "w1")] == ["fresh"]
+    assert len(database.claim_unsentimented_posts(1000, 600, "w1")) == 100
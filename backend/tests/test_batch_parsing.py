@@ -0,0 +1,65 @@
+import json
+import httpx
+import pytest
+from openai import APIConnectionError
+from openrouter.sentiment_model import SentimentModel
+
+@pytest.fixture
+def model():
+    return SentimentModel(model="test/model", temperature=0, max_tokens=3, batch_size=3, storage=object())
+
+def connection_error() -> APIConnectionError:
+    return APIConnectionError(request=httpx.Request("POST", "http://localhost"))
+
+def test_labels_are_read_by_post_id(model, make_chat, make_posts):
+    posts = make_posts(3)
+    chat = make_chat(json.dumps({"p0": "positive", "p1": " NEGATIVE ", "p2": "Neutral"}))
+
+    assert model._parse_batch_response(chat, posts) == {"p0": "POSITIVE", "p1": "NEGATIVE", "p2": "NEUTRAL"}
+
+def test_text_around_the_json_object_is_ignored(model, make_chat, make_posts):
+    chat = make_chat('Sure! Here are the labels:\n```json\n{"p0": "POSITIVE", "p1": "NEUTRAL"}\n```')
+
+    assert model._parse_batch_response(chat, make_posts(2)) == {"p0": "POSITIVE", "p1": "NEUTRAL"}
+
+def test_invalid_unknown_and_missing_labels_are_dropped(model, make_chat, make_posts):
+    chat = make_chat(json.dumps({"p0": "MIXED", "p1": 1, "other": "POSITIVE", "p2": "NEGATIVE"}))
+
+    assert model._parse_batch_response(chat, make_posts(4)) == {"p2": "NEGATIVE"}
+
+@pytest.mark.parametrize("answer", [None, "", "POSITIVE", "{not json}", '["POSITIVE"]', '} {'])
+def test_unusable_answers_give_no_labels(model, make_chat, make_posts, answer):
+    assert model._parse_batch_response(make_chat(answer), make_posts(2)) == {}
+
+def test_single_post_batches_use_the_single_post_prompt(model, make_posts):
+    calls = []
+    model._analyze_sentiment = lambda post_id, **post: calls.append(post_id) or "POSITIVE"
+
+    assert model._analyze_batch(make_posts(1)) == {"p0": "POSITIVE"}
+    assert calls == ["p0"]
+
+def test_posts_missing_from_the_answer_are_retried_one_by_one(model, make_chat, make_posts):
+    retried = []
+    model._create_chat = lambda messages, max_tokens=None, **options: make_chat('{"p0": "POSITIVE"}')
+    model._analyze_sentiment = lambda post_id, **post: retried.append(post_id) or "NEGATIVE"
+
+    assert model._analyze_batch(make_posts(3)) == {"p0": "POSITIVE", "p1": "NEGATIVE", "p2": "NEGATIVE"}
+    assert retried == ["p1", "p2"]
+
+def test_failed_retry_keeps_the_parsed_labels(model, make_chat, make_posts):
+    retried = []
+
+    def fail(post_id, **post):
+        retried.append(post_id)
+        raise connection_error()
+
+    model._create_chat = lambda messages, max_tokens=None, **options: make_chat('{"p0": "POSITIVE"}')
+    model._analyze_sentiment = fail
+
+    assert model._analyze_batch(make_posts(3)) == {"p0": "POSITIVE"}
+    assert retried == ["p1"]
+
+def test_batch_prompt_lists_every_post_id(model, make_posts):
+    prompt = model._build_batch_prompt(make_posts(3))
+
+    assert all(post_id in prompt for post_id in ("p0", "p1", "p2"))
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from database.comment_queue import CommentQueue
+
+@pytest.fixture
+def comments(database):
+    # A post with three stored comments c0..c2
+    now = datetime.now(timezone.utc)
+    database.add_posts([("p1", now - timedelta(hours=3), "python", "Title", "Content")])
+    inserted = database.add_comments([
+        (f"c{num}", "p1", "t3_p1", 0, now, "python", f"Comment {num}") for num in range(3)
+    ])
+    return CommentQueue(database), inserted
+
+def claimed(posts: list[dict]) -> list[str]:
+    return sorted(post["post_id"] for post in posts)
+
+def test_stored_comments_are_skipped_on_reinsert(database, comments):
+    _, inserted = comments
+    now = datetime.now(timezone.utc)
+
+    assert sorted(inserted) == ["c0", "c1", "c2"]
+    again = [("c1", "p1", "t3_p1", 0, now, "python", "Again"), ("c3", "p1", "t1_c1", 1, now, "python", "Reply")]
+    assert database.add_comments(again) == ["c3"]
+    assert database.count_comments_per_post(["p1", "p2"]) == {"p1": 4}
+    assert database.get_existing_comment_ids(["c0", "c9"]) == {"c0"}
+
+def test_comments_are_claimed_in_the_post_format(comments):
+    queue, _ = comments
+    first = queue.claim_unsentimented_posts(2, 600, "w1")
+
+    assert claimed(first) == ["c0", "c1"]
+    assert {"post_id": "c0", "title": "", "content": "Comment 0", "subreddit": "python"} in first
+    assert claimed(queue.claim_unsentimented_posts(10, 600, "w2", exclude={"c2"})) == []
+    assert claimed(queue.claim_unsentimented_posts(10, 600, "w2")) == ["c2"]
+
+def test_results_and_releases_go_to_the_comments_table(database, comments):
+    queue, _ = comments
+    queue.claim_unsentimented_posts(3, 600, "w1")
+    queue.mark_posts_sentiment([("c0", "POSITIVE", "m", 0.8)])
+    queue.release_posts(["c1"])
+
+    assert queue.count_backlog() == 2
+    assert queue.has_posts()
+    assert [claimed(batch) for batch in queue.iter_unsentimented_posts(10, 600, "w2")] == [["c1"]]
+    # Posts are a separate queue
+    assert claimed(database.claim_unsentimented_posts(10, 600, "w2")) == ["p1"]
+
+def test_posts_are_due_for_comments_once_within_the_age_window(database):
+    now = datetime.now(timezone.utc)
+    database.add_posts([
+        ("young", now - timedelta(minutes=30), "python", "", ""),
+        ("due", now - timedelta(hours=3), "python", "", ""),
+        ("old", now - timedelta(days=3), "python", "", "")
+    ])
+
+    assert database.claim_posts_for_comments(1, 48, 10) == [("due", "python")]
+    assert database.claim_posts_for_comments(1, 48, 10) == []
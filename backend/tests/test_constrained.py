@@ -0,0 +1,51 @@
+import math
+import pytest
+from openrouter.sentiment_model import SentimentModel
+
+@pytest.fixture
+def model():
+    model = SentimentModel(model="test/model", temperature=0, max_tokens=3, batch_size=5, storage=object())
+    model.set_constrained(True)
+    return model
+
+@pytest.mark.parametrize("token, label", [
+    ("positive", "POSITIVE"),
+    (" Pos", "POSITIVE"),
+    ("neg", "NEGATIVE"),
+    ("Neutral.", "NEUTRAL"),
+    ("negatively", "NEGATIVE"),
+    ("ne", None),
+    ("", None),
+    ("maybe", None),
+])
+def test_label_for_token_accepts_unambiguous_prefixes(token, label):
+    assert SentimentModel._label_for_token(token) == label
+
+def test_constrained_mode_sends_one_post_per_request(model):
+    assert model.batch_size == 1
+
+def test_confidence_is_the_label_share_of_the_top_alternatives(model, make_chat):
+    chat = make_chat("pos", [("pos", math.log(0.6)), ("positive", math.log(0.1)), ("neg", math.log(0.2)), ("the", math.log(0.1))])
+
+    assert model._constrained_sentiment(chat, "p0") == "POSITIVE"
+    assert model._confidences["p0"] == pytest.approx(0.7 / 0.9)
+
+def test_answer_token_decides_without_logprobs(model, make_chat):
+    assert model._constrained_sentiment(make_chat("negative"), "p0") == "NEGATIVE"
+    assert "p0" not in model._confidences
+
+def test_unreadable_answer_is_invalid(model, make_chat):
+    assert model._constrained_sentiment(make_chat("I", [("I", 0.0), ("The", -1.0)]), "p0") == "INVALID"
+
+def test_results_carry_the_confidence_and_leave_no_entries_behind(model, make_chat, make_posts):
+    def analyze(post_id, **post):
+        if post_id == "p1":
+            model._confidences[post_id] = 0.5
+            return "MAYBE"
+        return model._constrained_sentiment(make_chat("neu", [("neu", math.log(0.8)), ("neg", math.log(0.2))]), post_id)
+
+    model._analyze_sentiment = analyze
+    results = model._classify_posts(make_posts(2))
+
+    assert results["p0"] == ("NEUTRAL", "test/model", pytest.approx(0.8))
+    assert model._confidences == {}
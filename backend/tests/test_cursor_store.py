@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+from reddit_api.cursor_store import CursorStore
+
+class FakeStorage:
+    """In-memory subreddit_cursors table."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get_subreddit_cursors(self):
+        return dict(self.rows)
+
+    def save_subreddit_cursor(self, subreddit, *row):
+        self.rows[subreddit] = row
+
+def submission(name: str, created_utc: float) -> SimpleNamespace:
+    return SimpleNamespace(name=name, created_utc=created_utc)
+
+def test_poll_interval_follows_the_post_rate():
+    cursors = CursorStore(FakeStorage(), min_interval=60, max_interval=3600, target_posts_per_poll=25, smoothing=1)
+    first = cursors.advance("python", submission("t3_a", 100), 10, now=1000)
+    assert (first.next_poll_utc, first.posts_per_hour) == (1060, 0)
+
+    # 100 posts in an hour: 25 are expected every 15 minutes
+    busy = cursors.advance("python", submission("t3_b", 4500), 100, now=4600)
+    assert busy.posts_per_hour == 100 and busy.next_poll_utc == 4600 + 900
+    quiet = cursors.advance("python", None, 0, now=8200)
+    assert quiet.next_poll_utc == 8200 + 3600
+    assert quiet.is_due(8200 + 3600 - 5) and not quiet.is_due(8200 + 60)
+
+def test_cursors_survive_a_restart(database):
+    cursors = CursorStore(database, smoothing=1)
+    cursors.advance("python", submission("t3_a", 1000.5), 3, now=2000)
+    cursors.advance("python", submission("t3_b", 4000.0), 12, now=5600)
+    # A poll returning an older post does not move the high-water mark back
+    cursors.advance("python", submission("t3_old", 10.0), 0, now=9200)
+
+    restored = CursorStore(database).get("python")
+    assert (restored.fullname, restored.created_utc) == ("t3_b", 4000.0)
+    assert restored.last_polled_utc == 9200 and restored.next_poll_utc == 9200 + 3600
+    assert restored.posts_per_hour == 0
+    assert CursorStore(database).get("rust").fullname is None
+
+def test_saving_a_cursor_replaces_the_stored_row(database):
+    database.save_subreddit_cursor("python", "t3_a", 1.0, 5.0, 10.0, 70.0)
+    database.save_subreddit_cursor("python", "t3_b", 2.0, 6.0, 20.0, 80.0)
+
+    assert database.get_subreddit_cursors() == {"python": ("t3_b", 2.0, 6.0, 20.0, 80.0)}
@@ -0,0 +1,58 @@
+import math
+import pytest
+from openrouter.lexicon_model import NORMALIZATION_ALPHA, LexiconModel
+
+def post(post_id: str, title: str, content: str = "") -> dict:
+    return {"post_id": post_id, "title": title, "content": content, "subreddit": "test"}
+
+@pytest.fixture
+def model():
+    return LexiconModel(lexicon={"good": 2.0, "bad": -2.0, "great": 3.0}, confidence_threshold=0.5)
+
+def test_compound_score_is_the_normalized_valence_sum(model):
+    scores = model.score([post("a", "Good and great"), post("b", "")])
+
+    assert scores[0] == pytest.approx(5 / math.sqrt(25 + NORMALIZATION_ALPHA))
+    assert scores[1] == 0
+
+def test_negation_flips_and_dampens_the_next_word_only(model):
+    negated, plain = model.score([post("a", "not good"), post("b", "good")])
+
+    assert negated < 0 < plain
+    assert abs(negated) < plain
+
+def test_negation_does_not_reach_into_the_next_post(model):
+    # The last token of a post must not negate the first token of the next one
+    scores = model.score([post("a", "", "not"), post("b", "good")])
+
+    assert scores[1] > 0
+
+def test_labels_and_confidences(model):
+    labels, confidence = model.classify([post("a", "great great"), post("b", "bad bad bad"), post("c", "the table")])
+
+    assert labels == ["POSITIVE", "NEGATIVE", "NEUTRAL"]
+    assert confidence[2] == 0
+    assert 0 < confidence[0] <= 1 and 0 < confidence[1] <= 1
+
+def test_only_confident_posts_are_labelled_locally(model):
+    posts = [post("a", "great great great"), post("b", "good"), post("c", "no opinion")]
+    confident, remaining = model.split_confident(posts)
+
+    assert list(confident) == ["a"]
+    assert confident["a"][0] == "POSITIVE"
+    assert [p["post_id"] for p in remaining] == ["b", "c"]
+
+def test_empty_batch(model):
+    assert model.split_confident([]) == ({}, [])
+
+def test_lexicon_file_skips_malformed_lines(tmp_path):
+    path = tmp_path / "lexicon.txt"
+    path.write_text("Superb\t3.1\t0.5\t[3, 3]\nbroken line\nmeh\tnot-a-number\n", encoding="utf-8")
+    model = LexiconModel.from_file(str(path), confidence_threshold=0.1)
+
+    assert model.split_confident([post("a", "superb")])[0]["a"][0] == "POSITIVE"
+    assert model.score([post("b", "meh")])[0] == 0
+
+def test_confidence_threshold_is_validated():
+    with pytest.raises(ValueError):
+        LexiconModel(confidence_threshold=1.5)
@@ -0,0 +1,77 @@
+import json
+import logging
+import queue
+import sys
+from types import SimpleNamespace
+import pytest
+from logging_config import rate_limit
+from logging_config.json_logging import JsonFormatter
+from logging_config.logging_config import RecordQueueHandler
+from logging_config.rate_limit import RateLimitFilter
+
+def record(msg: str = "message", level: int = logging.INFO, lineno: int = 10, args=None, **extra) -> logging.LogRecord:
+    entry = logging.LogRecord("test", level, "/app/module.py", lineno, msg, args, None)
+    entry.__dict__.update(extra)
+    return entry
+
+@pytest.fixture
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+def test_each_call_site_gets_its_own_burst(fake_time):
+    limiter = RateLimitFilter(per_second=1, burst=2)
+
+    assert [limiter.filter(record(lineno=10)) for _ in range(3)] == [True, True, False]
+    assert limiter.filter(record(lineno=11))
+    assert limiter.suppressed == 1
+
+def test_next_passing_record_reports_the_suppressed_ones(fake_time):
+    limiter = RateLimitFilter(per_second=1, burst=1)
+    limiter.filter(record())
+    limiter.filter(record())
+    limiter.filter(record())
+    fake_time.advance(1)
+    passed = record("Added %s", args=("p1",))
+
+    assert limiter.filter(passed)
+    assert passed.getMessage() == "Added p1 (2 similar messages suppressed)"
+    assert passed.suppressed == 2
+
+def test_warnings_and_other_modules_are_never_dropped(fake_time):
+    limiter = RateLimitFilter(per_second=1, burst=1, modules=["module"])
+    limiter.filter(record())
+
+    assert limiter.filter(record(level=logging.WARNING))
+    assert limiter.filter(record(level=logging.INFO)) is False
+    other = record()
+    other.module = "other"
+    assert limiter.filter(other)
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        RateLimitFilter(per_second=0)
+
+def test_json_formatter_writes_extra_fields():
+    entry = json.loads(JsonFormatter().format(record("Added %s", args=("p1",), post_id="p1", latency=0.25)))
+
+    assert entry["message"] == "Added p1"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test"
+    assert entry["post_id"] == "p1" and entry["latency"] == 0.25
+    assert entry["time"].endswith("+00:00")
+    assert "exception" not in entry
+
+def test_queued_records_keep_their_exception_for_the_json_formatter():
+    log_queue = queue.SimpleQueue()
+    handler = RecordQueueHandler(log_queue)
+    try:
+        raise ZeroDivisionError("boom")
+    except ZeroDivisionError:
+        failed = logging.LogRecord("test", logging.ERROR, "/app/module.py", 1, "Failed %s", ("p1",), sys.exc_info())
+    handler.handle(failed)
+    entry = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+
+    assert entry["message"] == "Failed p1"
+    assert "ZeroDivisionError: boom" in entry["exception"]
+    assert "Traceback" not in entry["message"]
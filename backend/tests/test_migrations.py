@@ -0,0 +1,60 @@
+import threading
+import psycopg2
+import pytest
+from database import migrations
+from database.migrations import MIGRATIONS, Migration, apply_migrations, check_query_plans
+
+def test_migrations_apply_once_and_hot_queries_use_their_indexes(empty_database):
+    assert apply_migrations(empty_database) == [migration.version for migration in MIGRATIONS]
+    assert apply_migrations(empty_database) == []
+    assert {name: used for name, (ok, used) in check_query_plans(empty_database).items() if not ok} == {}
+
+def test_failed_concurrent_index_is_rebuilt_on_rerun(empty_database, monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        Migration(1, "table", ["CREATE TABLE items (x INT)", "INSERT INTO items VALUES (1), (1)"]),
+        Migration(2, "index", ["CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS items_x_idx ON items (x)"], transactional=False)
+    ])
+    with pytest.raises(psycopg2.errors.UniqueViolation):
+        apply_migrations(empty_database)
+    with empty_database.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = 'items_x_idx'::regclass")
+        assert cur.fetchone() == (False,)
+        cur.execute("DELETE FROM items WHERE ctid = (SELECT max(ctid) FROM items)")
+
+    assert apply_migrations(empty_database) == [2]
+    with empty_database.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = 'items_x_idx'::regclass")
+        assert cur.fetchone() == (True,)
+
+def test_waiting_for_the_lock_does_not_block_concurrent_index_builds(empty_database, monkeypatch):
+    # The lock holder builds an index concurrently while another process waits for the lock
+    monkeypatch.setattr(migrations, "MIGRATIONS", [Migration(1, "table", ["CREATE TABLE IF NOT EXISTS items (x INT)"])])
+    monkeypatch.setattr(migrations, "LOCK_POLL_INTERVAL", 0.05)
+    with empty_database.connection() as holder:
+        holder.autocommit = True
+        try:
+            with holder.cursor() as cur:
+                cur.execute("CREATE TABLE items (x INT)")
+                cur.execute("SELECT pg_advisory_lock(%s)", (migrations.MIGRATIONS_LOCK_ID,))
+                waiter = threading.Thread(target=apply_migrations, args=(empty_database,))
+                waiter.start()
+                # Wait until the other process is asking for the lock
+                while True:
+                    cur.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE query LIKE '%advisory_lock(%' AND pid <> pg_backend_pid()"
+                    )
+                    if cur.fetchone()[0]:
+                        break
+                cur.execute("SET statement_timeout = '5s'")
+                cur.execute("CREATE INDEX CONCURRENTLY items_x_idx ON items (x)")
+                cur.execute("SELECT pg_advisory_unlock(%s)", (migrations.MIGRATIONS_LOCK_ID,))
+                cur.execute("RESET statement_timeout")
+        finally:
+            holder.autocommit = False
+    waiter.join(10)
+
+    assert not waiter.is_alive()
+    with empty_database.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT version FROM schema_migrations")
+        assert cur.fetchall() == [(1,)]
@@ -0,0 +1,187 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from openai import APIConnectionError
+from openrouter import model_health
+from openrouter.model_health import CLOSED, HALF_OPEN, OPEN, CircuitOpenError, ModelHealth
+from openrouter.sentiment_model import SentimentModel
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(model_health, "time", SimpleNamespace(monotonic=clock.monotonic))
+
+def test_consecutive_failures_open_the_circuit():
+    health = ModelHealth(failure_threshold=3, max_error_rate=1.0)
+    health.record_failure()
+    health.record_failure()
+    assert health.state == CLOSED
+    health.record_failure()
+
+    assert health.state == OPEN
+    assert not health.available()
+    assert not health.allow_request()
+
+def test_high_error_rate_opens_the_circuit_without_a_failure_streak():
+    health = ModelHealth(failure_threshold=3, max_error_rate=0.3, smoothing=0.5)
+    health.record_success(0.1)
+    health.record_success(0.1)
+    health.record_failure()
+    health.record_success(0.1)
+    assert health.state == CLOSED
+    health.record_failure()
+
+    assert health.state == OPEN
+
+def test_success_resets_the_failure_streak():
+    health = ModelHealth(failure_threshold=3, max_error_rate=1.0)
+    for _ in range(5):
+        health.record_failure()
+        health.record_failure()
+        health.record_success(0.1)
+
+    assert health.state == CLOSED
+
+def test_open_circuit_lets_one_trial_through_after_the_recovery_timeout(clock):
+    health = ModelHealth(failure_threshold=1, recovery_timeout=300)
+    health.record_failure()
+    clock.advance(299)
+    assert health.state == OPEN
+    clock.advance(1)
+
+    assert health.state == HALF_OPEN
+    assert health.available()
+    assert health.allow_request()
+    assert not health.allow_request()
+
+def test_successful_trial_closes_the_circuit(clock):
+    health = ModelHealth(failure_threshold=1, recovery_timeout=10)
+    health.record_failure()
+    clock.advance(10)
+    assert health.allow_request()
+    health.record_success(0.2)
+
+    assert health.state == CLOSED
+    assert health.allow_request()
+
+def test_failed_trial_opens_the_circuit_again(clock):
+    health = ModelHealth(failure_threshold=3, recovery_timeout=10)
+    for _ in range(3):
+        health.record_failure()
+    clock.advance(10)
+    assert health.allow_request()
+    health.record_failure()
+
+    assert health.state == OPEN
+    clock.advance(9)
+    assert not health.allow_request()
+
+def test_snapshot_reports_the_statistics():
+    health = ModelHealth(smoothing=0.5)
+    health.record_success(1.0)
+    health.record_success(3.0)
+    health.record_failure()
+
+    assert health.snapshot() == {"state": CLOSED, "requests": 3, "failures": 1, "error_rate": 0.5, "latency": 2.0}
+
+class QueueStorage:
+    """
+    In-memory work queue with leases, like the posts queue of PostgreSQLClient.
+    """
+
+    queue = "posts"
+
+    def __init__(self, posts: list[dict]):
+        self.posts = {post["post_id"]: post for post in posts}
+        self.sentiments: dict[str, str] = {}
+        self.leased: set[str] = set()
+        self.claims = 0
+
+    def has_posts(self) -> bool:
+        return bool(self.posts)
+
+    def count_backlog(self, cap: int = 100000) -> int:
+        return len(self.posts) - len(self.sentiments)
+
+    def iter_unsentimented_posts(self, batch_size, lease_seconds, worker_id, exclude=()):
+        while True:
+            self.claims += 1
+            if self.claims > 100:
+                raise AssertionError("pipeline keeps claiming")
+            post_ids = [
+                post_id for post_id in self.posts
+                if post_id not in self.sentiments and post_id not in self.leased and post_id not in exclude
+            ][:batch_size]
+            if not post_ids:
+                return
+            self.leased.update(post_ids)
+            yield [self.posts[post_id] for post_id in post_ids]
+
+    def mark_posts_sentiment(self, results):
+        for post_id, sentiment, model, confidence in results:
+            self.sentiments[post_id] = sentiment
+            self.leased.discard(post_id)
+
+    def release_posts(self, post_ids):
+        self.leased.difference_update(post_ids)
+
+def failing_model(storage: QueueStorage, name: str) -> SentimentModel:
+    # Model whose every request fails with a connection error
+    def fail(**kwargs):
+        raise APIConnectionError(request=httpx.Request("POST", "http://localhost"))
+
+    async def fail_async(**kwargs):
+        fail()
+
+    async def close():
+        pass
+
+    model = SentimentModel(model=name, temperature=0, max_tokens=3, storage=storage)
+    model.set_health(ModelHealth(failure_threshold=2))
+    model.set_rate_limit(requests_per_minute=10 ** 9, burst=10 ** 9)
+    model._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fail)))
+    model._open_async_client = lambda: setattr(
+        model, "_async_client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fail_async)), close=close)
+    )
+
+    return model
+
+def test_open_circuit_refuses_requests_locally(make_posts):
+    model = failing_model(QueueStorage(make_posts(1)), "test/model")
+    model.health.record_failure()
+    model.health.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        model._analyze_sentiment(**make_posts(1)[0])
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_pipeline_stops_claiming_once_every_circuit_is_open(make_posts, mode):
+    storage = QueueStorage(make_posts(50))
+    primary, fallback = failing_model(storage, "test/primary"), failing_model(storage, "test/fallback")
+    if mode == "sync":
+        primary.pipeline(claim_size=5, fallbacks=[fallback])
+    else:
+        asyncio.run(primary.pipeline_async(concurrency=2, claim_size=5, fallbacks=[fallback]))
+
+    assert storage.claims < 5
+    assert storage.leased == set()
+    assert not primary.health.available() and not fallback.health.available()
+
+def test_pipeline_releases_failed_posts_and_does_not_claim_them_again(make_posts):
+    storage = QueueStorage(make_posts(6))
+    model = SentimentModel(model="test/model", temperature=0, max_tokens=3, storage=storage)
+    model.set_health(ModelHealth(failure_threshold=100, max_error_rate=1.0))
+    attempts: dict[str, int] = {}
+
+    def analyze(post_id, **post):
+        attempts[post_id] = attempts.get(post_id, 0) + 1
+        if post_id in ("p1", "p4"):
+            raise APIConnectionError(request=httpx.Request("POST", "http://localhost"))
+        return "NEUTRAL"
+
+    model._analyze_sentiment = analyze
+    model.pipeline(claim_size=3)
+
+    assert set(storage.sentiments) == {"p0", "p2", "p3", "p5"}
+    assert storage.leased == set()
+    assert attempts == {post_id: 1 for post_id in ("p0", "p1", "p2", "p3", "p4", "p5")}
@@ -0,0 +1,93 @@
+import json
+from datetime import datetime, timedelta, timezone
+import pyarrow.parquet as pq
+import pytest
+from export.parquet_export import ParquetExporter
+
+class FakeStorage:
+    def __init__(self, rows, checkpoint=0, until_id=None):
+        self.rows = rows
+        self.checkpoint = checkpoint
+        self.until_id = rows[-1][0] if until_id is None else until_id
+        self.saved = []
+        self.lags = []
+
+    def get_export_checkpoint(self, name):
+        return self.checkpoint
+
+    def get_export_upper_bound(self, lag_seconds):
+        self.lags.append(lag_seconds)
+        return self.until_id
+
+    def get_posts_for_export(self, after_id, until_id, limit, include_text=False):
+        return [row for row in self.rows if after_id < row[0] <= until_id][:limit]
+
+    def save_export_checkpoint(self, name, last_id):
+        self.saved.append(last_id)
+        self.checkpoint = last_id
+
+def make_rows(count, day=1):
+    return [
+        (i, f"p{i}", datetime(2024, 5, day + i % 2, 12, tzinfo=timezone.utc), "python", "POSITIVE", "test/model", 0.9)
+        for i in range(1, count + 1)
+    ]
+
+def test_export_writes_partitions_and_checkpoint(tmp_path):
+    storage = FakeStorage(make_rows(5))
+    exported = ParquetExporter(str(tmp_path), storage=storage, batch_size=2, min_rows=1).run()
+
+    assert exported == 5
+    assert storage.saved == [5]
+    first = pq.read_table(tmp_path / "posts" / "date=2024-05-01" / "part-000000000001.parquet")
+    second = pq.read_table(tmp_path / "posts" / "date=2024-05-02" / "part-000000000001.parquet")
+    assert first.column("id").to_pylist() == [2, 4]
+    assert second.column("id").to_pylist() == [1, 3, 5]
+    assert pq.ParquetFile(tmp_path / "posts" / "date=2024-05-01" / "part-000000000001.parquet").num_row_groups == 2
+    marker = json.loads((tmp_path / "_export.json").read_text())
+    assert marker["name"] == "posts" and marker["last_id"] == 5
+    assert not list(tmp_path.rglob("*.tmp"))
+
+def test_next_run_starts_after_the_checkpoint(tmp_path):
+    storage = FakeStorage(make_rows(6), checkpoint=4)
+
+    assert ParquetExporter(str(tmp_path), storage=storage, min_rows=1).run() == 2
+    assert {path.name for path in tmp_path.rglob("*.parquet")} == {"part-000000000005.parquet"}
+
+def test_partitions_use_the_utc_date(tmp_path):
+    # 01:30 in Warsaw is still the previous day in UTC
+    warsaw = timezone(timedelta(hours=2))
+    rows = [(1, "p1", datetime(2024, 5, 2, 1, 30, tzinfo=warsaw), "python", "POSITIVE", "test/model", None)]
+    storage = FakeStorage(rows)
+    ParquetExporter(str(tmp_path), storage=storage, min_rows=1, lag_seconds=60).run()
+
+    table = pq.read_table(tmp_path / "posts" / "date=2024-05-01" / "part-000000000001.parquet")
+    assert table.column("created_at").to_pylist() == [datetime(2024, 5, 1, 23, 30, tzinfo=timezone.utc)]
+    assert storage.lags == [60]
+
+def test_small_runs_are_skipped(tmp_path):
+    storage = FakeStorage(make_rows(3))
+
+    assert ParquetExporter(str(tmp_path), storage=storage, min_rows=10).run() == 0
+    assert storage.saved == []
+    assert not (tmp_path / "_export.json").exists()
+
+def test_failed_run_keeps_the_checkpoint_and_no_partial_files(tmp_path):
+    storage = FakeStorage(make_rows(4))
+    pages = []
+
+    def failing_page(after_id, until_id, limit, include_text=False):
+        pages.append(after_id)
+        if len(pages) > 1:
+            raise ConnectionError("lost")
+        return make_rows(4)[:limit]
+
+    storage.get_posts_for_export = failing_page
+    with pytest.raises(ConnectionError):
+        ParquetExporter(str(tmp_path), storage=storage, batch_size=2, min_rows=1).run()
+
+    assert storage.saved == []
+    assert not list(tmp_path.rglob("*.parquet*"))
+
+def test_batch_size_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        ParquetExporter(str(tmp_path), storage=FakeStorage(make_rows(1)), batch_size=0)
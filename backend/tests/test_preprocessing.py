@@ -0,0 +1,53 @@
+import pytest
+from openrouter.preprocessing import TextPreprocessor
+
+@pytest.mark.parametrize("text, expected", [
+    ("**Bold** and __under__ ~~gone~~ text", "Bold and under gone text"),
+    ("snake_case_name stays", "snake_case_name stays"),
+    ("Before\n```python\nprint('x')\n```\nAfter", "Before After"),
+    ("Use `pip install` now", "Use now"),
+    ("> quoted reply\nMy answer", "My answer"),
+    ("See [the docs](https://example.com) or https://example.com/x", "See the docs or"),
+    ("# Heading\n- first\n- second", "Heading first second"),
+    ("| a | b |\n|---|---|\n| 1 | 2 |\nText", "Text"),
+    ("Fish &amp; chips <br> >!spoiler!<", "Fish & chips spoiler"),
+    ("", ""),
+    (None, ""),
+])
+def test_clean_keeps_only_the_prose(text, expected):
+    assert TextPreprocessor.clean(text) == expected
+
+def test_estimate_tokens_rounds_up():
+    assert TextPreprocessor.estimate_tokens("abcde") == 2
+    assert TextPreprocessor.estimate_tokens(None) == 0
+
+def test_truncate_cuts_at_a_word_boundary():
+    text = "word " * 20
+
+    assert TextPreprocessor.truncate("short text", 10) == "short text"
+    assert TextPreprocessor.truncate(text.strip(), 4) == "word word word ..."
+
+def test_truncate_cuts_long_words_hard():
+    assert TextPreprocessor.truncate("a" * 40, 2) == "a" * 8 + " ..."
+
+def test_prepare_returns_a_cleaned_copy():
+    preprocessor = TextPreprocessor(max_content_tokens=3)
+    post = {"post_id": "p0", "title": "**Hello**", "content": "one two three four five six", "subreddit": "test"}
+    prepared = preprocessor.prepare(post)
+
+    assert prepared == {"post_id": "p0", "title": "Hello", "content": "one two ...", "subreddit": "test"}
+    assert post["title"] == "**Hello**"
+
+@pytest.mark.parametrize("content", ["[deleted]", " [Removed] "])
+def test_removed_posts_are_skipped(content):
+    post = {"post_id": "p0", "title": "Title", "content": content}
+
+    assert TextPreprocessor().prepare(post) is None
+    assert TextPreprocessor(skip_removed=False).prepare(post)["content"] == ""
+
+def test_posts_without_prose_are_skipped():
+    assert TextPreprocessor().prepare({"post_id": "p0", "title": "https://example.com", "content": "```\ncode\n```"}) is None
+
+def test_budgets_are_validated():
+    with pytest.raises(ValueError):
+        TextPreprocessor(max_content_tokens=0)
@@ -0,0 +1,64 @@
+import time
+from datetime import datetime, timezone
+
+CREATED = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+def add_posts(database, *post_ids: str, subreddit: str = "python") -> None:
+    database.add_posts([(post_id, CREATED, subreddit, "Title", "Content") for post_id in post_ids])
+
+def rollup(pool) -> dict[tuple, int]:
+    # Non-zero counts per (subreddit, sentiment, model_version, hour)
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT subreddit, sentiment, model_version, bucket, count FROM sentiment_rollup WHERE count <> 0")
+        return {(subreddit, sentiment, model, bucket.hour): count for subreddit, sentiment, model, bucket, count in cur.fetchall()}
+
+def recount(pool) -> dict[tuple, int]:
+    # The same counts computed from posts
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT COALESCE(subreddit, ''), sentiment, COALESCE(model_version, ''), date_trunc('hour', created_at), count(*) "
+            "FROM posts WHERE sentiment IS NOT NULL GROUP BY 1, 2, 3, 4"
+        )
+        return {(subreddit, sentiment, model, bucket.hour): count for subreddit, sentiment, model, bucket, count in cur.fetchall()}
+
+def test_labels_are_counted_per_hour(database, empty_database):
+    add_posts(database, "p1", "p2", "p3")
+    add_posts(database, "q1", subreddit="rust")
+    database.mark_posts_sentiment([
+        ("p1", "POSITIVE", "m", None), ("p2", "POSITIVE", "m", None), ("p3", "NEGATIVE", "m", None),
+        ("q1", "POSITIVE", "m", None)
+    ])
+
+    assert rollup(empty_database) == {
+        ("python", "POSITIVE", "m", 12): 2, ("python", "NEGATIVE", "m", 12): 1, ("rust", "POSITIVE", "m", 12): 1
+    }
+
+def test_relabels_deletes_and_lease_changes_keep_the_rollup_exact(database, empty_database):
+    add_posts(database, "p1", "p2", "p3")
+    database.mark_posts_sentiment([("p1", "POSITIVE", "m", None), ("p2", "POSITIVE", "m", None)])
+    database.claim_unsentimented_posts(10, 600, "w1")
+    database.release_posts(["p3"])
+    with empty_database.connection() as conn, conn.cursor() as cur:
+        cur.execute("UPDATE posts SET sentiment = 'NEUTRAL', model_version = 'm2' WHERE post_id = 'p1'")
+        cur.execute("DELETE FROM posts WHERE post_id = 'p2'")
+
+    assert rollup(empty_database) == {("python", "NEUTRAL", "m2", 12): 1}
+    assert rollup(empty_database) == recount(empty_database)
+
+def change_marker(pool) -> str:
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT max(updated_at) FROM sentiment_rollup")
+        return cur.fetchone()[0]
+
+def test_marker_moves_when_an_older_transaction_commits_later(database, empty_database):
+    add_posts(database, "p1", "p2")
+    with empty_database.connection() as slow, slow.cursor() as cur:
+        # The slow transaction starts first and writes its label after the fast one committed
+        cur.execute("SELECT 1")
+        time.sleep(0.05)
+        database.update_post_sentiment("p1", "POSITIVE", "model")
+        marker = change_marker(empty_database)
+        time.sleep(0.05)
+        cur.execute("UPDATE posts SET sentiment = 'NEGATIVE', model_version = 'model' WHERE post_id = 'p2'")
+
+    assert change_marker(empty_database) > marker
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+import pytest
+from prometheus_client import REGISTRY
+from openrouter import sentiment_cache
+from openrouter.sentiment_cache import SentimentCache
+
+class FakeStorage:
+    """In-memory sentiment_cache table, without expiry."""
+
+    def __init__(self):
+        self.entries: dict[tuple[str, str, str], tuple[str, float]] = {}
+        self.lookups: list[list[str]] = []
+
+    def get_cached_sentiments(self, content_hashes, model, prompt_version, ttl_days):
+        self.lookups.append(sorted(content_hashes))
+        return {
+            content_hash: self.entries[(content_hash, model, prompt_version)]
+            for content_hash in content_hashes
+            if (content_hash, model, prompt_version) in self.entries
+        }
+
+    def cache_sentiments(self, entries):
+        for content_hash, model, prompt_version, sentiment in entries:
+            self.entries[(content_hash, model, prompt_version)] = (sentiment, 0.0)
+
+@pytest.fixture
+def storage(monkeypatch, clock):
+    monkeypatch.setattr(sentiment_cache, "time", SimpleNamespace(time=clock.time))
+    return FakeStorage()
+
+def lookups(model: str, result: str) -> float:
+    return REGISTRY.get_sample_value("sentiment_cache_lookups_total", {"model": model, "result": result}) or 0.0
+
+def test_content_hash_ignores_case_and_whitespace():
+    assert SentimentCache.content_hash("Great  News", "It works\n") == SentimentCache.content_hash("great news", " it WORKS")
+    assert SentimentCache.content_hash("a", "b") != SentimentCache.content_hash("a b", "")
+
+def test_lookups_go_to_memory_then_to_the_database(storage):
+    cache = SentimentCache(storage)
+    cache.put_many({"h1": "POSITIVE"}, "memory-model", "v1")
+    storage.entries[("h2", "memory-model", "v1")] = ("NEGATIVE", 0.0)
+    before = {result: lookups("memory-model", result) for result in ("memory_hit", "db_hit", "miss")}
+
+    assert cache.get_many({"h1", "h2", "h3"}, "memory-model", "v1") == {"h1": "POSITIVE", "h2": "NEGATIVE"}
+    assert storage.lookups == [["h2", "h3"]]
+    assert cache.stats == {"memory_hits": 1, "db_hits": 1, "misses": 1, "hit_ratio": 0.667}
+    assert {result: lookups("memory-model", result) - count for result, count in before.items()} == {
+        "memory_hit": 1, "db_hit": 1, "miss": 1
+    }
+    # The database hit is remembered in memory
+    assert cache.get_many({"h2"}, "memory-model", "v1") == {"h2": "NEGATIVE"}
+    assert storage.lookups[-1] == []
+
+def test_entries_are_per_model_and_prompt_version(storage):
+    cache = SentimentCache(storage)
+    cache.put_many({"h1": "POSITIVE"}, "a", "v1")
+
+    assert cache.get_many({"h1"}, "b", "v1") == {}
+    assert cache.get_many({"h1"}, "a", "v2") == {}
+    assert storage.entries == {("h1", "a", "v1"): ("POSITIVE", 0.0)}
+
+def test_memory_entries_expire_and_the_oldest_are_evicted(storage, clock):
+    cache = SentimentCache(storage, max_entries=2, ttl_days=1)
+    cache.put_many({"h1": "POSITIVE"}, "m", "v1")
+    clock.advance(86400 - 10)
+    cache.put_many({"h2": "NEUTRAL", "h3": "NEGATIVE"}, "m", "v1")
+    storage.entries.clear()
+
+    # h1 was evicted by the LRU, the others expire one day after they were stored
+    assert cache.get_many({"h1", "h2", "h3"}, "m", "v1") == {"h2": "NEUTRAL", "h3": "NEGATIVE"}
+    clock.advance(86401)
+    assert cache.get_many({"h2", "h3"}, "m", "v1") == {}
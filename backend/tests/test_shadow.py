@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+import pytest
+from evaluation.shadow import ShadowRun
+
+class FakeStorage:
+    def __init__(self, confusion=(), **state):
+        self.confusion = list(confusion)
+        self.state = {
+            "model_version": "test/model", "selection": {}, "settings": {}, "until_id": 100, "last_id": 100,
+            "requests": 10, "posts": 50, "failed": 0, "seconds": 5.0, "promoted_at": None, **state
+        }
+
+    def get_shadow_run(self, run_id):
+        return self.state
+
+    def get_shadow_confusion(self, run_id):
+        return self.confusion
+
+def shadow_run(storage, batch_size=1, constrained=False):
+    candidate = SimpleNamespace(model="test/model", batch_size=batch_size, constrained=constrained)
+    return ShadowRun("run", candidate, storage=storage)
+
+def test_report_computes_agreement_and_kappa():
+    storage = FakeStorage([
+        ("POSITIVE", "POSITIVE", 20), ("POSITIVE", "NEGATIVE", 5),
+        ("NEGATIVE", "POSITIVE", 10), ("NEGATIVE", "NEGATIVE", 15)
+    ])
+    report = shadow_run(storage).report()
+
+    assert report["agreement"] == pytest.approx(0.7)
+    assert report["kappa"] == pytest.approx(0.4)
+    assert report["confusion"][("NEGATIVE", "POSITIVE")] == 10
+    assert report["complete"] and not report["promoted"]
+    assert report["posts_per_second"] == 10.0 and report["posts_per_request"] == 5.0
+
+def test_kappa_is_one_when_both_use_a_single_label():
+    report = shadow_run(FakeStorage([("NEUTRAL", "NEUTRAL", 7)])).report()
+
+    assert report["agreement"] == 1.0 and report["kappa"] == 1.0
+
+def test_empty_run_reports_no_agreement():
+    report = shadow_run(FakeStorage(seconds=0.0, requests=0)).report()
+
+    assert report["agreement"] is None and report["kappa"] is None
+    assert report["posts_per_second"] == 0.0 and report["posts_per_request"] == 0.0
+
+def test_run_refuses_other_prompt_settings():
+    storage = FakeStorage(settings={"batch_size": 5, "constrained": False})
+
+    with pytest.raises(ValueError, match="was started with"):
+        shadow_run(storage, batch_size=1, constrained=True).run()
+
+def test_incomplete_run_is_not_promoted():
+    with pytest.raises(ValueError, match="not complete"):
+        shadow_run(FakeStorage(last_id=40)).promote()
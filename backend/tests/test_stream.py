@@ -0,0 +1,38 @@
+import threading
+import pytest
+from reddit_api.reddit_client import RedditClient
+from reddit_api.stream import SubmissionStream
+
+class StopAfter:
+    """Stands in for the stream's stop event, records the waits and stops after `count` of them."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.waits = []
+        self._event = threading.Event()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        self.waits.append(timeout)
+        if len(self.waits) >= self.count:
+            self._event.set()
+        return self._event.is_set()
+
+@pytest.fixture
+def reddit():
+    # Only get_listing is replaced, the stream itself is PRAW's stream_generator
+    client = RedditClient.__new__(RedditClient)
+    client.polls = []
+    client.get_listing = lambda subreddit, sort, limit, params: client.polls.append(subreddit) or []
+    client.store_submissions = lambda listing, batch: pytest.fail("Nothing to store")
+    return client
+
+def test_producer_waits_between_empty_polls(reddit):
+    stream = SubmissionStream(reddit, router=None, subreddits=["python"], storage=object(), poll_interval=5)
+    stream._stopping = StopAfter(3)
+    stream._produce("python")
+
+    assert stream._stopping.waits == [5, 5, 5]
+    assert reddit.polls == ["python"] * 3
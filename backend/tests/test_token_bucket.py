@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from rate_limiter import token_bucket
+from rate_limiter.token_bucket import AdaptiveRateLimiter, RedditRateBudget, TokenBucket
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch, clock):
+    # Only the limiter module sees the fake clock
+    monkeypatch.setattr(token_bucket, "time", SimpleNamespace(monotonic=clock.monotonic, time=clock.time, sleep=clock.sleep))
+    monkeypatch.setattr(token_bucket.random, "uniform", lambda low, high: 0.0)
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+
+    assert clock.slept == []
+
+def test_reservations_are_spaced_by_the_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=1)
+    waits = [bucket._reserve() for _ in range(4)]
+
+    assert waits == [0.0, 0.5, 1.0, 1.5]
+
+def test_acquire_sleeps_for_its_reserved_token(clock):
+    bucket = TokenBucket(rate=4, capacity=1)
+    bucket.acquire()
+    bucket.acquire()
+
+    assert clock.slept == [0.25]
+
+def test_tokens_refill_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket._reserve()
+    bucket._reserve()
+    clock.advance(100)
+
+    assert [bucket._reserve() for _ in range(3)] == [0.0, 0.0, 1.0]
+
+def test_rate_change_keeps_tokens_refilled_at_the_old_rate(clock):
+    bucket = TokenBucket(rate=1, capacity=10)
+    for _ in range(10):
+        bucket._reserve()
+    clock.advance(2)
+    bucket.rate = 100
+
+    assert bucket._reserve() == 0.0
+    assert bucket._reserve() == 0.0
+    assert bucket._reserve() == pytest.approx(0.01)
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_rate_must_be_positive(rate):
+    with pytest.raises(ValueError):
+        TokenBucket(rate=rate)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1).rate = rate
+
+def test_acquire_async_awaits_instead_of_blocking(monkeypatch, clock):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(token_bucket.asyncio, "sleep", fake_sleep)
+    bucket = TokenBucket(rate=10, capacity=1)
+
+    async def acquire_twice():
+        await bucket.acquire_async()
+        await bucket.acquire_async()
+
+    asyncio.run(acquire_twice())
+
+    assert slept == [pytest.approx(0.1)]
+    assert clock.slept == []
+
+def test_rate_limited_halves_the_rate_down_to_the_minimum():
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, min_requests_per_minute=10)
+    limiter.on_rate_limited()
+    assert limiter.requests_per_minute == pytest.approx(30)
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+
+    assert limiter.requests_per_minute == pytest.approx(10)
+
+def test_backoff_grows_exponentially_and_is_capped():
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, base_backoff=1, max_backoff=5)
+    delays = [limiter.on_rate_limited() for _ in range(5)]
+
+    assert delays == [1, 2, 4, 5, 5]
+
+def test_retry_after_wins_when_longer():
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, base_backoff=1)
+
+    assert limiter.on_rate_limited(retry_after=30) == 30
+    assert limiter.on_rate_limited(retry_after=0.5) == 2
+
+def test_success_streak_recovers_the_rate_up_to_the_maximum():
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, recovery_after=3)
+    limiter.on_rate_limited()
+    for _ in range(2):
+        limiter.on_success()
+    assert limiter.requests_per_minute == pytest.approx(30)
+    limiter.on_success()
+    assert limiter.requests_per_minute == pytest.approx(36)
+    for _ in range(100):
+        limiter.on_success()
+
+    assert limiter.requests_per_minute == pytest.approx(60)
+
+def test_success_resets_the_backoff():
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, base_backoff=1)
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    limiter.on_success()
+
+    assert limiter.on_rate_limited() == 1
+
+def test_reddit_budget_spreads_the_remaining_requests_over_the_window(clock):
+    budget = RedditRateBudget(requests_per_minute=100, reserve=5)
+    budget.update_from_limits({"remaining": 65, "reset_timestamp": clock.time() + 300, "used": 535})
+
+    assert budget.requests_per_minute == pytest.approx(12)
+
+def test_reddit_budget_stays_between_its_bounds(clock):
+    budget = RedditRateBudget(requests_per_minute=60, reserve=5)
+    budget.update_from_limits({"remaining": 600, "reset_timestamp": clock.time() + 10})
+    assert budget.requests_per_minute == pytest.approx(60)
+
+    budget.update_from_limits({"remaining": 2, "reset_timestamp": clock.time() + 600})
+    assert budget.requests_per_minute == pytest.approx(0.6)
+
+def test_reddit_budget_ignores_missing_headers(clock):
+    budget = RedditRateBudget(requests_per_minute=60)
+    budget.update_from_limits({"remaining": None, "reset_timestamp": None, "used": None})
+    budget.update_from_limits(None)
+
+    assert budget.requests_per_minute == pytest.approx(60)
@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+import pytest
+
+CREATED = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+@pytest.fixture
+def posts(database):
+    # Five unclassified posts p0..p4 in id order
+    post_ids = [f"p{num}" for num in range(5)]
+    database.add_posts([(post_id, CREATED, "python", "Title", "Content") for post_id in post_ids])
+    return post_ids
+
+def claimed(posts: list[dict]) -> list[str]:
+    # UPDATE ... RETURNING does not keep the order of the claim, only its selection
+    return sorted(post["post_id"] for post in posts)
+
+def lease(pool, post_id: str) -> tuple:
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT claimed_by, claimed_until IS NOT NULL, sentiment FROM posts WHERE post_id = %s", (post_id,))
+        return cur.fetchone()
+
+def test_claims_are_leased_oldest_first_and_never_shared(database, empty_database, posts):
+    first = database.claim_unsentimented_posts(2, 600, "w1")
+    second = database.claim_unsentimented_posts(10, 600, "w2")
+
+    assert claimed(first) == ["p0", "p1"]
+    assert claimed(second) == ["p2", "p3", "p4"]
+    assert {"post_id": "p0", "title": "Title", "content": "Content", "subreddit": "python"} in first
+    assert lease(empty_database, "p0") == ("w1", True, None)
+    assert database.claim_unsentimented_posts(10, 600, "w3") == []
+
+def test_rows_locked_by_another_claim_are_skipped(database, empty_database, posts):
+    with empty_database.connection() as conn, conn.cursor() as cur:
+        # Another worker's claim is in flight and holds the row locks of p0 and p1
+        cur.execute("SELECT id FROM posts WHERE post_id IN ('p0', 'p1') FOR UPDATE")
+        assert claimed(database.claim_unsentimented_posts(2, 600, "w2")) == ["p2", "p3"]
+
+def test_expired_leases_can_be_claimed_again(database, empty_database, posts):
+    database.claim_unsentimented_posts(5, 600, "w1")
+    with empty_database.connection() as conn, conn.cursor() as cur:
+        cur.execute("UPDATE posts SET claimed_until = now() - interval '1 second' WHERE post_id = 'p3'")
+
+    assert claimed(database.claim_unsentimented_posts(5, 600, "w2")) == ["p3"]
+    assert lease(empty_database, "p3")[0] == "w2"
+
+def test_stored_labels_release_the_lease_and_are_not_overwritten(database, empty_database, posts):
+    database.claim_unsentimented_posts(2, 600, "w1")
+    database.mark_posts_sentiment([("p0", "POSITIVE", "model-a", 0.9), ("p1", "NEGATIVE", "model-a", None)])
+    # A worker whose lease expired finishes late
+    database.mark_posts_sentiment([("p0", "NEUTRAL", "model-b", None)])
+
+    assert lease(empty_database, "p0") == (None, False, "POSITIVE")
+    assert lease(empty_database, "p1") == (None, False, "NEGATIVE")
+    assert claimed(database.claim_unsentimented_posts(10, 600, "w2")) == ["p2", "p3", "p4"]
+
+def test_released_posts_return_to_the_queue(database, empty_database, posts):
+    database.claim_unsentimented_posts(5, 600, "w1")
+    database.release_posts(["p1", "p4"])
+
+    assert lease(empty_database, "p1") == (None, False, None)
+    assert claimed(database.claim_unsentimented_posts(5, 600, "w2")) == ["p1", "p4"]
+
+def test_claim_posts_skips_labelled_and_leased_posts(database, posts):
+    database.claim_posts(["p1"], 600, "w1")
+    database.mark_posts_sentiment([("p2", "POSITIVE", "model", None)])
+
+    assert claimed(database.claim_posts(["p0", "p1", "p2", "missing"], 600, "w2")) == ["p0"]
+    assert database.claim_posts([], 600, "w2") == []
+
+def test_iteration_drains_the_queue_and_rereads_the_exclusions(database, posts):
+    failed = set()
+    batches = []
+    for batch in database.iter_unsentimented_posts(2, 600, "w1", exclude=failed):
+        batches.append(claimed(batch))
+        # The pipeline releases posts it failed on and excludes them from its next claims
+        failed.update(claimed(batch))
+        database.release_posts(claimed(batch))
+
+    assert batches == [["p0", "p1"], ["p2", "p3"], ["p4"]]
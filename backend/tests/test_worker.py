@@ -0,0 +1,89 @@
+import psycopg2
+import pytest
+import worker
+
+class StopAfter:
+    """Stands in for the stop event, records the waits and stops after `count` of them."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.waits = []
+
+    def is_set(self) -> bool:
+        return len(self.waits) >= self.count
+
+    def wait(self, timeout: float) -> bool:
+        self.waits.append(timeout)
+        return self.is_set()
+
+class FlakyRouter:
+    """Model router whose pipeline raises for the first `failures` runs."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.runs = 0
+
+    def pipeline(self, **kwargs) -> None:
+        self.runs += 1
+        if self.runs <= self.failures:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+@pytest.fixture
+def run(monkeypatch):
+    # run_worker with the router, LISTEN connection and process setup replaced
+    def run(router, stop, listen=None, poll_interval: float = 60) -> None:
+        monkeypatch.setattr(worker.signal, "signal", lambda signum, handler: None)
+        monkeypatch.setattr(worker, "get_config", lambda: None)
+        monkeypatch.setattr(worker, "close_pool", lambda: None)
+        monkeypatch.setattr(worker, "get_model_router", lambda cfg, storage=None: router)
+        monkeypatch.setattr(worker, "_listen_connection", listen or unreachable)
+        worker.run_worker(0, {}, {"poll_interval": poll_interval}, {}, False, stop)
+
+    return run
+
+def unreachable():
+    raise psycopg2.OperationalError("could not connect to server")
+
+def test_pipeline_errors_are_retried_with_backoff(run):
+    router = FlakyRouter(failures=2)
+    stop = StopAfter(3)
+    run(router, stop)
+
+    assert router.runs == 3
+    assert stop.waits == [5, 10, 60]
+
+def test_worker_polls_while_the_listen_connection_is_down(run, monkeypatch, clock):
+    monkeypatch.setattr(worker, "time", clock)
+    attempts = []
+
+    def listen():
+        attempts.append(clock.now)
+        unreachable()
+
+    stop = StopAfter(6)
+    original_wait = stop.wait
+    stop.wait = lambda timeout: clock.advance(timeout) or original_wait(timeout)
+    run(FlakyRouter(failures=0), stop, listen, poll_interval=4)
+
+    # The worker keeps polling every poll_interval while reconnects back off (5s, then 10s)
+    assert stop.waits == [4] * 6
+    assert attempts == [1000, 1008, 1020]
+
+def test_lost_listen_connection_is_reopened(monkeypatch):
+    class BrokenConnection:
+        closed = False
+
+        def fileno(self) -> int:
+            raise ValueError("connection already closed")
+
+        def close(self) -> None:
+            self.closed = True
+
+    connections = []
+    monkeypatch.setattr(worker, "_listen_connection", lambda: connections.append(BrokenConnection()) or connections[-1])
+    listener = worker.Listener()
+    listener.wait(StopAfter(10), 1)
+    listener.wait(StopAfter(10), 1)
+
+    assert len(connections) == 2
+    assert connections[0].closed
@@ -0,0 +1,228 @@
+"""
+worker.py
+
+Standalone sentiment worker, decoupled from the ingestion scheduler in main.py.
+
+Each worker process drains the posts work queue with the regular pipeline (claim
+leases with FOR UPDATE SKIP LOCKED, so any number of processes, containers or nodes
+can run side by side without double-processing), then sleeps on LISTEN
+posts_inserted until new posts are committed or `poll_interval` passes. With comment
+ingestion enabled, the comments queue is drained after the posts queue and
+comments_inserted notifications wake the workers as well.
+
+A worker survives database outages: a failed pipeline run is logged and retried with
+exponential backoff (the pool replaces broken connections), and while the LISTEN
+connection is down the worker polls every `poll_interval` seconds and reconnects
+with backoff.
+
+SIGTERM and Ctrl+C stop the workers gracefully: the batch in flight is finished and
+stored, nothing more is claimed, and unfinished posts are released back to the queue.
+
+Usage (from the backend directory):
+    python worker.py --concurrency 8 --processes 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import time
+import psycopg2
+from dotenv import load_dotenv
+from openrouter.factory import get_model_router
+from logging_config.logging_config import get_config
+from database.postgresql import close_pool
+from database.comment_queue import CommentQueue
+from monitoring.metrics import start_metrics_server
+import yaml
+
+NOTIFY_CHANNELS = ("posts_inserted", "comments_inserted")
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 300
+
+def _listen_connection():
+    # Dedicated autocommit connection for LISTEN, outside the pool
+    conn = psycopg2.connect(
+        host=os.getenv("DB_HOST"),
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        port=os.getenv("DB_PORT")
+    )
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for channel in NOTIFY_CHANNELS:
+            cur.execute(f"LISTEN {channel}")
+
+    return conn
+
+def _retry_delay(failures: int) -> float:
+    # Exponential backoff after consecutive failures
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (failures - 1))
+
+def _wait_for_posts(conn, stop_event, timeout: float) -> None:
+    # Block until a posts_inserted/comments_inserted notification, the timeout or a stop request
+    waited = 0.0
+    while waited < timeout and not stop_event.is_set():
+        step = min(1.0, timeout - waited)
+        if select.select([conn], [], [], step)[0]:
+            conn.poll()
+            if conn.notifies:
+                conn.notifies.clear()
+                return
+        waited += step
+
+class Listener:
+    """
+    LISTEN connection of a worker process that is reopened after errors.
+
+    Attributes:
+    - _conn: open LISTEN connection, None while disconnected
+    - _failures: consecutive failed connection attempts
+    - _retry_at: monotonic time of the next connection attempt
+
+    Methods:
+    - wait: wait for a notification, or for the timeout while disconnected
+    - close: close the connection
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _connect(self):
+        # Open the connection unless it is open or the backoff has not passed yet
+        if self._conn is not None and not self._conn.closed:
+            return self._conn
+        self._conn = None
+        if time.monotonic() < self._retry_at:
+            return None
+        try:
+            self._conn = _listen_connection()
+            if self._failures:
+                logging.info("LISTEN connection restored")
+            self._failures = 0
+        except psycopg2.Error as e:
+            self._failures += 1
+            delay = _retry_delay(self._failures)
+            self._retry_at = time.monotonic() + delay
+            logging.warning(f"LISTEN connection failed: {e}, polling until the next attempt in {delay}s")
+
+        return self._conn
+
+    def wait(self, stop_event, timeout: float) -> None:
+        # Notifications wake the worker early; without a connection it just polls
+        conn = self._connect()
+        if conn is None:
+            stop_event.wait(timeout)
+            return
+        try:
+            _wait_for_posts(conn, stop_event, timeout)
+        except (psycopg2.Error, OSError, ValueError) as e:
+            logging.warning(f"LISTEN connection lost: {e}")
+            self.close()
+
+    def close(self) -> None:
+        # Close the connection, the next wait reconnects
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
+
+def run_worker(
+    number: int,
+    sentiment_cfg: dict,
+    worker_cfg: dict,
+    metrics_cfg: dict,
+    comments: bool,
+    stop_event
+) -> None:
+    """
+    Worker process main loop: drain the queue, wait for new posts, repeat until stopped.
+    """
+    # The parent forwards SIGTERM/SIGINT through stop_event. Spawned processes inherit the
+    # environment loaded by the parent, but not its logging setup
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    get_config()
+    if metrics_cfg.get("enabled", False):
+        # One port per process, counting up from worker.metrics_port
+        start_metrics_server(worker_cfg.get("metrics_port", 8001) + number)
+    routers = [get_model_router(sentiment_cfg)]
+    if comments:
+        # Run after the posts router, so the two never send requests at the same time
+        routers.append(get_model_router(sentiment_cfg, CommentQueue()))
+    listener = Listener()
+    failures = 0
+    logging.info(f"Sentiment worker {number} started (pid {os.getpid()})")
+    try:
+        while not stop_event.is_set():
+            try:
+                for router in routers:
+                    router.pipeline(
+                        mode=sentiment_cfg.get("mode", "async"),
+                        concurrency=sentiment_cfg.get("concurrency", 8),
+                        claim_size=sentiment_cfg.get("claim_size", 100),
+                        lease_seconds=sentiment_cfg.get("lease_seconds", 600),
+                        stop=stop_event.is_set
+                    )
+                failures = 0
+            except Exception as e:
+                # E.g. a database outage; leases of unfinished posts expire on their own
+                failures += 1
+                delay = _retry_delay(failures)
+                logging.error(f"Sentiment worker {number} failed: {e}, retrying in {delay}s")
+                stop_event.wait(delay)
+                continue
+            listener.wait(stop_event, worker_cfg.get("poll_interval", 60))
+    finally:
+        listener.close()
+        close_pool()
+        logging.info(f"Sentiment worker {number} stopped")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run sentiment workers")
+    parser.add_argument("--concurrency", type=int, help="requests in flight per process (default: sentiment.concurrency)")
+    parser.add_argument("--processes", type=int, help="worker processes (default: worker.processes or 1)")
+    args = parser.parse_args()
+
+    load_dotenv(dotenv_path="config/.env")
+    get_config()
+    with open("config/config.yaml") as f:
+        cfg = yaml.safe_load(f)
+    sentiment_cfg = dict(cfg.get("sentiment") or {})
+    worker_cfg = cfg.get("worker") or {}
+    metrics_cfg = cfg.get("metrics") or {}
+    comments = (cfg.get("comments") or {}).get("enabled", False)
+    processes = args.processes or worker_cfg.get("processes", 1)
+    if args.concurrency:
+        sentiment_cfg["concurrency"] = args.concurrency
+    # Every process has its own rate limiter, so they share the configured budget
+    sentiment_cfg["requests_per_minute"] = sentiment_cfg.get("requests_per_minute", 20) / processes
+
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+
+    def request_stop(signum, frame):
+        logging.info("Stopping sentiment workers...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    workers = [
+        context.Process(target=run_worker, args=(number, sentiment_cfg, worker_cfg, metrics_cfg, comments, stop_event), name=f"worker-{number}")
+        for number in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    exit_codes = [process.exitcode for process in workers]
+    if any(exit_codes):
+        logging.error(f"Sentiment workers exited with codes {exit_codes}")
+
+if __name__ == "__main__":
+    main()
@@ -4,78 +4,173 @@ app.py
 Streamlit application for visualizing Reddit sentiment analysis results.
 Connects to PostgreSQL database, fetches subreddit data and sentiment stats,
 and displays metrics and pie charts using Plotly.
+
+All queries read the sentiment_rollup table (hourly counts per subreddit, sentiment
+and model version maintained by the backend), never the raw posts table, so their
+cost does not grow with the number of posts.
+
+The trend view buckets the rollup with date_trunc in SQL and computes the sentiment
+share per bucket there as well, so Plotly only receives one point per bucket, sentiment
+and subreddit. Resolutions are limited per window to keep every series short.
+
+Sessions share a self-healing connection pool (postgres_source.py). Cached results are keyed
+on the rollup's change marker, which every session reads at most once per
+MARKER_TTL seconds: aggregate queries run again only after the backend changed the
+rollup, however many viewers are connected.
+
+With DASHBOARD_BACKEND=duckdb the same queries run on DuckDB over the Parquet files
+exported by the backend (PARQUET_PATH) instead of PostgreSQL, see duckdb_source.py.
 """
 
 from dotenv import load_dotenv
 import streamlit as st
-import psycopg2
 import os
+import time
 import plotly.express as px
+from postgres_source import PostgresSource, create_source
 
 load_dotenv()
 
-@st.cache_resource
-def get_db_connection():
-    # Establish and cache a connection to the PostgreSQL database
-    conn = psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        port=os.getenv("DB_PORT")
-    )
-    return conn
+SENTIMENTS = ("POSITIVE", "NEUTRAL", "NEGATIVE")
+COLORS = {"POSITIVE": "#34a853", "NEUTRAL": "#9aa0a6", "NEGATIVE": "#ea4335"}
 
-@st.cache_data(ttl=900)
-def get_subreddits(_conn):
-    # Fetch distinct subreddit names from the posts table
-    with _conn.cursor() as cur:
-        cur.execute("SELECT DISTINCT subreddit FROM posts")
-        return [row[0] for row in cur.fetchall()]
+# Window label -> (interval, resolutions offered, at most a few hundred buckets each)
+WINDOWS = {
+    "24 hours": ("1 day", ("hour",)),
+    "7 days": ("7 days", ("hour", "day")),
+    "30 days": ("30 days", ("day", "hour")),
+    "90 days": ("90 days", ("day", "week")),
+    "1 year": ("1 year", ("week", "day", "month")),
+    "All time": (None, ("month", "week")),
+}
 
-@st.cache_data(ttl=900)
-def get_sentiment_stats(_conn, subreddit):
-    # Retrieve sentiment counts and percentages for a given subreddit
-    with _conn.cursor() as cur:
-        query = """
-            SELECT
-                sentiment,
-                COUNT(*) as count,
-                ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) as percentage
-            FROM posts
-            WHERE subreddit = %s AND sentiment IN ('POSITIVE', 'NEUTRAL', 'NEGATIVE')
-            GROUP BY sentiment
-        """
-        cur.execute(query, (subreddit,))
+# Seconds the change marker is shared between sessions before it is read again
+MARKER_TTL = 10
 
-        # Initialize stats dictionary with default zero values
-        stats = {
-            "POSITIVE": {'percentage': 0, 'count': 0},
-            "NEUTRAL": {'percentage': 0, 'count': 0},
-            "NEGATIVE": {'percentage': 0, 'count': 0}
+@st.cache_resource
+def get_db_pool() -> PostgresSource:
+    # One connection pool (or DuckDB source) for all sessions of the server process
+    if os.getenv("DASHBOARD_BACKEND", "postgres") == "duckdb":
+        from duckdb_source import DuckDBSource
+        return DuckDBSource(os.getenv("PARQUET_PATH", "/data/parquet"))
+    return create_source()
+
+@st.cache_data(ttl=MARKER_TTL)
+def get_marker(_pool: PostgresSource) -> str:
+    # Latest data change, shared by all sessions for MARKER_TTL seconds
+    return _pool.change_marker()
+
+@st.cache_data(max_entries=4)
+def get_subreddits(_pool, marker):
+    # Fetch distinct subreddit names from the rollup table
+    rows = _pool.query("SELECT DISTINCT subreddit FROM sentiment_rollup ORDER BY subreddit")
+    return [row[0] for row in rows]
+
+@st.cache_data(max_entries=256)
+def get_sentiment_stats(_pool, subreddit, marker):
+    # Retrieve sentiment counts and percentages for a given subreddit
+    query = """
+        SELECT
+            sentiment,
+            SUM(count) as count,
+            ROUND(SUM(count) * 100.0 / SUM(SUM(count)) OVER (), 2) as percentage
+        FROM sentiment_rollup
+        WHERE subreddit = %s AND sentiment IN ('POSITIVE', 'NEUTRAL', 'NEGATIVE')
+        GROUP BY sentiment
+        HAVING SUM(count) > 0
+    """
+    rows = _pool.query(query, (subreddit,))
+
+    # Initialize stats dictionary with default zero values
+    stats = {
+        "POSITIVE": {'percentage': 0, 'count': 0},
+        "NEUTRAL": {'percentage': 0, 'count': 0},
+        "NEGATIVE": {'percentage': 0, 'count': 0}
+    }
+
+    for sentiment, count, percentage in rows:
+        stats[sentiment] = {
+            "percentage": float(percentage),
+            "count": int(count)
         }
 
-        for sentiment, count, percentage in cur.fetchall():
-            stats[sentiment] = {
-                "percentage": float(percentage),
-                "count": count
-            }
+    return stats
 
-        return stats
+@st.cache_data(max_entries=256)
+def get_sentiment_trend(_pool, subreddits: tuple, window: str, resolution: str, marker: str, hour: int):
+    # Sentiment share per date_trunc bucket for the given subreddits, computed in SQL.
+    # marker and hour are cache keys only: new data, or the window sliding by an hour
+    interval = WINDOWS[window][0]
+    rows = _pool.query(
+        """
+        SELECT
+            date_trunc(%(resolution)s, bucket) AS period,
+            subreddit,
+            sentiment,
+            SUM(count) AS count,
+            ROUND(SUM(count) * 100.0
+                  / SUM(SUM(count)) OVER (PARTITION BY date_trunc(%(resolution)s, bucket), subreddit), 2)
+                AS percentage
+        FROM sentiment_rollup
+        WHERE subreddit = ANY(%(subreddits)s)
+            AND sentiment IN ('POSITIVE', 'NEUTRAL', 'NEGATIVE')
+            AND (%(interval)s::interval IS NULL OR bucket >= now() - %(interval)s::interval)
+        GROUP BY 1, 2, 3
+        HAVING SUM(count) > 0
+        ORDER BY 1, 2, 3
+        """,
+        {"resolution": resolution, "subreddits": list(subreddits), "interval": interval}
+    )
 
-def main():
-    # Main Streamlit app function
-    st.title("Reddit Sentiment Analysis Dashboard")
+    return {
+        "period": [row[0] for row in rows],
+        "subreddit": [row[1] for row in rows],
+        "sentiment": [row[2] for row in rows],
+        "count": [int(row[3]) for row in rows],
+        "percentage": [float(row[4]) for row in rows],
+    }
+
+def show_trends(pool, subreddits, marker):
+    # Trend view: window and resolution selectors, one or several subreddits
+    selected = st.multiselect("Subreddits", subreddits, default=subreddits[:1])
+    col1, col2 = st.columns(2)
+    with col1:
+        window = st.selectbox("Window", list(WINDOWS), index=1)
+    with col2:
+        resolution = st.selectbox("Resolution", WINDOWS[window][1])
+    if not selected:
+        return
+
+    trend = get_sentiment_trend(pool, tuple(sorted(selected)), window, resolution, marker, int(time.time() // 3600))
+    if not trend["period"]:
+        st.info("No classified posts in this window.")
+        return
+
+    if len(selected) == 1:
+        fig = px.area(
+            trend, x="period", y="percentage", color="sentiment",
+            category_orders={"sentiment": list(SENTIMENTS)}, color_discrete_map=COLORS,
+            hover_data=["count"], title=f"Sentiment share in r/{selected[0]} per {resolution}"
+        )
+    else:
+        fig = px.line(
+            trend, x="period", y="percentage", color="subreddit", facet_row="sentiment",
+            category_orders={"sentiment": list(SENTIMENTS)}, hover_data=["count"],
+            title=f"Sentiment share per {resolution}"
+        )
+        fig.update_layout(height=700)
+    fig.update_yaxes(title_text="%", range=[0, 100])
+    st.plotly_chart(fig, use_container_width=True)
 
-    conn = get_db_connection()
-    subreddits = get_subreddits(conn)
+def show_overview(pool, subreddits, marker):
+    # All-time metrics and pie chart of one subreddit
     selected_subreddit = st.selectbox(
         "Select Subreddit",
         subreddits
     )
 
     if selected_subreddit:
-        stats = get_sentiment_stats(conn, selected_subreddit)
+        stats = get_sentiment_stats(pool, selected_subreddit, marker)
         col1, col2, col3 = st.columns(3)
 
         with col1:
@@ -110,5 +205,18 @@ def main():
         )
         st.plotly_chart(fig, use_container_width=True)
 
+def main():
+    # Main Streamlit app function
+    st.title("Reddit Sentiment Analysis Dashboard")
+
+    pool = get_db_pool()
+    marker = get_marker(pool)
+    subreddits = get_subreddits(pool, marker)
+    overview, trends = st.tabs(["Overview", "Trends"])
+    with trends:
+        show_trends(pool, subreddits, marker)
+    with overview:
+        show_overview(pool, subreddits, marker)
+
 if __name__ == "__main__":
     main()
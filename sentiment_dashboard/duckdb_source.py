@@ -0,0 +1,97 @@
+"""
+duckdb_source.py
+
+Analytics mode of the dashboard (DASHBOARD_BACKEND=duckdb). Data is read from the
+date-partitioned Parquet files written by the backend's export job instead of the
+live PostgreSQL database, so dashboard load never reaches the write path.
+
+The Parquet files are aggregated into an in-memory DuckDB table shaped like
+sentiment_rollup (subreddit, sentiment, model_version, hourly bucket, count). The
+dashboard queries therefore run unchanged on both backends; only psycopg2's
+placeholders are translated to DuckDB's. The table is rebuilt when the export marker
+(_export.json, rewritten after every export run) changes, which is also the
+dashboard's cache key in this mode.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import duckdb
+
+NAMED_PARAMETER = re.compile(r"%\((\w+)\)s")
+MARKER_FILE = "_export.json"
+
+class DuckDBSource:
+    """
+    Read-only query source over the exported Parquet dataset.
+
+    Attributes:
+    - _root: dataset directory (PARQUET_PATH), files under <root>/posts/date=*/
+    - _conn: in-memory DuckDB database holding the aggregated sentiment_rollup table
+    - _loaded: export marker the table was built from
+
+    Methods:
+    - query: run a dashboard query with psycopg2-style parameters and return all rows
+    - change_marker: last exported id, rebuilding the table when it moved
+    """
+
+    def __init__(self, root: str):
+        # Open the in-memory database, bucketing happens in UTC like in PostgreSQL
+        self._root = root
+        self._conn = duckdb.connect()
+        self._conn.execute("SET TimeZone = 'UTC'")
+        self._lock = threading.Lock()
+        self._loaded = None
+
+    def _refresh(self, marker: str) -> None:
+        # Rebuild the rollup table from the Parquet files if the export moved on
+        with self._lock:
+            if self._loaded == marker:
+                return
+            pattern = os.path.join(self._root, "posts", "*", "*.parquet").replace("'", "''")
+            if marker:
+                # By name, files exported before the confidence column was added lack it
+                source = f"read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+            else:
+                # Nothing exported yet, read_parquet fails on an empty glob
+                source = (
+                    "(SELECT NULL::VARCHAR AS subreddit, NULL::VARCHAR AS sentiment, "
+                    "NULL::VARCHAR AS model_version, NULL::TIMESTAMPTZ AS created_at WHERE false)"
+                )
+            self._conn.execute(
+                f"""
+                CREATE OR REPLACE TABLE sentiment_rollup AS
+                SELECT subreddit, sentiment, model_version,
+                       date_trunc('hour', created_at) AS bucket, count(*) AS count
+                FROM {source}
+                GROUP BY ALL
+                """
+            )
+            self._loaded = marker
+            logging.info(f"Loaded Parquet export {marker or '(empty)'} from {self._root}")
+
+    def change_marker(self) -> str:
+        # Last exported id from the export marker, "" before the first export
+        try:
+            with open(os.path.join(self._root, MARKER_FILE)) as f:
+                marker = str(json.load(f)["last_id"])
+        except FileNotFoundError:
+            marker = ""
+        self._refresh(marker)
+
+        return marker
+
+    def query(self, sql: str, params=None) -> list[tuple]:
+        # %(name)s becomes $name and %s becomes ?, every call gets its own cursor (thread-safe)
+        with self._lock:
+            loaded = self._loaded
+        if loaded is None:
+            self.change_marker()
+        sql = NAMED_PARAMETER.sub(r"$\1", sql).replace("%s", "?")
+        cur = self._conn.cursor()
+        try:
+            return cur.execute(sql, params).fetchall()
+        finally:
+            cur.close()
@@ -0,0 +1,71 @@
+"""
+postgres_source.py
+
+PostgreSQL mode of the dashboard (DASHBOARD_BACKEND=postgres, the default). Streamlit
+serves every browser session from its own thread, so instead of one shared connection
+the sessions check connections out of the backend's thread-safe, self-healing
+ConnectionPool (backend/database/pool.py). Connections that break (database restart,
+network drop, idle timeout) are dropped from the pool and the query is retried once
+on a fresh connection, so the dashboard recovers without a restart.
+
+change_marker returns the newest sentiment_rollup.updated_at, maintained by the
+backend's rollup triggers. It is a single index lookup, and the cached queries in
+app.py take it as part of their cache key: they run again only after the rollup
+actually changed.
+"""
+
+import logging
+import os
+import sys
+import psycopg2
+
+# The backend directory is a sibling of the dashboard, in the repository and in the image
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend"))
+from database.pool import ConnectionPool
+
+class PostgresSource(ConnectionPool):
+    """
+    Read-only query source over the live database, on the backend's connection pool.
+
+    Methods:
+    - query: run a read-only query and return all rows, retrying once on a broken connection
+    - change_marker: newest change of the sentiment_rollup table, used as a cache key
+    """
+
+    def query(self, sql: str, params=None) -> list[tuple]:
+        # One retry covers connections that died between the health check and the query
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(sql, params)
+                        return cur.fetchall()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                if attempt:
+                    raise
+                logging.warning(f"Database query failed, retrying on a new connection: {e}")
+
+    def change_marker(self) -> str:
+        # Latest rollup update stamped by the backend's triggers, one index lookup
+        rows = self.query("SELECT max(updated_at) FROM sentiment_rollup")
+        return str(rows[0][0])
+
+def create_source() -> PostgresSource:
+    """
+    Create the dashboard's query source from the DB_* environment variables.
+    Pool size is configured with DASHBOARD_DB_POOL_MIN and DASHBOARD_DB_POOL_MAX.
+    """
+    return PostgresSource(
+        minconn=int(os.getenv("DASHBOARD_DB_POOL_MIN", 1)),
+        maxconn=int(os.getenv("DASHBOARD_DB_POOL_MAX", 5)),
+        host=os.getenv("DB_HOST"),
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        port=os.getenv("DB_PORT"),
+        connect_timeout=5,
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3
+    )